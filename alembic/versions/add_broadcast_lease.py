@@ -0,0 +1,30 @@
+"""add_broadcast_lease
+
+Revision ID: add_broadcast_lease
+Revises: add_info_cache
+Create Date: 2026-02-14 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_broadcast_lease'
+down_revision: Union[str, None] = 'add_info_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('broadcasts', sa.Column('owner', sa.String(length=255), nullable=True))
+    op.add_column('broadcasts', sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('broadcasts', 'lease_until')
+    op.drop_column('broadcasts', 'owner')
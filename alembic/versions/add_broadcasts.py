@@ -0,0 +1,45 @@
+"""add_broadcasts
+
+Revision ID: add_broadcasts
+Revises: add_download_jobs
+Create Date: 2026-02-07 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_broadcasts'
+down_revision: Union[str, None] = 'add_download_jobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('broadcasts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('admin_chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('status_message_id', sa.BigInteger(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+    sa.Column('last_telegram_id', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('total_users', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('sent', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('failed', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_broadcasts_id'), 'broadcasts', ['id'], unique=False)
+    op.create_index(op.f('ix_broadcasts_status'), 'broadcasts', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_broadcasts_status'), table_name='broadcasts')
+    op.drop_index(op.f('ix_broadcasts_id'), table_name='broadcasts')
+    op.drop_table('broadcasts')
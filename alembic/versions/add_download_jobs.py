@@ -0,0 +1,47 @@
+"""add_download_jobs
+
+Revision ID: add_download_jobs
+Revises: add_media_cache
+Create Date: 2026-01-24 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_download_jobs'
+down_revision: Union[str, None] = 'add_media_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('download_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=False),
+    sa.Column('status_message_id', sa.BigInteger(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+    sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('worker_id', sa.String(length=255), nullable=True),
+    sa.Column('lease_until', sa.DateTime(), nullable=True),
+    sa.Column('file_id', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_download_jobs_id'), 'download_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_download_jobs_status'), 'download_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_download_jobs_status'), table_name='download_jobs')
+    op.drop_index(op.f('ix_download_jobs_id'), table_name='download_jobs')
+    op.drop_table('download_jobs')
@@ -0,0 +1,40 @@
+"""add_info_cache
+
+Revision ID: add_info_cache
+Revises: add_broadcasts
+Create Date: 2026-02-09 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_info_cache'
+down_revision: Union[str, None] = 'add_broadcasts'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('info_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=2048), nullable=False),
+    sa.Column('info', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_info_cache_id'), 'info_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_info_cache_url'), 'info_cache', ['url'], unique=True)
+    op.create_index(op.f('ix_info_cache_expires_at'), 'info_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_info_cache_expires_at'), table_name='info_cache')
+    op.drop_index(op.f('ix_info_cache_url'), table_name='info_cache')
+    op.drop_index(op.f('ix_info_cache_id'), table_name='info_cache')
+    op.drop_table('info_cache')
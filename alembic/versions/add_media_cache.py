@@ -0,0 +1,44 @@
+"""add_media_cache
+
+Revision ID: add_media_cache
+Revises: remove_unused_fields
+Create Date: 2026-01-10 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_media_cache'
+down_revision: Union[str, None] = 'remove_unused_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(length=255), nullable=False),
+    sa.Column('file_id', sa.String(length=255), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_hit_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_media_cache_id'), 'media_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_media_cache_cache_key'), 'media_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_media_cache_last_hit_at'), 'media_cache', ['last_hit_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_media_cache_last_hit_at'), table_name='media_cache')
+    op.drop_index(op.f('ix_media_cache_cache_key'), table_name='media_cache')
+    op.drop_index(op.f('ix_media_cache_id'), table_name='media_cache')
+    op.drop_table('media_cache')
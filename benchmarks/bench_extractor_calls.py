@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк: сколько раз экстрактор yt-dlp вызывается на один запрос.
+
+Поднимает локальный HTTP-сервер с тестовым mp4 и прогоняет через него
+цепочку probe -> download, как это делает обработчик. Экстрактор должен
+вызываться ровно один раз на запрос, иначе скрипт завершается с ошибкой.
+
+Запуск:
+    uv run python benchmarks/bench_extractor_calls.py
+"""
+import http.server
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from yt_dlp.extractor.common import InfoExtractor  # noqa: E402
+
+from services import video_downloader  # noqa: E402
+
+REQUESTS = 20
+PAYLOAD = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 64 * 1024
+
+
+class _VideoHandler(http.server.BaseHTTPRequestHandler):
+    def _send_headers(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        self._send_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def main() -> int:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _VideoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    calls = 0
+    original_extract = InfoExtractor.extract
+
+    def counting_extract(self, url):
+        nonlocal calls
+        calls += 1
+        return original_extract(self, url)
+
+    InfoExtractor.extract = counting_extract
+    bot_id = f"bench_{int(time.time())}"
+    try:
+        started = time.perf_counter()
+        for i in range(REQUESTS):
+            url = f"http://127.0.0.1:{server.server_port}/video_{i}.mp4"
+            probe = video_downloader._probe_video_sync(url, 300, 50 * 1024 * 1024)
+            if probe.get("status") != "probed":
+                print(f"Ошибка получения информации: {probe.get('error')}")
+                return 1
+            result = video_downloader._download_video_sync(
+                url, bot_id, 300, 50 * 1024 * 1024, probe["info"]
+            )
+            if result.get("status") != "completed":
+                print(f"Ошибка скачивания: {result.get('error')}")
+                return 1
+        elapsed = time.perf_counter() - started
+    finally:
+        InfoExtractor.extract = original_extract
+        server.shutdown()
+        shutil.rmtree(Path("downloads") / bot_id, ignore_errors=True)
+
+    per_request = calls / REQUESTS
+    print(f"Запросов: {REQUESTS}")
+    print(f"Вызовов экстрактора: {calls} ({per_request:.2f} на запрос)")
+    print(f"Среднее время запроса: {elapsed / REQUESTS * 1000:.1f} мс")
+    if per_request > 1:
+        print("Регрессия: экстрактор вызывается больше одного раза на запрос")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
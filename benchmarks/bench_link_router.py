@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк: распознавание ссылок в сообщениях.
+
+Сравнивает прежнюю схему (поиск кандидатов в тексте, затем проверка каждой
+ссылки четырьмя регулярками и канонизация) с LinkRouter: одна заранее
+скомпилированная регулярка за один проход. Корпус - типичные сообщения
+со ссылками и без них. Перед замером проверяется, что обе схемы находят
+одинаковые ссылки.
+
+Запуск:
+    uv run python benchmarks/bench_link_router.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from services.link_router import LinkRouter  # noqa: E402
+from services.url_normalizer import canonicalize_url  # noqa: E402
+
+ROUNDS = 5
+NUMBER = 2000
+
+CORPUS = [
+    "https://www.instagram.com/reel/C8xYz12AbCd/?igsh=MTc4MmM1YmI2Ng==",
+    "https://youtube.com/shorts/dQw4w9WgXcQ?si=abcdEFGH1234",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://vm.tiktok.com/ZMrAbCdEf/",
+    "https://www.tiktok.com/@someone/video/7312345678901234567?is_from_webapp=1&sender_device=pc",
+    "Смотри, что нашел: https://www.instagram.com/p/C1a2b3c4d5e/ и еще https://youtu.be/abcdefghijk",
+    "привет! как дела?",
+    "Спасибо, все скачалось 👍",
+    "https://example.com/some/page?utm_source=telegram",
+    "Вот статья https://habr.com/ru/articles/123456/ почитай, там про asyncio",
+    "/start",
+    "Не работает ссылка, что делать? Пробовал несколько раз, бот молчит.",
+]
+
+# Прежняя реализация (handlers/video.py до LinkRouter)
+_OLD_PATTERNS = [
+    r'https?://(www\.)?instagram\.com/.+',
+    r'https?://(www\.)?(vm\.)?tiktok\.com/.+',
+    r'https?://(www\.)?(m\.)?youtube\.com/shorts/.+',
+    r'https?://youtu\.be/.+'
+]
+_OLD_URL_IN_TEXT_RE = re.compile(r'https?://[^\s<>"\'()\[\]]+')
+
+
+def _old_is_video_url(text: str) -> bool:
+    return any(re.match(pattern, text.strip()) for pattern in _OLD_PATTERNS)
+
+
+def old_extract(text: str) -> list:
+    urls = []
+    seen = set()
+    for url in _OLD_URL_IN_TEXT_RE.findall(text):
+        url = url.rstrip(".,;:!?")
+        if not _old_is_video_url(url):
+            continue
+        canonical = canonicalize_url(url)
+        if canonical not in seen:
+            seen.add(canonical)
+            urls.append(url)
+    return urls
+
+
+def new_extract(router: LinkRouter, text: str) -> list:
+    return [link.url for link in router.find_all(text)]
+
+
+def main():
+    router = LinkRouter()
+    for text in CORPUS:
+        old, new = old_extract(text), new_extract(router, text)
+        if old != new:
+            sys.exit(f"Результаты расходятся для {text!r}: {old} != {new}")
+
+    def run_old():
+        for text in CORPUS:
+            old_extract(text)
+
+    def run_new():
+        for text in CORPUS:
+            new_extract(router, text)
+
+    messages = len(CORPUS) * NUMBER
+    for name, func in (("old (4 regex + canonicalize)", run_old), ("LinkRouter", run_new)):
+        best = min(timeit.repeat(func, number=NUMBER, repeat=ROUNDS))
+        print(f"{name:30s} {best * 1e6 / messages:7.2f} мкс/сообщение")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк: затраты CPU на один ответ с главной клавиатурой.
+
+Сравнивает прежнюю схему (новый InlineKeyboardMarkup с валидацией pydantic
+на каждый ответ) с каталогом ответов, где клавиатура и тексты собраны один
+раз. Замеряется то, что делает обработчик /help до отправки в сеть: выбор
+текста и клавиатуры, создание метода SendMessage и подготовка тела запроса
+сессией aiogram (сериализация reply_markup в JSON).
+
+Запуск:
+    uv run python benchmarks/bench_responses.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+from bot.responses import get_responses  # noqa: E402
+
+ROUNDS = 5
+NUMBER = 5000
+
+
+# Прежняя реализация (bot/keyboards.py до каталога ответов)
+def old_get_main_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="📖 Помощь", callback_data="help"),
+                InlineKeyboardButton(text="💡 Примеры", callback_data="examples")
+            ],
+            [
+                InlineKeyboardButton(text="📊 Статистика", callback_data="stats"),
+                InlineKeyboardButton(text="👥 Пригласить", callback_data="invite")
+            ]
+        ]
+    )
+
+
+def old_reply() -> SendMessage:
+    return SendMessage(chat_id=1, text=get_responses().help, reply_markup=old_get_main_keyboard())
+
+
+def new_reply() -> SendMessage:
+    responses = get_responses("ru")
+    return SendMessage(chat_id=1, text=responses.help, reply_markup=responses.main_keyboard)
+
+
+def main():
+    session = AiohttpSession()
+    bot = Bot("123456:bench", session=session)
+    if old_reply().model_dump() != new_reply().model_dump():
+        sys.exit("Ответы расходятся")
+
+    for name, func in (("old (новая клавиатура)", old_reply), ("каталог ответов", new_reply)):
+        build = min(timeit.repeat(func, number=NUMBER, repeat=ROUNDS))
+        full = min(timeit.repeat(lambda: session.build_form_data(bot, func()), number=NUMBER, repeat=ROUNDS))
+        print(
+            f"{name:24s} ответ: {build * 1e6 / NUMBER:6.2f} мкс, "
+            f"с подготовкой запроса: {full * 1e6 / NUMBER:6.2f} мкс"
+        )
+
+
+if __name__ == "__main__":
+    main()
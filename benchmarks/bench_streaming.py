@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: отправка видео через диск против потоковой отправки из источника.
+
+Поднимает локальный источник с mp4 заданного размера и заглушку Bot API,
+которая принимает multipart-запрос sendVideo целиком. Каждый режим
+запускается в отдельном процессе, чтобы пиковое потребление памяти не
+смешивалось. Печатает время отправки, пиковый RSS и объем записи на диск.
+
+Запуск:
+    uv run python benchmarks/bench_streaming.py [размер_МБ]
+"""
+import asyncio
+import http.server
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+MB = 1024 * 1024
+BLOCK = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * (MB - 12)
+MODES = ("disk", "stream")
+
+
+def _make_video_handler(size: int):
+    class _VideoHandler(http.server.BaseHTTPRequestHandler):
+        def _send_headers(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._send_headers()
+
+        def do_GET(self):
+            self._send_headers()
+            left = size
+            try:
+                while left > 0:
+                    chunk = BLOCK[:min(left, len(BLOCK))]
+                    self.wfile.write(chunk)
+                    left -= len(chunk)
+            except ConnectionError:
+                # Экстрактор закрывает соединение, прочитав начало файла
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return _VideoHandler
+
+
+class _BotApiHandler(http.server.BaseHTTPRequestHandler):
+    """Заглушка Bot API: вычитывает тело запроса и возвращает сообщение с видео"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        received = 0
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            while True:
+                length = int(self.rfile.readline().strip(), 16)
+                received += length
+                self.rfile.read(length + 2)
+                if length == 0:
+                    break
+        else:
+            left = int(self.headers.get("Content-Length", 0))
+            while left > 0:
+                length = len(self.rfile.read(min(left, MB)))
+                left -= length
+                received += length
+        body = json.dumps({
+            "ok": True,
+            "result": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "video": {
+                    "file_id": f"bench-{received}",
+                    "file_unique_id": "bench",
+                    "width": 0,
+                    "height": 0,
+                    "duration": 0
+                }
+            }
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _read_io() -> dict:
+    """Счетчики ввода-вывода процесса (только Linux)"""
+    try:
+        with open("/proc/self/io") as f:
+            return {key: int(value) for key, value in (line.split(": ") for line in f)}
+    except OSError:
+        return {}
+
+
+async def _run_mode(mode: str, source_url: str, api_url: str) -> dict:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from services.delivery_backend import CloudBackend
+    from services.video_downloader import (
+        _download_video_sync, _probe_video_sync, cleanup_download, get_stream_source
+    )
+
+    backend = CloudBackend()
+    bot = Bot(
+        token="123456:bench",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(api_url), timeout=300)
+    )
+    probe = _probe_video_sync(source_url, 300, backend.max_file_size)
+    if probe.get("status") != "probed":
+        raise RuntimeError(probe.get("error"))
+    info = probe["info"]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    io_before = _read_io()
+    started = time.perf_counter()
+    try:
+        if mode == "stream":
+            source = get_stream_source(info, backend.max_file_size)
+            if source is None:
+                raise RuntimeError("Формат нельзя передать потоком")
+            sent = await backend.send_video_stream(bot, 1, source)
+        else:
+            result = await asyncio.to_thread(
+                _download_video_sync, source_url, "bench_streaming", 300, backend.max_file_size, info
+            )
+            if result.get("status") != "completed":
+                raise RuntimeError(result.get("error"))
+            try:
+                sent = await backend.send_video(bot, 1, result["file_path"])
+            finally:
+                cleanup_download(result["file_path"])
+        elapsed = time.perf_counter() - started
+    finally:
+        await bot.session.close()
+    io_after = _read_io()
+
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "file_id": sent.video.file_id,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "wchar": io_after.get("wchar", 0) - io_before.get("wchar", 0),
+        "write_bytes": io_after.get("write_bytes", 0) - io_before.get("write_bytes", 0),
+    }
+
+
+def main() -> int:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _, _, mode, source_url, api_url = sys.argv
+        print(json.dumps(asyncio.run(_run_mode(mode, source_url, api_url))))
+        return 0
+
+    size = int(sys.argv[1]) * MB if len(sys.argv) > 1 else 40 * MB
+    source = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _make_video_handler(size))
+    api = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _BotApiHandler)
+    for server in (source, api):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    source_url = f"http://127.0.0.1:{source.server_port}/video.mp4"
+    api_url = f"http://127.0.0.1:{api.server_port}"
+    results = []
+    try:
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, source_url, api_url],
+                capture_output=True, text=True
+            )
+            if output.returncode != 0:
+                print(f"Ошибка в режиме {mode}:\n{output.stderr}")
+                return 1
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            # Заглушка Bot API возвращает в file_id размер принятого тела запроса
+            if int(result["file_id"].split("-")[1]) < size:
+                print(f"В режиме {mode} в Telegram передан не весь файл")
+                return 1
+            results.append(result)
+    finally:
+        source.shutdown()
+        api.shutdown()
+        shutil.rmtree(Path("downloads") / "bench_streaming", ignore_errors=True)
+
+    print(f"Размер видео: {size // MB} МБ")
+    print(f"{'режим':<8} {'время, с':>9} {'пик RSS, МБ':>12} {'прирост RSS, МБ':>16} {'запись, МБ':>11}")
+    for r in results:
+        written = max(r["wchar"], r["write_bytes"]) / MB
+        print(
+            f"{r['mode']:<8} {r['seconds']:>9.2f} {r['rss_peak_kb'] / 1024:>12.1f} "
+            f"{(r['rss_peak_kb'] - r['rss_before_kb']) / 1024:>16.1f} {written:>11.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный стенд для режима webhook без обращения к Telegram.
+
+Поднимает aiohttp-приложение webhook с обработчиком обычных сообщений,
+подменяет сессию бота заглушкой и отправляет синтетические Update
+параллельными POST-запросами. Печатает пропускную способность в updates/sec.
+
+Запуск:
+    uv run python benchmarks/bench_webhook.py [количество_обновлений] [параллельность]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from aiogram import Bot, Dispatcher  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.types import Chat, Message  # noqa: E402
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from bot.handlers.messages import router as messages_router  # noqa: E402
+from bot.webhook import create_webhook_app  # noqa: E402
+from config.settings import settings  # noqa: E402
+
+
+class StubSession(BaseSession):
+    """Сессия-заглушка: отвечает на любой метод Bot API без сети"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def make_request(self, bot: Bot, method: Any, timeout: int | None = None) -> Any:
+        self.calls += 1
+        chat_id = getattr(method, "chat_id", 1)
+        return Message(
+            message_id=self.calls,
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_update(update_id: int) -> dict:
+    """Синтетическое обновление с текстовым сообщением"""
+    user = {"id": 1000 + update_id % 500, "is_bot": False, "first_name": "Bench"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user["id"], "type": "private"},
+            "from": user,
+            "text": "привет",
+        },
+    }
+
+
+async def main(total: int, concurrency: int) -> int:
+    session = StubSession()
+    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, session=session)
+    dp = Dispatcher()
+    dp.include_router(messages_router)
+
+    app = create_webhook_app(dp, bot)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+
+    headers = {}
+    if settings.WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = settings.WEBHOOK_SECRET
+
+    next_id = 0
+    rejected = 0
+
+    async def sender():
+        nonlocal next_id, rejected
+        while next_id < total:
+            next_id += 1
+            response = await client.post(settings.WEBHOOK_PATH, json=make_update(next_id), headers=headers)
+            if response.status == 429:
+                rejected += 1
+            await response.release()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    # Дожидаемся обработки обновлений, принятых в фоне
+    while session.calls < total - rejected:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    health = await (await client.get("/health")).json()
+    await client.close()
+
+    print(f"Обновлений: {total}, параллельность: {concurrency}")
+    print(f"Отклонено (429): {rejected}")
+    print(f"Время: {elapsed:.2f} с, {(total - rejected) / elapsed:.0f} updates/sec")
+    print(f"/health: {health}")
+    return 0
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    sys.exit(asyncio.run(main(total, concurrency)))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк: накладные расходы yt-dlp на запрос с пулом YoutubeDL и без него.
+
+Поднимает локальный HTTP-сервер с тестовым mp4 (с keep-alive) и прогоняет
+через него цепочку probe -> download, как это делает обработчик: сначала
+с новым экземпляром YoutubeDL на каждый вызов (YDL_POOL_MAX_USES=0), затем
+с пулом. Видео маленькое, поэтому время запроса - почти целиком накладные
+расходы на создание YoutubeDL, экстракторов и соединений.
+
+Запуск:
+    uv run python benchmarks/bench_ydl_pool.py [запросов]
+"""
+import http.server
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Добавляем src в PYTHONPATH
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from services import video_downloader  # noqa: E402
+from services.ydl_pool import YdlPool  # noqa: E402
+
+PAYLOAD = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 64 * 1024
+MAX_FILESIZE = 50 * 1024 * 1024
+
+
+class _VideoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_headers(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        self._send_headers()
+        try:
+            self.wfile.write(PAYLOAD)
+        except ConnectionError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def run(port: int, requests: int, pool: YdlPool, bot_id: str) -> float:
+    """Среднее время запроса probe -> download, секунды"""
+    video_downloader.ydl_pool = pool
+    started = time.perf_counter()
+    for i in range(requests):
+        url = f"http://127.0.0.1:{port}/video_{i}.mp4"
+        probe = video_downloader._probe_video_sync(url, 300, MAX_FILESIZE)
+        if probe.get("status") != "probed":
+            sys.exit(f"Ошибка получения информации: {probe.get('error')}")
+        result = video_downloader._download_video_sync(url, bot_id, 300, MAX_FILESIZE, probe["info"])
+        if result.get("status") != "completed":
+            sys.exit(f"Ошибка скачивания: {result.get('error')}")
+        video_downloader.cleanup_download(result["file_path"])
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed / requests
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _VideoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bot_id = f"bench_{int(time.time())}"
+    try:
+        fresh = run(server.server_port, requests, YdlPool(max_uses=0, max_idle=1), bot_id)
+        pooled = run(server.server_port, requests, YdlPool(max_uses=1000, max_idle=1), bot_id)
+    finally:
+        server.shutdown()
+        shutil.rmtree(video_downloader.storage.root / bot_id, ignore_errors=True)
+
+    print(f"Запросов: {requests}")
+    print(f"Новый YoutubeDL на вызов: {fresh * 1000:.1f} мс/запрос")
+    print(f"Пул YoutubeDL:            {pooled * 1000:.1f} мс/запрос")
+    print(f"Ускорение:                {fresh / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Middleware допуска ссылок на видео к обработке"""
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+from config.settings import settings
+from services.admission import (
+    AdmissionController,
+    AdmissionRejectedError,
+    PRIORITY_ADMIN,
+    PRIORITY_DEFAULT,
+    PRIORITY_WARM,
+    REJECT_USER_CONCURRENCY,
+    REJECT_USER_RATE,
+)
+from services.info_cache import info_cache
+from services.link_router import Link
+from services.url_normalizer import normalize_url_cached
+from bot.handlers.commands import is_admin
+from typing import Any, Awaitable, Callable, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+REJECT_MESSAGES = {
+    REJECT_USER_RATE: (
+        "⏳ Слишком много ссылок подряд.\n\n"
+        "Подождите несколько секунд и отправьте ссылку снова."
+    ),
+    REJECT_USER_CONCURRENCY: (
+        "⏳ Дождитесь, пока скачаются уже отправленные видео.\n\n"
+        f"Одновременно обрабатывается не больше {settings.USER_CONCURRENCY} ссылок."
+    ),
+}
+OVERLOADED_MESSAGE = (
+    "⏳ Сейчас бот обрабатывает слишком много видео.\n\n"
+    "Повторите попытку через минуту."
+)
+
+
+def get_priority(message: Message, links: List[Link]) -> int:
+    """
+    Класс приоритета запроса
+    
+    Администратор обслуживается первым. Ссылки, информация о которых уже есть
+    в кэше, идут раньше новых: они не требуют разбора страницы и обычно
+    отправляются из кэша file_id без скачивания. Ключ кэша тот же, что в
+    обработчике (normalize_url), но без сетевых запросов: короткая ссылка,
+    которую еще не раскрывали, считается новой.
+    """
+    if is_admin(message.from_user.id):
+        return PRIORITY_ADMIN
+    if links and all(info_cache.memory.contains(normalize_url_cached(link.url)) for link in links):
+        return PRIORITY_WARM
+    return PRIORITY_DEFAULT
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Пропускает ссылку к обработчику только после допуска контроллером
+    
+    Регистрируется как внутренний middleware роутера ссылок, поэтому
+    срабатывает только для сообщений, прошедших фильтр has_video_urls
+    (найденные ссылки фильтр кладет в data["links"]).
+    """
+    
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+    
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        user_id = event.from_user.id
+        links = data.get("links", [])
+        # Каждая ссылка расходует токен частоты: иначе одно сообщение с
+        # BATCH_MAX_LINKS ссылками обходило бы лимиты пользователя
+        requested = max(1, min(len(links), settings.BATCH_MAX_LINKS))
+        try:
+            if not is_admin(user_id):
+                # Сначала дешевые лимиты пользователя, затем приоритет
+                self.controller.check_user(user_id, requested)
+            ticket = self.controller.enter(user_id, get_priority(event, links), links=requested)
+        except AdmissionRejectedError as e:
+            logger.info(f"Запрос пользователя {user_id} отклонен: {e.reason}")
+            await event.answer(REJECT_MESSAGES.get(e.reason, OVERLOADED_MESSAGE))
+            return None
+        
+        if ticket.links < requested:
+            data["links"] = links[:ticket.links]
+            await event.answer(
+                f"⏳ Слишком много ссылок подряд: обрабатываю первые {ticket.links}, "
+                "остальные отправьте немного позже."
+            )
+        
+        try:
+            if ticket.position:
+                await event.answer(f"⏳ Сейчас много запросов. Ваша ссылка в очереди: #{ticket.position}")
+                try:
+                    await ticket.wait()
+                except AdmissionRejectedError:
+                    # Место в очереди занял запрос с более высоким приоритетом
+                    await event.answer(OVERLOADED_MESSAGE)
+                    return None
+            return await handler(event, data)
+        finally:
+            ticket.release()
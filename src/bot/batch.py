@@ -0,0 +1,315 @@
+"""Несколько ссылок в одном сообщении: параллельное скачивание и отправка альбомами"""
+from aiogram import Bot
+from aiogram.types import InputMediaVideo, Message
+from config.settings import settings
+from database import get_db
+from services.delivery_backend import get_delivery_backend
+from services.download_pool import DownloadPoolBusyError
+from services.media_cache_service import MediaCacheService
+from services.link_router import get_platform
+from services.media_metadata import collect_metadata, video_kwargs
+from services.user_service import user_counters
+from services.video_downloader import cleanup_download, probe_video, video_errors
+from bot.delivery import download_for_delivery, edit_status, save_file_id, too_large_result, video_requests
+from bot.keyboards import get_main_keyboard
+from bot.responses import get_responses
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Telegram принимает в альбоме от 2 до 10 элементов
+MEDIA_GROUP_SIZE = 10
+
+# Не чаще одного обновления сообщения о статусе за этот интервал, секунды
+PROGRESS_INTERVAL = 1.5
+
+
+class BatchProgress:
+    """Ход обработки пачки ссылок в одном сообщении о статусе"""
+    
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, total: int):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self._last_update = 0.0
+    
+    async def advance(self, item: Dict):
+        """Отметить обработанную ссылку и при необходимости обновить статус"""
+        self.done += 1
+        if item.get("status") == "failed":
+            self.failed += 1
+        
+        now = time.monotonic()
+        if self.done < self.total and now - self._last_update < PROGRESS_INTERVAL:
+            return
+        self._last_update = now
+        
+        text = f"⏳ Обрабатываю ссылки: {self.done} из {self.total}"
+        if self.failed:
+            text += f" (ошибок: {self.failed})"
+        await edit_status(self.bot, self.chat_id, self.message_id, text, with_keyboard=False)
+
+
+async def prepare_video(url: str) -> Dict:
+    """
+    Получает видео для отправки в альбоме, не отправляя его
+    
+    Returns:
+        dict со статусом "cached" и file_id, "downloaded" и путем к файлу
+        или dict с ошибкой
+    """
+    # Если id видео виден в ссылке, проверяем кэш file_id еще до разбора страницы
+    url_cache_key = MediaCacheService.make_url_cache_key(url)
+    if url_cache_key:
+        async for session in get_db():
+            file_id = await MediaCacheService.get_file_id(session, url_cache_key)
+        if file_id:
+            return {"status": "cached", "file_id": file_id, "cache_key": url_cache_key}
+    
+    probe = await probe_video(url)
+    if probe.get("status") != "probed":
+        return probe
+    
+    info = probe["info"]
+    cache_key = MediaCacheService.make_cache_key(info)
+    
+    if cache_key and cache_key != url_cache_key:
+        async for session in get_db():
+            file_id = await MediaCacheService.get_file_id(session, cache_key)
+        if file_id:
+            return {"status": "cached", "file_id": file_id, "cache_key": cache_key}
+    if cache_key or url_cache_key:
+        MediaCacheService.record_miss()
+    
+    result = await download_for_delivery(url, info, probe.get("cached", False))
+    if result.get("status") != "completed":
+        return result
+    
+    backend = get_delivery_backend()
+    if not backend.fits(os.path.getsize(result["file_path"])):
+        cleanup_download(result["file_path"])
+        video_errors.inc(platform=get_platform(url), error_class="too_large")
+        return too_large_result(backend)
+    
+    metadata = await collect_metadata(result["file_path"], result)
+    return {**result, "status": "downloaded", "cache_key": cache_key, "metadata": metadata}
+
+
+async def _deliver_item(url: str, handoff: asyncio.Future, semaphore: asyncio.Semaphore) -> Dict:
+    """
+    Общая задача video_requests для ссылки из пачки
+    
+    Получает видео, передает его пачке через handoff для отправки альбомом
+    и ждет, пока пачка отправит его. Результат - как у fetch_and_send_video,
+    поэтому одиночный запрос той же ссылки может дождаться этой задачи.
+    """
+    async with semaphore:
+        item = await prepare_video(url)
+    if item.get("status") not in ("cached", "downloaded"):
+        return item
+    item["delivered"] = asyncio.get_running_loop().create_future()
+    handoff.set_result(item)
+    return await item["delivered"]
+
+
+def _finish_delivery(item: Dict, chat_id: int):
+    """Сообщает результат отправки запросам, ожидающим эту ссылку"""
+    delivered = item.pop("delivered", None)
+    if delivered is None or delivered.done():
+        return
+    if item["status"] == "sent":
+        delivered.set_result({
+            "status": "completed",
+            "file_id": item.get("file_id"),
+            "chat_id": chat_id,
+            "message_id": item.get("message_id"),
+        })
+    else:
+        delivered.set_result({"status": "failed", "error": item.get("error", "Неизвестная ошибка")})
+
+
+def _from_shared(result: Dict, chat_id: int) -> Dict:
+    """Элемент пачки из результата чужой задачи video_requests (см. fetch_and_send_video)"""
+    if result.get("status") != "completed":
+        return result
+    if result.get("chat_id") == chat_id:
+        # Видео уже отправлено в этот чат
+        return {"status": "sent"}
+    if result.get("file_id"):
+        return {"status": "cached", "file_id": result["file_id"]}
+    return {"status": "copy", "from_chat_id": result["chat_id"], "message_id": result["message_id"]}
+
+
+async def deliver_batch(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    urls: List[str],
+    status_message_id: int
+) -> Dict:
+    """
+    Скачивает видео по нескольким ссылкам и отправляет их альбомами
+    
+    Ссылки обрабатываются параллельно (не больше BATCH_CONCURRENCY сразу),
+    ход обработки показывается в сообщении о статусе. Готовые видео
+    отправляются альбомами по MEDIA_GROUP_SIZE в порядке ссылок.
+    
+    Как и одиночные запросы, ссылки скачиваются через video_requests: если
+    ссылку уже обрабатывает другой запрос, пачка дожидается его результата.
+    Такие видео отправляются после собственных, чтобы пачки, ожидающие
+    друг друга, не блокировались взаимно.
+    
+    Returns:
+        dict с количеством отправленных и неудачных видео и статусом каждой ссылки
+    """
+    progress = BatchProgress(bot, chat_id, status_message_id, total=len(urls))
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    
+    async def collect(url: str, shared: asyncio.Future, handoff: Optional[asyncio.Future]) -> Dict:
+        try:
+            if handoff is None:
+                item = _from_shared(await asyncio.shield(shared), chat_id)
+            else:
+                await asyncio.wait({shared, handoff}, return_when=asyncio.FIRST_COMPLETED)
+                item = handoff.result() if handoff.done() else shared.result()
+        except DownloadPoolBusyError as e:
+            logger.warning(f"Пул загрузок занят: {e}")
+            item = {"status": "failed", "error": "Сейчас бот обрабатывает слишком много видео."}
+        except Exception as e:
+            logger.error(f"Ошибка при обработке ссылки {url}: {e}", exc_info=True)
+            item = {"status": "failed", "error": "Произошла ошибка при обработке запроса."}
+        await progress.advance(item)
+        return item
+    
+    jobs = []
+    for url in urls:
+        handoff = loop.create_future()
+        shared, leader = video_requests.join(url, _deliver_item, url, handoff, semaphore)
+        jobs.append((url, shared, handoff if leader else None))
+    
+    items: List[Dict] = [{} for _ in urls]
+    own = [i for i, (_, _, handoff) in enumerate(jobs) if handoff is not None]
+    joined = [i for i, (_, _, handoff) in enumerate(jobs) if handoff is None]
+    try:
+        # Сначала свои видео: их ждут другие запросы этих ссылок
+        for i, item in zip(own, await asyncio.gather(*(collect(*jobs[i]) for i in own))):
+            items[i] = item
+        await _send_ready(bot, chat_id, status_message_id, [items[i] for i in own])
+        for i in own:
+            _finish_delivery(items[i], chat_id)
+        
+        for i, item in zip(joined, await asyncio.gather(*(collect(*jobs[i]) for i in joined))):
+            items[i] = item
+        await _send_ready(bot, chat_id, status_message_id, [items[i] for i in joined])
+    finally:
+        for item in items:
+            _finish_delivery(item, chat_id)
+            if item.get("file_path"):
+                cleanup_download(item["file_path"])
+    
+    sent = 0
+    failed = []
+    for url, item in zip(urls, items):
+        if item.get("status") == "sent":
+            sent += 1
+            user_counters.add_video_downloaded(user_id)
+        else:
+            failed.append((url, item.get("error", "Неизвестная ошибка")))
+    
+    if not failed:
+        await bot.send_message(chat_id=chat_id, text=get_responses().choose_action, reply_markup=get_main_keyboard())
+        try:
+            await bot.delete_message(chat_id=chat_id, message_id=status_message_id)
+        except Exception:
+            pass
+    else:
+        lines = [f"Отправлено видео: {sent} из {len(urls)}.", "", "Не удалось обработать:"]
+        for url, error in failed:
+            # Первая строка ошибки, без советов: их слишком много для списка
+            lines.append(f"• {url} — {error.splitlines()[0]}")
+        await edit_status(bot, chat_id, status_message_id, "\n".join(lines))
+    
+    return {
+        "status": "completed" if sent else "failed",
+        "sent": sent,
+        "failed": len(failed),
+        "statuses": ["completed" if item.get("status") == "sent" else item.get("status", "failed") for item in items],
+    }
+
+
+async def _send_ready(bot: Bot, chat_id: int, status_message_id: int, items: List[Dict]):
+    """Отправляет готовые видео альбомами, а видео без file_id - копией чужого сообщения"""
+    for item in items:
+        if item.get("status") != "copy":
+            continue
+        try:
+            await bot.copy_message(chat_id=chat_id, from_chat_id=item["from_chat_id"], message_id=item["message_id"])
+            item["status"] = "sent"
+        except Exception as e:
+            logger.warning(f"Не удалось скопировать видео: {e}")
+            item.update(status="failed", error="Видео готово, но произошла ошибка при отправке.")
+    
+    ready = [item for item in items if item.get("status") in ("cached", "downloaded")]
+    if ready:
+        await edit_status(bot, chat_id, status_message_id, "✅ Видео готовы. Отправляю", with_keyboard=False)
+    for start in range(0, len(ready), MEDIA_GROUP_SIZE):
+        await _send_group(bot, chat_id, ready[start:start + MEDIA_GROUP_SIZE])
+
+
+def _send_kwargs(item: Dict) -> Dict:
+    """Параметры видео для отправки; для видео из кэша Telegram их уже знает"""
+    return video_kwargs(item.get("metadata")) if item["status"] == "downloaded" else {}
+
+
+async def _send_group(bot: Bot, chat_id: int, group: List[Dict]):
+    """
+    Отправляет группу готовых видео альбомом (одно видео - обычным сообщением)
+    
+    Если альбом отправить не удалось, видео отправляются по одному, чтобы
+    одно проблемное видео не помешало остальным. Статус элементов меняется
+    на "sent" или "failed".
+    """
+    backend = get_delivery_backend()
+    inputs = [item.get("file_id") or backend.make_input(item["file_path"]) for item in group]
+    
+    messages: List[Optional[Message]]
+    try:
+        if len(group) == 1:
+            messages = [await bot.send_video(chat_id=chat_id, video=inputs[0], **_send_kwargs(group[0]))]
+        else:
+            messages = await bot.send_media_group(
+                chat_id=chat_id,
+                media=[InputMediaVideo(media=value, **_send_kwargs(item)) for item, value in zip(group, inputs)]
+            )
+    except Exception as e:
+        logger.warning(f"Не удалось отправить альбом из {len(group)} видео, отправляю по одному: {e}")
+        messages = []
+        for item, value in zip(group, inputs):
+            try:
+                messages.append(await bot.send_video(chat_id=chat_id, video=value, **_send_kwargs(item)))
+            except Exception as e:
+                logger.warning(f"Не удалось отправить видео: {e}")
+                if item["status"] == "cached" and item.get("cache_key"):
+                    # file_id мог стать недействительным, в следующий раз скачаем заново
+                    async for session in get_db():
+                        await MediaCacheService.invalidate(session, item["cache_key"])
+                messages.append(None)
+    
+    for item, message in zip(group, messages):
+        if message is None:
+            item["status"] = "failed"
+            item["error"] = "Видео готово, но произошла ошибка при отправке."
+            continue
+        if item["status"] == "downloaded" and message.video:
+            item["file_id"] = message.video.file_id
+            await save_file_id(item["cache_key"], message.video.file_id, title=item.get("title"), duration=item.get("duration"))
+        item["status"] = "sent"
+        item["message_id"] = message.message_id
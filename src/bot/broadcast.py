@@ -0,0 +1,211 @@
+"""Массовая рассылка сообщений всем пользователям"""
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from database import get_db
+from services.broadcast_service import BroadcastService
+from services.user_service import UserService
+from services.rate_limiter import TokenBucket
+from config.settings import settings
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Максимум попыток отправки одному пользователю при RetryAfter
+MAX_SEND_ATTEMPTS = 3
+
+# Владелец аренды рассылок, которые выполняет этот процесс
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Запущенные в этом процессе рассылки по id
+_running: Dict[int, asyncio.Task] = {}
+
+
+def start_broadcast(bot: Bot, broadcast_id: int) -> Optional[asyncio.Task]:
+    """Запустить рассылку в фоне, если она еще не выполняется в этом процессе"""
+    if broadcast_id in _running:
+        return None
+    task = asyncio.create_task(run_broadcast(bot, broadcast_id))
+    _running[broadcast_id] = task
+    task.add_done_callback(lambda _: _running.pop(broadcast_id, None))
+    return task
+
+
+async def resume_broadcasts(bot: Bot):
+    """
+    Продолжить рассылки, прерванные остановкой бота или падением другой реплики
+    
+    Рассылку продолжит только процесс, который возьмет ее в аренду (см. run_broadcast).
+    """
+    async for session in get_db():
+        broadcasts = await BroadcastService.get_unfinished(session)
+    for broadcast in broadcasts:
+        start_broadcast(bot, broadcast.id)
+
+
+async def run_broadcast_resumer(bot: Bot):
+    """Периодически подбирает рассылки, аренда которых истекла"""
+    while True:
+        try:
+            await resume_broadcasts(bot)
+        except Exception as e:
+            logger.error(f"Ошибка при поиске прерванных рассылок: {e}")
+        await asyncio.sleep(settings.BROADCAST_LEASE_SECONDS)
+
+
+async def stop_broadcasts():
+    """Остановить рассылки; прогресс сохранен, после перезапуска они продолжатся"""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def keep_lease(broadcast_id: int, task: asyncio.Task):
+    """
+    Продлевает аренду рассылки, пока она выполняется (после RetryAfter пачка
+    может идти дольше аренды). Если аренда потеряна, останавливает рассылку
+    """
+    deadline = time.monotonic() + settings.BROADCAST_LEASE_SECONDS
+    while True:
+        await asyncio.sleep(settings.BROADCAST_LEASE_SECONDS / 3)
+        try:
+            async for session in get_db():
+                renewed = await BroadcastService.renew(session, broadcast_id, OWNER_ID)
+        except Exception as e:
+            logger.warning(f"Не удалось продлить аренду рассылки {broadcast_id}: {e}")
+            if time.monotonic() < deadline:
+                continue
+            renewed = False
+        if not renewed:
+            logger.warning(f"Рассылка {broadcast_id} больше не принадлежит процессу {OWNER_ID}, останавливаю")
+            task.cancel()
+            return
+        deadline = time.monotonic() + settings.BROADCAST_LEASE_SECONDS
+
+
+async def run_broadcast(bot: Bot, broadcast_id: int):
+    """
+    Выполняет рассылку, если удалось взять ее в аренду
+    
+    Пользователи читаются пачками по telegram_id (keyset-пагинация), сообщения
+    отправляются группами по BROADCAST_CONCURRENCY с общим ограничением частоты.
+    Прогресс сохраняется после каждой группы, поэтому доставка "хотя бы один
+    раз": после падения процесса сообщение повторно получат не больше
+    BROADCAST_CONCURRENCY пользователей.
+    """
+    async for session in get_db():
+        broadcast = await BroadcastService.claim(session, broadcast_id, OWNER_ID)
+    if broadcast is None:
+        return
+    if broadcast.last_telegram_id:
+        logger.info(f"Продолжаю рассылку {broadcast.id} с telegram_id > {broadcast.last_telegram_id}")
+    
+    heartbeat = asyncio.create_task(keep_lease(broadcast_id, asyncio.current_task()))
+    try:
+        await _run_claimed(bot, broadcast)
+    finally:
+        heartbeat.cancel()
+        try:
+            async for session in get_db():
+                await BroadcastService.release(session, broadcast_id, OWNER_ID)
+        except Exception as e:
+            logger.warning(f"Не удалось вернуть аренду рассылки {broadcast_id}: {e}")
+
+
+async def _run_claimed(bot: Bot, broadcast):
+    """Отправляет рассылку, взятую в аренду этим процессом"""
+    broadcast_id = broadcast.id
+    bucket = TokenBucket(rate=settings.BROADCAST_RATE)
+    
+    cursor = broadcast.last_telegram_id
+    sent = broadcast.sent
+    failed = broadcast.failed
+    processed_at_start = sent + failed
+    started = time.monotonic()
+    last_status_update = started
+    
+    while True:
+        async for session in get_db():
+            page = await UserService.get_user_ids_after(session, cursor, settings.BROADCAST_BATCH_SIZE)
+        if not page:
+            break
+        
+        for start in range(0, len(page), settings.BROADCAST_CONCURRENCY):
+            user_ids = page[start:start + settings.BROADCAST_CONCURRENCY]
+            results = await asyncio.gather(*(
+                _send(bot, user_id, broadcast.text, bucket) for user_id in user_ids
+            ))
+            delivered = sum(results)
+            sent += delivered
+            failed += len(results) - delivered
+            cursor = user_ids[-1]
+            
+            async for session in get_db():
+                saved = await BroadcastService.save_progress(session, broadcast_id, OWNER_ID, cursor, sent, failed)
+            if not saved:
+                logger.warning(f"Рассылка {broadcast_id} перешла к другому процессу, останавливаю")
+                return
+            
+            now = time.monotonic()
+            if now - last_status_update >= settings.BROADCAST_STATUS_INTERVAL:
+                last_status_update = now
+                rate = (sent + failed - processed_at_start) / (now - started)
+                await _edit_status(
+                    bot, broadcast,
+                    f"Рассылка выполняется\n\n"
+                    f"• Обработано: {sent + failed} из {broadcast.total_users}\n"
+                    f"• Успешно отправлено: {sent}\n"
+                    f"• Ошибок: {failed}\n"
+                    f"• Скорость: {rate:.1f} сообщений/с"
+                )
+    
+    async for session in get_db():
+        await BroadcastService.finish(session, broadcast_id)
+    
+    elapsed = time.monotonic() - started
+    logger.info(f"Рассылка {broadcast_id} завершена: отправлено {sent}, ошибок {failed}, {elapsed:.0f} с")
+    await _edit_status(
+        bot, broadcast,
+        f"Рассылка завершена\n\n"
+        f"Статистика:\n"
+        f"• Всего пользователей: {sent + failed}\n"
+        f"• Успешно отправлено: {sent}\n"
+        f"• Ошибок: {failed}"
+    )
+
+
+async def _send(bot: Bot, chat_id: int, text: str, bucket: TokenBucket) -> bool:
+    """Отправляет сообщение одному пользователю с учетом лимитов Telegram"""
+    for _ in range(MAX_SEND_ATTEMPTS):
+        await bucket.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать: приостанавливаем всю рассылку
+            logger.warning(f"RetryAfter при рассылке, пауза {e.retry_after} с")
+            bucket.pause(e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest):
+            # Пользователь заблокировал бота или чат недоступен
+            return False
+        except Exception as e:
+            logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+            return False
+    return False
+
+
+async def _edit_status(bot: Bot, broadcast, text: str):
+    """Обновляет сообщение о статусе рассылки у администратора"""
+    try:
+        await bot.edit_message_text(
+            chat_id=broadcast.admin_chat_id,
+            message_id=broadcast.status_message_id,
+            text=text
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось обновить статус рассылки: {e}")
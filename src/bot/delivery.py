@@ -0,0 +1,391 @@
+"""Доставка видео пользователю: получение, отправка и сообщения о статусе"""
+from aiogram import Bot
+from aiogram.exceptions import TelegramEntityTooLarge
+from aiogram.types import Message
+from config.settings import settings
+from database import get_db
+from services.user_service import user_counters
+from services.media_cache_service import MediaCacheService
+from services.info_cache import info_cache
+from services.video_downloader import cleanup_download, download_video, get_stream_source, probe_video, video_errors
+from services.metrics import Counter, Histogram
+from services.link_router import get_platform
+from services.download_pool import DownloadPoolBusyError
+from services.single_flight import SingleFlight
+from services.progress import ProgressPublisher
+from services.media_metadata import collect_metadata, video_kwargs
+from services.postprocess import FFMPEG, prefix_has_faststart
+from services.delivery_backend import DeliveryBackend, StreamTooLargeError, get_delivery_backend
+from bot.keyboards import get_main_keyboard
+from bot.responses import get_responses
+from typing import Callable, Dict, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+video_requests_total = Counter(
+    "video_requests_total",
+    "Запросы на скачивание видео по платформам",
+    labels=("platform",)
+)
+request_duration = Histogram(
+    "video_request_duration_seconds",
+    "Время обработки ссылки от получения сообщения до ответа",
+    labels=("platform", "status")
+)
+upload_duration = Histogram(
+    "video_upload_duration_seconds",
+    "Время отправки видео в Telegram",
+    labels=("platform", "mode")
+)
+
+# Одновременные запросы одного и того же видео обрабатываются одной задачей
+video_requests = SingleFlight()
+
+
+async def deliver_video(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    url: str,
+    status_message_id: int,
+    shared: bool = True
+) -> Dict:
+    """
+    Скачивает видео по канонической ссылке и отправляет его в чат
+    
+    Результат и ошибки показываются пользователю через сообщение о статусе.
+    shared=False - не объединять с одновременными запросами той же ссылки:
+    тогда отмена вызова отменяет и скачивание с отправкой.
+    
+    Returns:
+        dict со статусом "completed" и file_id или dict с ошибкой
+    """
+    try:
+        if shared:
+            # Одинаковые ссылки, присланные одновременно, скачиваются один раз
+            result = await video_requests.run(url, fetch_and_send_video, bot, chat_id, url, status_message_id)
+        else:
+            result = await fetch_and_send_video(bot, chat_id, url, status_message_id)
+        
+        if result.get("status") == "completed":
+            # Видео скачивала задача другого пользователя: отправляем по file_id,
+            # а если его нет (например, Telegram принял файл документом) - копией сообщения
+            if result.get("chat_id") != chat_id:
+                if result.get("file_id"):
+                    await bot.send_video(chat_id=chat_id, video=result["file_id"])
+                else:
+                    await bot.copy_message(
+                        chat_id=chat_id,
+                        from_chat_id=result["chat_id"],
+                        message_id=result["message_id"]
+                    )
+            
+            # Увеличиваем счетчик скачанных видео (запишется в базу фоновой задачей)
+            user_counters.add_video_downloaded(user_id)
+            
+            # Отправляем меню отдельным сообщением
+            await bot.send_message(
+                chat_id=chat_id,
+                text=get_responses().choose_action,
+                reply_markup=get_main_keyboard()
+            )
+            
+            # Удаляем временное сообщение о статусе
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=status_message_id)
+            except:
+                pass
+        else:
+            # Ошибка при скачивании или отправке
+            error = result.get("error", "Неизвестная ошибка")
+            await edit_status(bot, chat_id, status_message_id, f"❌ {error}")
+        return result
+    except DownloadPoolBusyError as e:
+        logger.warning(f"Пул загрузок занят: {e}")
+        await edit_status(
+            bot, chat_id, status_message_id,
+            "⏳ Сейчас бот обрабатывает слишком много видео.\n\n"
+            "Повторите попытку через минуту."
+        )
+        return {"status": "failed", "error": str(e)}
+    except Exception as e:
+        logger.error(f"Критическая ошибка при обработке видео: {e}", exc_info=True)
+        await edit_status(
+            bot, chat_id, status_message_id,
+            "❌ Произошла критическая ошибка при обработке запроса.\n\n"
+            "Попробуйте:\n"
+            "• Проверить правильность ссылки\n"
+            "• Повторить попытку через несколько секунд\n"
+            "• Использовать /help для получения справки"
+        )
+        return {"status": "failed", "error": str(e)}
+
+
+async def fetch_and_send_video(bot: Bot, chat_id: int, url: str, status_message_id: int) -> Dict:
+    """
+    Получает видео и отправляет его в чат пользователя, запустившего задачу
+    
+    Returns:
+        dict со статусом "completed", file_id, chat_id и message_id отправленного
+        сообщения или dict с ошибкой
+    """
+    # Если id видео виден в ссылке, проверяем кэш file_id еще до разбора страницы
+    url_cache_key = MediaCacheService.make_url_cache_key(url)
+    if url_cache_key:
+        file_id = await send_cached_video(bot, chat_id, url_cache_key)
+        if file_id:
+            return {"status": "completed", "file_id": file_id, "chat_id": chat_id}
+    
+    # Иначе получаем информацию о видео, чтобы проверить кэш до скачивания
+    probe = await probe_video(url)
+    if probe.get("status") != "probed":
+        return probe
+    
+    info = probe["info"]
+    cache_key = MediaCacheService.make_cache_key(info)
+    
+    # Если видео уже отправлялось, пересылаем его по file_id
+    if cache_key and cache_key != url_cache_key:
+        file_id = await send_cached_video(bot, chat_id, cache_key)
+        if file_id:
+            return {"status": "completed", "file_id": file_id, "chat_id": chat_id}
+    if cache_key or url_cache_key:
+        MediaCacheService.record_miss()
+    
+    backend = get_delivery_backend()
+    sent = None
+    
+    # Однофайловые форматы передаем в Telegram прямо из источника, без диска
+    source = get_stream_source(info) if settings.STREAM_UPLOADS and backend.supports_streaming else None
+    if source and not await _stream_has_faststart(bot, backend, source):
+        source = None
+    if source:
+        try:
+            sent = await _send_streamed(bot, chat_id, url, backend, source, status_message_id)
+        except (StreamTooLargeError, TelegramEntityTooLarge):
+            video_errors.inc(platform=get_platform(url), error_class="too_large")
+            return too_large_result(backend)
+        result = source
+    
+    if sent is None:
+        result = await _download_and_send(
+            bot, chat_id, url, info, backend, status_message_id, cached=probe.get("cached", False)
+        )
+        if result.get("status") != "sent":
+            return result
+        sent = result["message"]
+    
+    file_id = sent.video.file_id if sent.video else None
+    
+    # Запоминаем file_id, чтобы повторные запросы не скачивали видео заново
+    await save_file_id(cache_key, file_id, title=result.get("title"), duration=result.get("duration"))
+    
+    return {"status": "completed", "file_id": file_id, "chat_id": chat_id, "message_id": sent.message_id}
+
+
+async def download_for_delivery(
+    url: str,
+    info: Dict,
+    cached: bool = False,
+    progress_hook: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Скачивает видео из полученной информации
+    
+    Если info взят из кэша и скачать по нему не удалось (подписанные ссылки
+    могли истечь раньше TTL), страница разбирается заново.
+    """
+    result = await download_video(url, info=info, progress_hook=progress_hook)
+    if result.get("status") != "completed" and cached:
+        logger.info(f"Не удалось скачать видео по info из кэша, получаю заново: {url}")
+        await info_cache.invalidate(url)
+        result = await download_video(url, progress_hook=progress_hook)
+    return result
+
+
+def _progress_text(snapshot: Dict) -> str:
+    """Текст сообщения о статусе с прогрессом скачивания"""
+    text = f"⏳ Скачиваю видео: {snapshot['percent']:.0f}%"
+    if snapshot.get("total_bytes"):
+        text += f" из {snapshot['total_bytes'] / (1024 * 1024):.1f} МБ"
+    if snapshot.get("speed"):
+        text += f", {snapshot['speed'] / (1024 * 1024):.1f} МБ/с"
+    return text
+
+
+async def save_file_id(cache_key: Optional[str], file_id: Optional[str], title: Optional[str] = None, duration: Optional[int] = None):
+    """Сохраняет file_id отправленного видео в кэш; ошибки только логируются"""
+    if not cache_key or not file_id:
+        return
+    try:
+        async for session in get_db():
+            await MediaCacheService.save_file_id(session, cache_key, file_id, title=title, duration=duration)
+    except Exception as e:
+        logger.error(f"Не удалось сохранить file_id в кэш: {e}", exc_info=True)
+
+
+async def _stream_has_faststart(bot: Bot, backend: DeliveryBackend, source: Dict) -> bool:
+    """
+    Можно ли отправить источник потоком без перепаковки
+    
+    Поток не проходит постобработку, поэтому при FFMPEG_FASTSTART потоком идут
+    только файлы с moov перед mdat: остальные клиенты Telegram не начнут
+    проигрывать до полной загрузки. Такие файлы скачиваются и перепаковываются.
+    """
+    if not (FFMPEG and settings.FFMPEG_FASTSTART):
+        return True
+    try:
+        prefix = await backend.read_stream_prefix(bot, source, settings.STREAM_PROBE_BYTES)
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать начало источника, скачиваем на диск: {e}")
+        return False
+    if prefix_has_faststart(prefix):
+        return True
+    logger.info("moov не в начале файла источника, скачиваем и перепаковываем")
+    return False
+
+
+async def _send_streamed(
+    bot: Bot,
+    chat_id: int,
+    url: str,
+    backend: DeliveryBackend,
+    source: Dict,
+    status_message_id: int
+) -> Optional[Message]:
+    """
+    Отправляет видео потоком из источника
+    
+    Returns:
+        Отправленное сообщение или None, если источник не удалось передать
+        потоком и видео нужно скачать на диск
+    """
+    await edit_status(bot, chat_id, status_message_id, "⏳ Отправляю видео", with_keyboard=False)
+    try:
+        started = time.perf_counter()
+        sent = await backend.send_video_stream(bot, chat_id, source, **video_kwargs(source))
+        upload_duration.observe(time.perf_counter() - started, platform=get_platform(url), mode="stream")
+        return sent
+    except (StreamTooLargeError, TelegramEntityTooLarge):
+        raise
+    except Exception as e:
+        logger.warning(f"Не удалось отправить видео потоком, скачиваем на диск: {e}")
+        return None
+
+
+async def _download_and_send(
+    bot: Bot,
+    chat_id: int,
+    url: str,
+    info: Dict,
+    backend: DeliveryBackend,
+    status_message_id: int,
+    cached: bool = False
+) -> Dict:
+    """
+    Скачивает видео на диск и отправляет файл
+    
+    Returns:
+        dict со статусом "sent", отправленным сообщением и метаданными или dict с ошибкой
+    """
+    # Прогресс скачивания показываем в сообщении о статусе
+    progress = ProgressPublisher(
+        lambda snapshot: edit_status(bot, chat_id, status_message_id, _progress_text(snapshot), with_keyboard=False)
+    )
+    
+    # Скачиваем видео из уже полученной информации
+    try:
+        result = await download_for_delivery(url, info, cached, progress_hook=progress.hook)
+    finally:
+        # Дожидаемся последнего обновления прогресса, чтобы оно не перезаписало следующий статус
+        await progress.close()
+    if result.get("status") != "completed":
+        return result
+    
+    file_path = result["file_path"]
+    platform = get_platform(url)
+    
+    try:
+        # Размер проверяем до отправки: лимит зависит от способа отправки
+        if not backend.fits(os.path.getsize(file_path)):
+            video_errors.inc(platform=platform, error_class="too_large")
+            return too_large_result(backend)
+        
+        await edit_status(bot, chat_id, status_message_id, "✅ Видео готово. Отправляю", with_keyboard=False)
+        # Длительность, размеры и превью избавляют Telegram от анализа файла,
+        # а клиенты сразу показывают кадр вместо черной заглушки
+        metadata = await collect_metadata(file_path, result)
+        # Отправляем видео без клавиатуры
+        started = time.perf_counter()
+        sent = await backend.send_video(bot, chat_id, file_path, **video_kwargs(metadata))
+        upload_duration.observe(time.perf_counter() - started, platform=platform, mode="disk")
+    except TelegramEntityTooLarge:
+        video_errors.inc(platform=platform, error_class="too_large")
+        return too_large_result(backend)
+    except Exception as e:
+        error_msg = str(e).lower()
+        if "timeout" in error_msg or "timed out" in error_msg:
+            video_errors.inc(platform=platform, error_class="upload_timeout")
+            error = (
+                "Видео готово, но произошла ошибка при отправке из-за таймаута.\n\n"
+                "Попробуйте запросить видео снова."
+            )
+        else:
+            video_errors.inc(platform=platform, error_class="upload_failed")
+            error = (
+                "Видео готово, но произошла ошибка при отправке.\n\n"
+                "Попробуйте запросить видео снова или обратитесь в поддержку."
+            )
+        return {"status": "failed", "error": error}
+    finally:
+        # Удаляем скачанный файл вместе с рабочей директорией задачи
+        cleanup_download(file_path)
+    
+    return {"status": "sent", "message": sent, "title": result.get("title"), "duration": result.get("duration")}
+
+
+def too_large_result(backend: DeliveryBackend) -> Dict:
+    """Ошибка для файла, который не укладывается в лимит способа отправки"""
+    return {
+        "status": "failed",
+        "error": (
+            "Видео готово, но файл слишком большой для отправки в Telegram.\n\n"
+            f"Максимальный размер файла: {backend.max_file_size // (1024 * 1024)} МБ.\n"
+            "Попробуйте скачать видео с меньшим разрешением или сократить длительность."
+        )
+    }
+
+
+async def send_cached_video(bot: Bot, chat_id: int, cache_key: str) -> Optional[str]:
+    """Отправляет видео из кэша по file_id. Возвращает file_id, если видео отправлено"""
+    async for session in get_db():
+        file_id = await MediaCacheService.get_file_id(session, cache_key)
+    if not file_id:
+        return None
+    
+    try:
+        await bot.send_video(chat_id=chat_id, video=file_id)
+    except Exception as e:
+        # file_id мог стать недействительным, скачиваем видео заново
+        logger.warning(f"Не удалось отправить видео из кэша {cache_key}: {e}")
+        async for session in get_db():
+            await MediaCacheService.invalidate(session, cache_key)
+        return None
+    
+    return file_id
+
+
+async def edit_status(bot: Bot, chat_id: int, message_id: int, text: str, with_keyboard: bool = True):
+    """Обновляет сообщение о статусе обработки"""
+    try:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            reply_markup=get_main_keyboard() if with_keyboard else None
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось обновить сообщение о статусе: {e}")
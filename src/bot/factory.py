@@ -1,4 +1,5 @@
 """Создание и настройка диспетчера бота"""
+import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from database.database import init_db
@@ -6,6 +7,26 @@ from bot.handlers.commands import router as commands_router
 from bot.handlers.video import router as video_router
 from bot.handlers.messages import router as messages_router
 from config.settings import settings
+from services.download_pool import download_pool
+from services.media_cache_service import run_media_cache_eviction
+from services.info_cache import info_cache, run_info_cache_eviction
+from services.storage import run_storage_janitor
+from services.ydl_pool import ydl_pool
+from services.url_normalizer import close_session as close_url_session
+from services.postprocess import shutdown_transcoder
+from services.user_service import flush_user_counters, run_user_counters_flush
+from bot.broadcast import run_broadcast_resumer, stop_broadcasts
+from bot.webhook import run_webhook
+from bot.session import create_bot_session
+from bot.metrics import start_metrics_server
+from bot.admission import AdmissionMiddleware
+from services.admission import admission
+from aiohttp import web
+from typing import Optional
+
+# Фоновые задачи, запущенные при старте бота
+_background_tasks: list[asyncio.Task] = []
+_metrics_runner: Optional[web.AppRunner] = None
 
 
 def create_dispatcher() -> Dispatcher:
@@ -17,6 +38,9 @@ def create_dispatcher() -> Dispatcher:
     dp.include_router(video_router)
     dp.include_router(messages_router)
     
+    # Лимиты на пользователя и общая очередь для ссылок на видео
+    video_router.message.middleware(AdmissionMiddleware(admission))
+    
     # Регистрируем обработчики событий
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
@@ -24,22 +48,49 @@ def create_dispatcher() -> Dispatcher:
     return dp
 
 
-async def on_startup():
+async def on_startup(bot: Bot):
     """Инициализация при запуске бота"""
+    global _metrics_runner
     await init_db()
+    _metrics_runner = await start_metrics_server()
+    # Рассылки, прерванные остановкой этой или другой реплики
+    _background_tasks.append(asyncio.create_task(run_broadcast_resumer(bot)))
+    _background_tasks.append(asyncio.create_task(run_media_cache_eviction()))
+    _background_tasks.append(asyncio.create_task(run_user_counters_flush()))
+    _background_tasks.append(asyncio.create_task(run_storage_janitor()))
+    if info_cache.persistent is not None:
+        _background_tasks.append(asyncio.create_task(run_info_cache_eviction()))
 
 
 async def on_shutdown():
     """Очистка при остановке бота"""
-    pass
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    await stop_broadcasts()
+    
+    # Дожидаемся завершения начатых загрузок
+    await download_pool.shutdown(timeout=settings.DOWNLOAD_SHUTDOWN_TIMEOUT)
+    ydl_pool.close()
+    shutdown_transcoder()
+    await close_url_session()
+    
+    # Записываем накопленные счетчики пользователей
+    await flush_user_counters()
+    
+    if _metrics_runner is not None:
+        await _metrics_runner.cleanup()
 
 
 async def main():
     """Главная функция запуска бота"""
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, session=create_bot_session())
     dp = create_dispatcher()
     
-    await dp.start_polling(bot)
+    if settings.BOT_RUN_MODE == "webhook":
+        await run_webhook(dp, bot)
+    else:
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
@@ -5,8 +5,9 @@ from aiogram.filters import Command
 from database.database import get_db
 from services.user_service import UserService
 from config.settings import settings
-from bot.keyboards import get_main_keyboard
-import asyncio
+from services.broadcast_service import BroadcastService
+from bot.responses import get_responses
+from bot.broadcast import start_broadcast
 from datetime import datetime
 
 router = Router()
@@ -33,41 +34,17 @@ async def cmd_start(message: Message):
         )
     
     # Формируем приветствие
+    responses = get_responses(message.from_user.language_code)
     user_name = message.from_user.first_name or message.from_user.username
-    greeting = f"Привет, {user_name}" if user_name else "Привет"
     
-    await message.answer(
-        f"{greeting}\n\n"
-        "🎥 Видео загрузчик\n\n"
-        "Я помогу вам скачать видео из:\n"
-        "• Instagram\n"
-        "• TikTok\n"
-        "• YouTube Shorts\n\n"
-        "Просто отправьте мне ссылку на видео, и я скачаю его для вас.\n"
-        "Поддерживаются видео до 5 минут.\n\n"
-        "Бесплатно и без ограничений.",
-        reply_markup=get_main_keyboard()
-    )
+    await message.answer(responses.greet(user_name), reply_markup=responses.main_keyboard)
 
 
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     """Обработчик команды /help"""
-    await message.answer(
-        "Как использовать:\n\n"
-        "1. Отправьте ссылку на видео из:\n"
-        "   • Instagram\n"
-        "   • TikTok\n"
-        "   • YouTube Shorts\n"
-        "2. Получите скачанное видео\n\n"
-        "Просто скопируйте и отправьте ссылку - бот автоматически распознает её и начнет скачивание.\n\n"
-        "Поддерживаются видео до 5 минут. Более длинные видео не скачиваются.\n\n"
-        "Команды:\n"
-        "/stats - Посмотреть вашу статистику\n"
-        "/examples - Примеры использования\n"
-        "/privacy - Политика конфиденциальности",
-        reply_markup=get_main_keyboard()
-    )
+    responses = get_responses(message.from_user.language_code)
+    await message.answer(responses.help, reply_markup=responses.main_keyboard)
 
 
 @router.callback_query(lambda c: c.data == "help")
@@ -75,46 +52,22 @@ async def callback_help(callback: CallbackQuery):
     """Обработчик callback кнопки Помощь"""
     await callback.answer()
     # Отправляем новое сообщение, так как callback может быть из другого сообщения
-    await callback.message.answer(
-        "Как использовать:\n\n"
-        "1. Отправьте ссылку на видео из:\n"
-        "   • Instagram\n"
-        "   • TikTok\n"
-        "   • YouTube Shorts\n"
-        "2. Получите скачанное видео\n\n"
-        "Просто скопируйте и отправьте ссылку - бот автоматически распознает её и начнет скачивание.\n\n"
-        "Поддерживаются видео до 5 минут. Более длинные видео не скачиваются.\n\n"
-        "Команды:\n"
-        "/stats - Посмотреть вашу статистику\n"
-        "/examples - Примеры использования\n"
-        "/privacy - Политика конфиденциальности",
-        reply_markup=get_main_keyboard()
-    )
+    responses = get_responses(callback.from_user.language_code)
+    await callback.message.answer(responses.help, reply_markup=responses.main_keyboard)
 
 
 @router.callback_query(lambda c: c.data == "examples")
 async def callback_examples(callback: CallbackQuery):
     """Обработчик callback кнопки Примеры"""
     await callback.answer()
-    await callback.message.answer(
-        "Примеры использования:\n\n"
-        "1. Сохранение понравившегося видео из TikTok\n"
-        "   Отправьте ссылку на видео, чтобы сохранить его для просмотра позже\n\n"
-        "2. Создание личной коллекции контента\n"
-        "   Собирайте интересные видео из разных платформ в одном месте\n\n"
-        "3. Офлайн просмотр видео\n"
-        "   Скачайте видео для просмотра без интернета\n\n"
-        "4. Сохранение видео для дальнейшего использования\n"
-        "   Используйте скачанные видео для создания собственного контента\n\n"
-        "Как использовать:\n"
-        "Просто отправьте ссылку на видео из Instagram, TikTok или YouTube Shorts.",
-        reply_markup=get_main_keyboard()
-    )
+    responses = get_responses(callback.from_user.language_code)
+    await callback.message.answer(responses.examples, reply_markup=responses.main_keyboard)
 
 
 @router.callback_query(lambda c: c.data == "stats")
 async def callback_stats(callback: CallbackQuery):
     """Обработчик callback кнопки Статистика"""
+    responses = get_responses(callback.from_user.language_code)
     await callback.answer()
     # Создаем временный объект Message для передачи в cmd_stats
     # Используем callback.message как основу
@@ -188,12 +141,12 @@ async def callback_stats(callback: CallbackQuery):
             
             await callback.message.answer(
                 stats_text,
-                reply_markup=get_main_keyboard()
+                reply_markup=responses.main_keyboard
             )
         else:
             await callback.message.answer(
-                "Статистика не найдена. Используйте /start для регистрации.",
-                reply_markup=get_main_keyboard()
+                responses.stats_not_found,
+                reply_markup=responses.main_keyboard
             )
         break
 
@@ -201,6 +154,7 @@ async def callback_stats(callback: CallbackQuery):
 @router.callback_query(lambda c: c.data == "invite")
 async def callback_invite(callback: CallbackQuery):
     """Обработчик callback кнопки Пригласить"""
+    responses = get_responses(callback.from_user.language_code)
     await callback.answer()
     bot_info = await callback.bot.get_me()
     bot_username = bot_info.username or settings.TELEGRAM_BOT_NAME or "your_bot"
@@ -211,53 +165,27 @@ async def callback_invite(callback: CallbackQuery):
         f"Ссылка для приглашения:\n{invite_link}\n\n"
         "Поделитесь этой ссылкой с друзьями, и они смогут начать использовать бота."
     )
-    await callback.message.answer(invite_text, reply_markup=get_main_keyboard())
+    await callback.message.answer(invite_text, reply_markup=responses.main_keyboard)
 
 
 @router.message(Command("examples"))
 async def cmd_examples(message: Message):
     """Обработчик команды /examples"""
-    await message.answer(
-        "Примеры использования:\n\n"
-        "1. Сохранение понравившегося видео из TikTok\n"
-        "   Отправьте ссылку на видео, чтобы сохранить его для просмотра позже\n\n"
-        "2. Создание личной коллекции контента\n"
-        "   Собирайте интересные видео из разных платформ в одном месте\n\n"
-        "3. Офлайн просмотр видео\n"
-        "   Скачайте видео для просмотра без интернета\n\n"
-        "4. Сохранение видео для дальнейшего использования\n"
-        "   Используйте скачанные видео для создания собственного контента\n\n"
-        "Как использовать:\n"
-        "Просто отправьте ссылку на видео из Instagram, TikTok или YouTube Shorts.",
-        reply_markup=get_main_keyboard()
-    )
+    responses = get_responses(message.from_user.language_code)
+    await message.answer(responses.examples, reply_markup=responses.main_keyboard)
 
 
 @router.message(Command("privacy"))
 async def cmd_privacy(message: Message):
     """Обработчик команды /privacy"""
-    await message.answer(
-        "Политика конфиденциальности:\n\n"
-        "Бот собирает и хранит только необходимую информацию для работы:\n"
-        "• Telegram ID пользователя\n"
-        "• Статистика использования (количество запросов, скачанных видео)\n"
-        "• Дата последней активности\n\n"
-        "Данные используются исключительно для:\n"
-        "• Предоставления услуг бота\n"
-        "• Улучшения работы сервиса\n"
-        "• Статистики использования\n\n"
-        "Гарантии:\n"
-        "• Видео удаляются сразу после отправки пользователю\n"
-        "• Данные не передаются третьим лицам\n"
-        "• Данные не используются для рекламы\n\n"
-        "По вопросам конфиденциальности обращайтесь к администратору.",
-        reply_markup=get_main_keyboard()
-    )
+    responses = get_responses(message.from_user.language_code)
+    await message.answer(responses.privacy, reply_markup=responses.main_keyboard)
 
 
 @router.message(Command("stats"))
 async def cmd_stats(message: Message):
     """Обработчик команды /stats"""
+    responses = get_responses(message.from_user.language_code)
     async for session in get_db():
         stats = await UserService.get_user_stats(session, message.from_user.id)
         if stats:
@@ -328,12 +256,12 @@ async def cmd_stats(message: Message):
             
             await message.answer(
                 stats_text,
-                reply_markup=get_main_keyboard()
+                reply_markup=responses.main_keyboard
             )
         else:
             await message.answer(
-                "Статистика не найдена. Используйте /start для регистрации.",
-                reply_markup=get_main_keyboard()
+                responses.stats_not_found,
+                reply_markup=responses.main_keyboard
             )
         break
 
@@ -341,11 +269,12 @@ async def cmd_stats(message: Message):
 @router.message(Command("admin"))
 async def cmd_admin(message: Message):
     """Обработчик команды /admin для массовой рассылки"""
+    responses = get_responses(message.from_user.language_code)
     # Проверяем права администратора
     if not is_admin(message.from_user.id):
         await message.answer(
-            "У вас нет прав для выполнения этой команды.",
-            reply_markup=get_main_keyboard()
+            responses.admin_denied,
+            reply_markup=responses.main_keyboard
         )
         return
     
@@ -355,63 +284,37 @@ async def cmd_admin(message: Message):
     
     if len(parts) < 2:
         await message.answer(
-            "Команда массовой рассылки\n\n"
-            "Использование: /admin <текст сообщения>\n\n"
-            "Пример: /admin Привет. Это массовая рассылка.",
-            reply_markup=get_main_keyboard()
+            responses.admin_usage,
+            reply_markup=responses.main_keyboard
         )
         return
     
     broadcast_text = parts[1]
-    bot = message.bot
     
-    # Получаем всех пользователей
     async for session in get_db():
-        users = await UserService.get_all_users(session, limit=10000)
-        
-        if not users:
-            await message.answer(
-                "Пользователи не найдены.",
-                reply_markup=get_main_keyboard()
-            )
-            return
-        
-        total_users = len(users)
-        successful = 0
-        failed = 0
-        
-        # Отправляем сообщение о начале рассылки
-        status_msg = await message.answer(
-            f"Начинаю рассылку сообщения {total_users} пользователям\n\n"
-            f"Сообщение: {broadcast_text[:100]}..."
+        total_users = await UserService.get_total_users_count(session)
+    
+    if not total_users:
+        await message.answer(
+            responses.admin_no_users,
+            reply_markup=responses.main_keyboard
         )
-        
-        # Рассылаем сообщения
-        for user in users:
-            try:
-                await bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=broadcast_text
-                )
-                successful += 1
-                # Небольшая задержка, чтобы не превысить лимиты Telegram
-                await asyncio.sleep(0.05)
-            except Exception as e:
-                failed += 1
-                # Логируем ошибки, но продолжаем рассылку
-                continue
-        
-        # Обновляем статус
-        await bot.edit_message_text(
-            chat_id=message.chat.id,
-            message_id=status_msg.message_id,
-            text=(
-                f"Рассылка завершена\n\n"
-                f"Статистика:\n"
-                f"• Всего пользователей: {total_users}\n"
-                f"• Успешно отправлено: {successful}\n"
-                f"• Ошибок: {failed}"
-            )
+        return
+    
+    # Отправляем сообщение о начале рассылки
+    status_msg = await message.answer(
+        f"Начинаю рассылку сообщения {total_users} пользователям\n\n"
+        f"Сообщение: {broadcast_text[:100]}..."
+    )
+    
+    # Рассылка выполняется в фоне; прогресс сохраняется в базу,
+    # поэтому после перезапуска бота она продолжится с того же места
+    async for session in get_db():
+        broadcast = await BroadcastService.create(
+            session,
+            text=broadcast_text,
+            admin_chat_id=message.chat.id,
+            status_message_id=status_msg.message_id,
+            total_users=total_users
         )
-        break
-
+    start_broadcast(message.bot, broadcast.id)
@@ -1,7 +1,7 @@
 """Обработчики обычных сообщений"""
 from aiogram import Router
 from aiogram.types import Message
-from bot.keyboards import get_main_keyboard
+from bot.responses import get_responses
 
 router = Router()
 
@@ -9,12 +9,5 @@ router = Router()
 @router.message()
 async def echo_message(message: Message):
     """Обработчик всех остальных сообщений"""
-    await message.answer(
-        "Отправьте мне ссылку на видео из:\n"
-        "• Instagram\n"
-        "• TikTok\n"
-        "• YouTube Shorts\n\n"
-        "И я скачаю его для вас. Используйте /help для справки.",
-        reply_markup=get_main_keyboard()
-    )
-
+    responses = get_responses(message.from_user.language_code if message.from_user else None)
+    await message.answer(responses.fallback, reply_markup=responses.main_keyboard)
@@ -1,36 +1,36 @@
 """Обработчики для скачивания видео"""
 from aiogram import Router
-from aiogram.types import Message, FSInputFile
+from aiogram.types import Message
 from database import get_db
-from services.user_service import UserService
-from services.video_downloader import download_video
-from bot.keyboards import get_main_keyboard
-import re
-import os
+from services.user_service import UserService, user_counters
+from services.job_queue import JobQueueService
+from services.link_router import Link, link_router
+from services.url_normalizer import normalize_url
+from config.settings import settings
+from bot.batch import deliver_batch
+from bot.delivery import deliver_video, request_duration, video_requests_total
+from typing import List, Union
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 
-def is_video_url(text: str) -> bool:
-    """Проверяет, является ли текст ссылкой на видео"""
-    patterns = [
-        r'https?://(www\.)?instagram\.com/.+',
-        r'https?://(www\.)?(vm\.)?tiktok\.com/.+',
-        r'https?://(www\.)?(m\.)?youtube\.com/shorts/.+',
-        r'https?://youtu\.be/.+'
-    ]
-    return any(re.match(pattern, text.strip()) for pattern in patterns)
+def has_video_urls(message: Message) -> Union[bool, dict]:
+    """
+    Фильтр: в сообщении есть ссылки на видео
+    
+    Найденные ссылки (Link) передаются в обработчик и middleware как links.
+    Сообщение разбирается один раз, повторные вызовы берут результат из кэша роутера.
+    """
+    links = link_router.route_message(message)
+    return {"links": list(links)} if links else False
 
 
-@router.message(lambda m: m.text and is_video_url(m.text))
-async def process_video_url(message: Message):
-    """Обработка ссылок на видео (Instagram, TikTok, YouTube Shorts)"""
-    url = message.text.strip()
-    
-    # Регистрируем пользователя
+async def _register_user(message: Message):
+    """Регистрирует пользователя (или обновляет его данные)"""
     async for session in get_db():
         await UserService.get_or_create_user(
             session=session,
@@ -40,92 +40,96 @@ async def process_video_url(message: Message):
             last_name=message.from_user.last_name,
             language_code=message.from_user.language_code
         )
-        
-        await UserService.increment_requests(session, message.from_user.id)
+
+
+@router.message(has_video_urls)
+async def process_video_url(message: Message, links: List[Link]):
+    """Обработка ссылок на видео (Instagram, TikTok, YouTube Shorts)"""
+    if len(links) > 1:
+        await process_video_batch(message, links)
+        return
+    
+    url = links[0].url
+    started = time.perf_counter()
+    platform = links[0].platform
+    video_requests_total.inc(platform=platform)
+    
+    # Регистрируем пользователя
+    await _register_user(message)
+    
+    # Счетчик запросов копится в памяти и записывается в базу пачкой
+    user_counters.add_request(message.from_user.id)
     
     # Отправляем сообщение о начале обработки
     status_msg = await message.answer("⏳ Начинаю скачивание видео")
     
-    try:
-        # Скачиваем видео напрямую
-        result = await download_video(url)
-        
-        # Обрабатываем результат
-        if result.get("status") == "completed":
-            file_path = result.get("file_path")
-            
-            # Увеличиваем счетчик скачанных видео
-            async for session in get_db():
-                await UserService.increment_videos_downloaded(session, message.from_user.id)
-            
-            if file_path and os.path.exists(file_path):
-                try:
-                    await status_msg.edit_text("✅ Видео готово. Отправляю")
-                    video_file = FSInputFile(file_path)
-                    # Отправляем видео без клавиатуры
-                    await message.bot.send_video(
-                        chat_id=message.chat.id,
-                        video=video_file
-                    )
-                    
-                    # Отправляем меню отдельным сообщением
-                    await message.bot.send_message(
-                        chat_id=message.chat.id,
-                        text="Выберите действие:",
-                        reply_markup=get_main_keyboard()
-                    )
-                    
-                    # Удаляем временное сообщение о статусе
-                    try:
-                        await status_msg.delete()
-                    except:
-                        pass
-                    
-                    # Удаляем скачанный файл после отправки
-                    try:
-                        os.remove(file_path)
-                    except:
-                        pass
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    if "file too large" in error_msg or "file_size" in error_msg:
-                        await status_msg.edit_text(
-                            "Видео готово, но файл слишком большой для отправки в Telegram.\n\n"
-                            "Максимальный размер файла в Telegram: 50 МБ.\n"
-                            "Попробуйте скачать видео с меньшим разрешением или сократить длительность.",
-                            reply_markup=get_main_keyboard()
-                        )
-                    elif "timeout" in error_msg or "timed out" in error_msg:
-                        await status_msg.edit_text(
-                            "Видео готово, но произошла ошибка при отправке из-за таймаута.\n\n"
-                            "Попробуйте запросить видео снова.",
-                            reply_markup=get_main_keyboard()
-                        )
-                    else:
-                        await status_msg.edit_text(
-                            "Видео готово, но произошла ошибка при отправке.\n\n"
-                            "Попробуйте запросить видео снова или обратитесь в поддержку.",
-                            reply_markup=get_main_keyboard()
-                        )
-            else:
-                await status_msg.edit_text(
-                    f"Задача выполнена: {result.get('message', 'Готово')}",
-                    reply_markup=get_main_keyboard()
-                )
-        else:
-            # Ошибка при скачивании
-            error = result.get("error", "Неизвестная ошибка")
-            await status_msg.edit_text(
-                f"❌ {error}",
-                reply_markup=get_main_keyboard()
+    canonical_url = await normalize_url(url)
+    
+    if settings.DOWNLOAD_MODE == "queue":
+        # Скачиванием займется отдельный воркер (src/bot/worker.py)
+        async for session in get_db():
+            job = await JobQueueService.enqueue(
+                session,
+                url=canonical_url,
+                chat_id=message.chat.id,
+                user_id=message.from_user.id,
+                status_message_id=status_msg.message_id
             )
-    except Exception as e:
-        logger.error(f"Критическая ошибка при обработке видео: {e}", exc_info=True)
-        await status_msg.edit_text(
-            "❌ Произошла критическая ошибка при обработке запроса.\n\n"
-            "Попробуйте:\n"
-            "• Проверить правильность ссылки\n"
-            "• Повторить попытку через несколько секунд\n"
-            "• Использовать /help для получения справки",
-            reply_markup=get_main_keyboard()
+            position = await JobQueueService.get_position(session, job.id)
+        await status_msg.edit_text(f"⏳ Видео в очереди на скачивание (позиция {position})")
+        return
+    
+    result = await deliver_video(
+        message.bot,
+        chat_id=message.chat.id,
+        user_id=message.from_user.id,
+        url=canonical_url,
+        status_message_id=status_msg.message_id
+    )
+    request_duration.observe(time.perf_counter() - started, platform=platform, status=result.get("status"))
+
+
+async def process_video_batch(message: Message, links: List[Link]):
+    """Обработка сообщения с несколькими ссылками: видео отправляются альбомами"""
+    started = time.perf_counter()
+    await _register_user(message)
+    
+    if len(links) > settings.BATCH_MAX_LINKS:
+        await message.answer(
+            f"В одном сообщении обрабатывается не больше {settings.BATCH_MAX_LINKS} ссылок, "
+            "остальные пропущены."
         )
+        links = links[:settings.BATCH_MAX_LINKS]
+    
+    for link in links:
+        video_requests_total.inc(platform=link.platform)
+        user_counters.add_request(message.from_user.id)
+    
+    canonical_urls = [await normalize_url(link.url) for link in links]
+    
+    if settings.DOWNLOAD_MODE == "queue":
+        # Воркеры обрабатывают задачи независимо, поэтому у каждой ссылки свое сообщение о статусе
+        for canonical_url in canonical_urls:
+            status_msg = await message.answer(f"⏳ Видео в очереди на скачивание: {canonical_url}")
+            async for session in get_db():
+                await JobQueueService.enqueue(
+                    session,
+                    url=canonical_url,
+                    chat_id=message.chat.id,
+                    user_id=message.from_user.id,
+                    status_message_id=status_msg.message_id
+                )
+        return
+    
+    status_msg = await message.answer(f"⏳ Начинаю скачивание видео: {len(canonical_urls)} шт.")
+    result = await deliver_batch(
+        message.bot,
+        chat_id=message.chat.id,
+        user_id=message.from_user.id,
+        urls=canonical_urls,
+        status_message_id=status_msg.message_id
+    )
+    # Все видео пачки отправляются вместе, поэтому время ответа у ссылок общее
+    elapsed = time.perf_counter() - started
+    for link, status in zip(links, result["statuses"]):
+        request_duration.observe(elapsed, platform=link.platform, status=status)
@@ -1,20 +1,11 @@
 """Клавиатуры для бота"""
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from typing import Optional
 
+from aiogram.types import InlineKeyboardMarkup
 
-def get_main_keyboard() -> InlineKeyboardMarkup:
-    """Главная клавиатура с основными командами"""
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="📖 Помощь", callback_data="help"),
-                InlineKeyboardButton(text="💡 Примеры", callback_data="examples")
-            ],
-            [
-                InlineKeyboardButton(text="📊 Статистика", callback_data="stats"),
-                InlineKeyboardButton(text="👥 Пригласить", callback_data="invite")
-            ]
-        ]
-    )
-    return keyboard
+from bot.responses import get_responses
 
+
+def get_main_keyboard(language_code: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Главная клавиатура с основными командами (общий экземпляр из каталога ответов)"""
+    return get_responses(language_code).main_keyboard
@@ -0,0 +1,94 @@
+"""HTTP-эндпоинт /metrics и метрики, которые вычисляются в момент запроса"""
+from aiohttp import web
+from config.settings import settings
+from database import get_db, observe_queries
+from services.download_pool import download_pool
+from services.job_queue import JobQueueService
+from services.metrics import Gauge, Histogram, render_metrics
+from services.storage import storage
+from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _directory_size(path: Path) -> int:
+    """Суммарный размер файлов в директории, байты"""
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _directory_size(Path(entry.path))
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            # Файл удалили, пока мы обходили директорию
+            continue
+    return total
+
+
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Длительность SQL-запросов",
+    labels=("operation",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+downloads_in_flight = Gauge(
+    "downloads_in_flight",
+    "Загрузки, которые выполняются в пуле прямо сейчас",
+    callback=lambda: download_pool.in_flight
+)
+download_pool_queued = Gauge(
+    "download_pool_queued",
+    "Загрузки, ожидающие свободного потока пула",
+    callback=lambda: download_pool.queued
+)
+download_jobs_queued = Gauge(
+    "download_jobs_queued",
+    "Задачи в очереди для отдельных воркеров (DOWNLOAD_MODE=queue)"
+)
+download_connections = Gauge(
+    "download_connections",
+    "Соединения с источниками, занятые загрузками в пуле",
+    callback=lambda: download_pool.connections
+)
+downloads_disk_bytes = Gauge(
+    "downloads_disk_bytes",
+    "Место, занятое директорией downloads/"
+)
+
+observe_queries(lambda operation, seconds: db_query_duration.observe(seconds, operation=operation))
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """Отдает метрики процесса в текстовом формате Prometheus"""
+    # Обход downloads/ блокирует, поэтому он выполняется в отдельном потоке
+    downloads_disk_bytes.set(await asyncio.to_thread(_directory_size, storage.root))
+    if settings.DOWNLOAD_MODE == "queue":
+        try:
+            async for session in get_db():
+                download_jobs_queued.set(await JobQueueService.get_queue_depth(session))
+        except Exception as e:
+            logger.warning(f"Не удалось получить глубину очереди задач: {e}")
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server() -> Optional[web.AppRunner]:
+    """Запускает HTTP-сервер с /metrics, если задан METRICS_PORT"""
+    if not settings.METRICS_PORT:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.METRICS_HOST, port=settings.METRICS_PORT)
+    await site.start()
+    logger.info(f"Метрики доступны на {settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics")
+    return runner
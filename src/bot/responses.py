@@ -0,0 +1,184 @@
+"""
+Каталог ответов бота: клавиатуры и статичные тексты
+
+Клавиатуры и тексты собираются один раз при импорте и используются всеми
+обработчиками, вместо того чтобы создавать InlineKeyboardMarkup (с валидацией
+pydantic) и склеивать длинные тексты на каждый ответ. Объекты общие, поэтому
+изменять их нельзя.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+DEFAULT_LANGUAGE = "ru"
+
+# Тексты по языкам. Для нового языка достаточно добавить словарь
+# (или вызвать register_language): недостающие ключи берутся из языка по умолчанию
+TEXTS: Dict[str, Dict[str, str]] = {
+    "ru": {
+        "button_help": "📖 Помощь",
+        "button_examples": "💡 Примеры",
+        "button_stats": "📊 Статистика",
+        "button_invite": "👥 Пригласить",
+        "greeting": "Привет",
+        "greeting_named": "Привет, {name}",
+        "start": (
+            "🎥 Видео загрузчик\n\n"
+            "Я помогу вам скачать видео из:\n"
+            "• Instagram\n"
+            "• TikTok\n"
+            "• YouTube Shorts\n\n"
+            "Просто отправьте мне ссылку на видео, и я скачаю его для вас.\n"
+            "Поддерживаются видео до 5 минут.\n\n"
+            "Бесплатно и без ограничений."
+        ),
+        "help": (
+            "Как использовать:\n\n"
+            "1. Отправьте ссылку на видео из:\n"
+            "   • Instagram\n"
+            "   • TikTok\n"
+            "   • YouTube Shorts\n"
+            "2. Получите скачанное видео\n\n"
+            "Просто скопируйте и отправьте ссылку - бот автоматически распознает её и начнет скачивание.\n\n"
+            "Поддерживаются видео до 5 минут. Более длинные видео не скачиваются.\n\n"
+            "Команды:\n"
+            "/stats - Посмотреть вашу статистику\n"
+            "/examples - Примеры использования\n"
+            "/privacy - Политика конфиденциальности"
+        ),
+        "examples": (
+            "Примеры использования:\n\n"
+            "1. Сохранение понравившегося видео из TikTok\n"
+            "   Отправьте ссылку на видео, чтобы сохранить его для просмотра позже\n\n"
+            "2. Создание личной коллекции контента\n"
+            "   Собирайте интересные видео из разных платформ в одном месте\n\n"
+            "3. Офлайн просмотр видео\n"
+            "   Скачайте видео для просмотра без интернета\n\n"
+            "4. Сохранение видео для дальнейшего использования\n"
+            "   Используйте скачанные видео для создания собственного контента\n\n"
+            "Как использовать:\n"
+            "Просто отправьте ссылку на видео из Instagram, TikTok или YouTube Shorts."
+        ),
+        "privacy": (
+            "Политика конфиденциальности:\n\n"
+            "Бот собирает и хранит только необходимую информацию для работы:\n"
+            "• Telegram ID пользователя\n"
+            "• Статистика использования (количество запросов, скачанных видео)\n"
+            "• Дата последней активности\n\n"
+            "Данные используются исключительно для:\n"
+            "• Предоставления услуг бота\n"
+            "• Улучшения работы сервиса\n"
+            "• Статистики использования\n\n"
+            "Гарантии:\n"
+            "• Видео удаляются сразу после отправки пользователю\n"
+            "• Данные не передаются третьим лицам\n"
+            "• Данные не используются для рекламы\n\n"
+            "По вопросам конфиденциальности обращайтесь к администратору."
+        ),
+        "fallback": (
+            "Отправьте мне ссылку на видео из:\n"
+            "• Instagram\n"
+            "• TikTok\n"
+            "• YouTube Shorts\n\n"
+            "И я скачаю его для вас. Используйте /help для справки."
+        ),
+        "choose_action": "Выберите действие:",
+        "stats_not_found": "Статистика не найдена. Используйте /start для регистрации.",
+        "admin_denied": "У вас нет прав для выполнения этой команды.",
+        "admin_usage": (
+            "Команда массовой рассылки\n\n"
+            "Использование: /admin <текст сообщения>\n\n"
+            "Пример: /admin Привет. Это массовая рассылка."
+        ),
+        "admin_no_users": "Пользователи не найдены.",
+    },
+}
+
+
+@dataclass(frozen=True)
+class Responses:
+    """Готовые ответы для одного языка"""
+    language: str
+    main_keyboard: InlineKeyboardMarkup
+    greeting: str
+    greeting_named: str
+    start: str
+    help: str
+    examples: str
+    privacy: str
+    fallback: str
+    choose_action: str
+    stats_not_found: str
+    admin_denied: str
+    admin_usage: str
+    admin_no_users: str
+    
+    def greet(self, name: Optional[str]) -> str:
+        """Приветствие для /start"""
+        greeting = self.greeting_named.format(name=name) if name else self.greeting
+        return f"{greeting}\n\n{self.start}"
+
+
+def _build_main_keyboard(texts: Dict[str, str]) -> InlineKeyboardMarkup:
+    """Главная клавиатура с основными командами"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text=texts["button_help"], callback_data="help"),
+                InlineKeyboardButton(text=texts["button_examples"], callback_data="examples")
+            ],
+            [
+                InlineKeyboardButton(text=texts["button_stats"], callback_data="stats"),
+                InlineKeyboardButton(text=texts["button_invite"], callback_data="invite")
+            ]
+        ]
+    )
+
+
+def _build(language: str, texts: Dict[str, str]) -> Responses:
+    texts = {**TEXTS[DEFAULT_LANGUAGE], **texts}
+    return Responses(
+        language=language,
+        main_keyboard=_build_main_keyboard(texts),
+        greeting=texts["greeting"],
+        greeting_named=texts["greeting_named"],
+        start=texts["start"],
+        help=texts["help"],
+        examples=texts["examples"],
+        privacy=texts["privacy"],
+        fallback=texts["fallback"],
+        choose_action=texts["choose_action"],
+        stats_not_found=texts["stats_not_found"],
+        admin_denied=texts["admin_denied"],
+        admin_usage=texts["admin_usage"],
+        admin_no_users=texts["admin_no_users"],
+    )
+
+
+_catalog: Dict[str, Responses] = {language: _build(language, texts) for language, texts in TEXTS.items()}
+
+
+def register_language(language: str, texts: Dict[str, str]):
+    """Добавить (или заменить) тексты языка; недостающие ключи берутся из языка по умолчанию"""
+    language = language.lower()
+    TEXTS[language] = dict(texts)
+    _catalog[language] = _build(language, texts)
+    get_responses.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def get_responses(language_code: Optional[str] = None) -> Responses:
+    """
+    Ответы для языка пользователя (language_code из Telegram, например "en" или "pt-br")
+    
+    Сначала ищется точное совпадение, затем основной язык без региона,
+    иначе используется язык по умолчанию.
+    """
+    if language_code:
+        language_code = language_code.lower()
+        responses = _catalog.get(language_code) or _catalog.get(language_code.split("-")[0])
+        if responses:
+            return responses
+    return _catalog[DEFAULT_LANGUAGE]
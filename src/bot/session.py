@@ -0,0 +1,143 @@
+"""Сессии Bot API: раздельные пулы соединений для загрузки файлов и обычных вызовов"""
+from aiogram import Bot, __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.methods import TelegramMethod
+from aiogram.types import InputFile
+from aiohttp import ClientSession, TCPConnector
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from config.settings import settings
+from services.metrics import Histogram
+from typing import Any, Optional
+import asyncio
+import certifi
+import logging
+import ssl
+import time
+
+logger = logging.getLogger(__name__)
+
+bot_api_latency = Histogram(
+    "bot_api_request_duration_seconds",
+    "Длительность вызовов Bot API",
+    labels=("method",)
+)
+
+
+def _has_upload(method: TelegramMethod) -> bool:
+    """Передает ли метод файлы (включая медиа внутри альбома)"""
+    for value in method.__dict__.values():
+        if isinstance(value, InputFile):
+            return True
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(getattr(item, "media", None), InputFile):
+                    return True
+    return False
+
+
+class PoolSession(AiohttpSession):
+    """
+    AiohttpSession с собственными настройками пула соединений
+    
+    ClientSession и коннектор создаются здесь, а не в AiohttpSession: так
+    задается keepalive_timeout, чтобы соединения оставались открытыми между
+    вызовами и не приходилось платить за TLS-рукопожатие.
+    """
+    
+    def __init__(self, limit: int, keepalive_timeout: float, **kwargs):
+        super().__init__(limit=limit, **kwargs)
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+        self.client: Optional[ClientSession] = None
+    
+    async def create_session(self) -> ClientSession:
+        if self.client is None or self.client.closed:
+            connector = TCPConnector(
+                ssl=self.ssl_context,
+                limit=self.limit,
+                ttl_dns_cache=3600,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.client = ClientSession(
+                connector=connector,
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"}
+            )
+        return self.client
+    
+    async def close(self):
+        if self.client is not None and not self.client.closed:
+            await self.client.close()
+            # Даем SSL-соединениям закрыться, как это делает AiohttpSession
+            await asyncio.sleep(0.25)
+
+
+class RoutedSession(BaseSession):
+    """
+    Сессия, которая направляет загрузку файлов и обычные вызовы в разные пулы
+    
+    Большие загрузки видео не занимают соединения, нужные для коротких вызовов
+    (send_message, edit_message_text, delete_message). Чтение источника при
+    потоковой отправке (stream_content) идет через третий пул: оно длится
+    всю загрузку и не должно занимать ни обычные соединения, ни соединения
+    загрузки, которых ждет сама отправка. Для каждого вызова записывается
+    время выполнения.
+    """
+    
+    def __init__(
+        self,
+        control: PoolSession,
+        upload: PoolSession,
+        source: PoolSession,
+        api: TelegramAPIServer
+    ):
+        super().__init__(api=api, timeout=control.timeout)
+        self.control = control
+        self.upload = upload
+        self.source = source
+    
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        session = self.upload if _has_upload(method) else self.control
+        started = time.perf_counter()
+        try:
+            return await session.make_request(bot, method, timeout=timeout)
+        finally:
+            elapsed = time.perf_counter() - started
+            bot_api_latency.observe(elapsed, method=method.__api_method__)
+            if elapsed >= settings.BOT_API_SLOW_CALL:
+                logger.warning(f"Медленный вызов Bot API {method.__api_method__}: {elapsed:.2f} с")
+    
+    async def stream_content(self, *args, **kwargs):
+        async for chunk in self.source.stream_content(*args, **kwargs):
+            yield chunk
+    
+    async def close(self):
+        await self.control.close()
+        await self.upload.close()
+        await self.source.close()
+
+
+def _create_pool(api: TelegramAPIServer, limit: int, timeout: float) -> PoolSession:
+    return PoolSession(api=api, limit=limit, keepalive_timeout=settings.BOT_API_KEEPALIVE, timeout=timeout)
+
+
+def get_api_server() -> TelegramAPIServer:
+    """Сервер Bot API: api.telegram.org или локальный telegram-bot-api"""
+    if settings.TELEGRAM_API_URL:
+        return TelegramAPIServer.from_base(settings.TELEGRAM_API_URL, is_local=True)
+    return PRODUCTION
+
+
+def create_bot_session() -> RoutedSession:
+    """Создает сессию бота с настроенными пулами соединений"""
+    api = get_api_server()
+    return RoutedSession(
+        control=_create_pool(api, settings.BOT_API_CONTROL_POOL_SIZE, settings.BOT_API_TIMEOUT),
+        upload=_create_pool(api, settings.BOT_API_UPLOAD_POOL_SIZE, settings.BOT_API_UPLOAD_TIMEOUT),
+        # Каждой потоковой загрузке нужно одно соединение с источником
+        source=_create_pool(api, settings.BOT_API_UPLOAD_POOL_SIZE, settings.STREAM_TIMEOUT),
+        api=api
+    )
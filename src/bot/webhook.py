@@ -0,0 +1,92 @@
+"""Запуск бота в режиме webhook на aiohttp"""
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from config.settings import settings
+from services.download_pool import download_pool
+import asyncio
+import logging
+import signal
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением числа одновременно обрабатываемых обновлений
+    
+    Обновления обрабатываются в фоне, Telegram сразу получает ответ. Если
+    в обработке уже max_in_flight обновлений, запрос отклоняется с кодом 429
+    и Telegram повторит его позже.
+    """
+    
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_in_flight: int, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.max_in_flight = max_in_flight
+    
+    @property
+    def in_flight(self) -> int:
+        """Количество обновлений в обработке"""
+        return len(self._background_feed_update_tasks)
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.in_flight >= self.max_in_flight:
+            return web.Response(status=429, text="Too Many Requests")
+        return await super().handle(request)
+    
+    __call__ = handle
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """Создает aiohttp-приложение с маршрутом webhook и проверкой здоровья"""
+    app = web.Application()
+    
+    handler = BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+        secret_token=settings.WEBHOOK_SECRET or None
+    )
+    handler.register(app, path=settings.WEBHOOK_PATH)
+    
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "updates_in_flight": handler.in_flight,
+            "downloads_in_flight": download_pool.in_flight,
+            "downloads_queued": download_pool.queued,
+        })
+    
+    app.router.add_get("/health", health)
+    
+    # Запуск и остановка диспетчера вместе с приложением
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запускает HTTP-сервер webhook и ждет сигнала остановки"""
+    app = create_webhook_app(dp, bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.WEBHOOK_HOST, port=settings.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook слушает {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}")
+    
+    if settings.WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            url=settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS
+        )
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    try:
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
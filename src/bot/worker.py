@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Запуск воркера скачивания видео из очереди задач"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+from datetime import datetime
+
+from aiogram import Bot
+
+from config.settings import settings
+from database import get_db, init_db, close_db
+from database.models import DownloadJob
+from services.download_pool import download_pool
+from services.job_queue import JobQueueService
+from services.user_service import flush_user_counters, run_user_counters_flush
+from services.link_router import get_platform
+from services.ydl_pool import ydl_pool
+from services.url_normalizer import close_session as close_url_session
+from services.postprocess import shutdown_transcoder
+from bot.delivery import deliver_video, edit_status, request_duration
+from bot.session import create_bot_session
+from bot.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+EXHAUSTED_ERROR = "Не удалось обработать видео за несколько попыток. Попробуйте позже."
+
+
+async def keep_lease(job_id: int, worker_id: str, task: asyncio.Task) -> bool:
+    """
+    Продлевает аренду задачи, пока она выполняется (скачивание и сжатие бывают дольше аренды)
+    
+    Если аренда потеряна (задачу забрал другой воркер) или ее не удалось продлить
+    до истечения, отменяет task, чтобы видео не отправилось дважды.
+    
+    Returns:
+        True, если аренда потеряна и task отменен
+    """
+    deadline = time.monotonic() + settings.JOB_LEASE_SECONDS
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        try:
+            async for session in get_db():
+                renewed = await JobQueueService.renew(session, job_id, worker_id)
+        except Exception as e:
+            logger.warning(f"Не удалось продлить аренду задачи {job_id}: {e}")
+            if time.monotonic() < deadline:
+                continue
+            renewed = False
+        if not renewed:
+            logger.warning(f"Задача {job_id} больше не принадлежит воркеру {worker_id}, отменяю")
+            task.cancel()
+            return True
+        deadline = time.monotonic() + settings.JOB_LEASE_SECONDS
+
+
+async def process_job(bot: Bot, job: DownloadJob):
+    """Выполняет задачу и записывает результат в очередь"""
+    logger.info(f"Воркер взял задачу {job.id}: {job.url}")
+    job_id, worker_id = job.id, job.worker_id
+    heartbeat = asyncio.create_task(keep_lease(job_id, worker_id, asyncio.current_task()))
+    try:
+        # Без объединения с другими задачами: при потере аренды отмена
+        # process_job должна остановить и скачивание, и отправку
+        result = await deliver_video(
+            bot,
+            chat_id=job.chat_id,
+            user_id=job.user_id,
+            url=job.url,
+            status_message_id=job.status_message_id,
+            shared=False
+        )
+    except asyncio.CancelledError:
+        if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+            # Задачу выполняет другой воркер: ничего не записываем
+            asyncio.current_task().uncancel()
+            return
+        # Воркер останавливается: возвращаем задачу в очередь
+        async for session in get_db():
+            await JobQueueService.release(session, job_id, worker_id)
+        raise
+    finally:
+        heartbeat.cancel()
+    
+    # В режиме очереди время ответа считается от постановки задачи
+    request_duration.observe(
+        (datetime.utcnow() - job.created_at).total_seconds(),
+        platform=get_platform(job.url),
+        status=result.get("status")
+    )
+    
+    async for session in get_db():
+        if result.get("status") == "completed":
+            owned = await JobQueueService.complete(session, job_id, worker_id, result.get("file_id"))
+        else:
+            owned = await JobQueueService.fail(session, job_id, worker_id, result.get("error", "Неизвестная ошибка"))
+    if not owned:
+        logger.warning(f"Задача {job_id} выполнена, но уже принадлежит другому воркеру")
+
+
+async def run_worker(bot: Bot, stop_event: asyncio.Event):
+    """Забирает задачи из очереди, пока не придет сигнал остановки"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    slots = asyncio.Semaphore(settings.WORKER_CONCURRENCY)
+    tasks: set[asyncio.Task] = set()
+    
+    logger.info(f"Воркер {worker_id} запущен, параллельных задач: {settings.WORKER_CONCURRENCY}")
+    while not stop_event.is_set():
+        # Не забираем задачу, пока нет свободного слота: ее сможет взять другая реплика
+        await slots.acquire()
+        try:
+            async for session in get_db():
+                # Задачи, которые не удалось выполнить за JOB_MAX_ATTEMPTS попыток,
+                # lease больше не выдает: завершаем их и сообщаем пользователю
+                for exhausted in await JobQueueService.fail_exhausted(session, EXHAUSTED_ERROR):
+                    logger.warning(f"Задача {exhausted.id} завершена после {exhausted.attempts} попыток")
+                    await edit_status(bot, exhausted.chat_id, exhausted.status_message_id, f"❌ {EXHAUSTED_ERROR}")
+                job = await JobQueueService.lease(session, worker_id)
+        except Exception as e:
+            logger.error(f"Ошибка при получении задачи из очереди: {e}", exc_info=True)
+            job = None
+        
+        if job is None:
+            slots.release()
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        task = asyncio.create_task(process_job(bot, job))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        task.add_done_callback(lambda _: slots.release())
+    
+    # Дожидаемся выполнения начатых задач, остальные вернутся в очередь
+    if tasks:
+        logger.info(f"Ожидаю завершения {len(tasks)} задач")
+        _, pending = await asyncio.wait(tasks, timeout=settings.DOWNLOAD_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def main():
+    """Главная функция запуска воркера"""
+    logging.basicConfig(level=logging.INFO)
+    await init_db()
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, session=create_bot_session())
+    counters_task = asyncio.create_task(run_user_counters_flush())
+    metrics_runner = await start_metrics_server()
+    try:
+        await run_worker(bot, stop_event)
+    finally:
+        counters_task.cancel()
+        await download_pool.shutdown(timeout=settings.DOWNLOAD_SHUTDOWN_TIMEOUT)
+        ydl_pool.close()
+        shutdown_transcoder()
+        await close_url_session()
+        await flush_user_counters()
+        await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,4 @@
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -10,6 +11,31 @@ class Settings(BaseSettings):
     TELEGRAM_BOT_NAME: str
     TELEGRAM_ADMINS_ID: int
     
+    # Режим получения обновлений: "polling" или "webhook"
+    BOT_RUN_MODE: str = "polling"
+    WEBHOOK_BASE_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_SECRET: str = ""
+    WEBHOOK_MAX_IN_FLIGHT: int = 100
+    WEBHOOK_MAX_CONNECTIONS: int = 40
+    
+    # Bot API: пулы соединений и адрес сервера (пусто - api.telegram.org,
+    # иначе адрес локального telegram-bot-api, например http://localhost:8081)
+    TELEGRAM_API_URL: str = ""
+    BOT_API_CONTROL_POOL_SIZE: int = 50
+    BOT_API_UPLOAD_POOL_SIZE: int = 8
+    BOT_API_TIMEOUT: float = 60
+    BOT_API_UPLOAD_TIMEOUT: float = 300
+    BOT_API_KEEPALIVE: float = 60
+    BOT_API_SLOW_CALL: float = 10
+    
+    # HTTP-сервер метрик в формате Prometheus (/metrics); 0 - не запускать.
+    # Бот и воркеры на одном хосте должны получить разные порты
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: int = 0
+    
     # PostgreSQL
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
@@ -17,6 +43,130 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int
     POSTGRES_DB: str
     
+    # Worker
+    WORKER_CONCURRENCY: int = 4
+    DOWNLOAD_QUEUE_SIZE: int = 32
+    DOWNLOAD_SHUTDOWN_TIMEOUT: int = 60
+    
+    # Сколько соединений с источниками могут держать все загрузки вместе: загрузка
+    # DASH/HLS с concurrent_fragment_downloads=N занимает N соединений
+    DOWNLOAD_MAX_CONNECTIONS: int = 16
+    # Настройки скачивания yt-dlp по платформам: параллельные фрагменты DASH/HLS,
+    # размер HTTP-чанка (YouTube ограничивает скорость длинных запросов) и буфер чтения
+    DOWNLOAD_PLATFORM_OPTS: Dict[str, Dict[str, int]] = {
+        "youtube": {"concurrent_fragment_downloads": 4, "http_chunk_size": 10 * 1024 * 1024, "buffersize": 64 * 1024},
+        "instagram": {"concurrent_fragment_downloads": 4, "buffersize": 64 * 1024},
+        "tiktok": {"buffersize": 64 * 1024},
+    }
+    
+    # Экземпляр YoutubeDL переиспользуется для стольких запросов, затем пересоздается
+    # (0 - новый экземпляр на каждый запрос)
+    YDL_POOL_MAX_USES: int = 50
+    
+    # Режим скачивания: "local" - в процессе бота, "queue" - через очередь отдельными воркерами
+    DOWNLOAD_MODE: str = "local"
+    # Воркер продлевает аренду, пока выполняет задачу, поэтому она может быть короче
+    # скачивания; после падения воркера задачу заберет другой через столько секунд
+    JOB_LEASE_SECONDS: int = 120
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_POLL_INTERVAL: float = 1.0
+    
+    # Допуск запросов: сколько ссылок обрабатывается одновременно и сколько может ждать
+    ADMISSION_CONCURRENCY: int = 16
+    ADMISSION_QUEUE_SIZE: int = 200
+    # Лимиты на пользователя (кроме администратора): одновременные запросы и частота
+    USER_CONCURRENCY: int = 2
+    USER_RATE: float = 0.2
+    USER_BURST: float = 3
+    
+    # Несколько ссылок в одном сообщении: сколько обрабатывать и сколько скачивать параллельно
+    BATCH_MAX_LINKS: int = 20
+    BATCH_CONCURRENCY: int = 4
+    
+    # Ограничения на видео: по умолчанию лимит размера определяется способом
+    # отправки (50 МБ для api.telegram.org, 2000 МБ для локального telegram-bot-api)
+    MAX_FILE_SIZE_MB: Optional[int] = None
+    
+    # Однофайловые форматы передаются в Telegram напрямую из источника, без записи
+    # на диск. Форматы, требующие склейки или перепаковки, по-прежнему скачиваются.
+    # При FFMPEG_FASTSTART потоком идут только файлы, у которых moov стоит перед
+    # mdat в первых STREAM_PROBE_BYTES байтах; остальные скачиваются и перепаковываются
+    STREAM_UPLOADS: bool = True
+    STREAM_CHUNK_SIZE: int = 256 * 1024
+    STREAM_TIMEOUT: int = 300
+    STREAM_PROBE_BYTES: int = 64 * 1024
+    
+    # Место под загрузки: бюджет на файлы в работе (0 - без ограничения) и запас
+    # свободного места на диске. Если места нет, загрузка ждет STORAGE_WAIT_TIMEOUT
+    # секунд, затем отклоняется
+    STORAGE_BUDGET_MB: int = 4096
+    STORAGE_MIN_FREE_MB: int = 512
+    STORAGE_WAIT_TIMEOUT: float = 60
+    # Сколько резервировать под видео, размер которого заранее неизвестен
+    STORAGE_DEFAULT_RESERVATION_MB: int = 50
+    # Фоновая очистка: файлы старше STORAGE_MAX_AGE секунд удаляются
+    STORAGE_MAX_AGE: int = 3600
+    STORAGE_JANITOR_INTERVAL: int = 300
+    # Директория в памяти (tmpfs) для небольших видео, пусто - не использовать
+    STORAGE_SCRATCH_DIR: Optional[str] = None
+    STORAGE_SCRATCH_BUDGET_MB: int = 256
+    STORAGE_SCRATCH_MAX_FILE_MB: int = 20
+    
+    # Постобработка ffmpeg: перенос moov в начало файла (видео начинает проигрываться
+    # до полной загрузки) и перекодирование видео, не укладывающихся в лимит размера
+    FFMPEG_FASTSTART: bool = True
+    TRANSCODE_ENABLED: bool = True
+    # Одновременных перекодирований, 0 - половина ядер процессора
+    TRANSCODE_CONCURRENCY: int = 0
+    # Приоритет процессов перекодирования (nice), чтобы они не мешали загрузкам
+    TRANSCODE_NICE: int = 10
+    TRANSCODE_PRESET: str = "veryfast"
+    # Максимальный размер исходного файла для перекодирования
+    TRANSCODE_SOURCE_MAX_MB: int = 200
+    # Ниже этого битрейта видео после сжатия смотреть невозможно, такие видео не перекодируются
+    TRANSCODE_MIN_VIDEO_BITRATE: int = 200_000
+    TRANSCODE_AUDIO_BITRATE: int = 96_000
+    TRANSCODE_TIMEOUT: int = 900
+    
+    # Превью для отправляемых видео (кадр из файла, JPEG не больше THUMBNAIL_SIZE пикселей)
+    THUMBNAIL_ENABLED: bool = True
+    THUMBNAIL_SIZE: int = 320
+    
+    # Прогресс скачивания в сообщении о статусе: не чаще раза в PROGRESS_INTERVAL
+    # секунд и только если процент вырос хотя бы на PROGRESS_MIN_STEP
+    PROGRESS_INTERVAL: float = 3.0
+    PROGRESS_MIN_STEP: float = 5.0
+    
+    # Период записи накопленных счетчиков пользователей в базу, секунды
+    USER_COUNTERS_FLUSH_INTERVAL: float = 5.0
+    
+    # Кэш недавно зарегистрированных пользователей (повторная регистрация без запроса к базе)
+    RECENT_USERS_CACHE_SIZE: int = 50_000
+    RECENT_USERS_CACHE_TTL: int = 600
+    
+    # Массовая рассылка: Telegram допускает около 30 сообщений в секунду на бота
+    BROADCAST_RATE: float = 25.0
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_BATCH_SIZE: int = 500
+    BROADCAST_STATUS_INTERVAL: float = 5.0
+    # Аренда рассылки: если реплика упала, рассылку продолжит другая через столько секунд
+    BROADCAST_LEASE_SECONDS: int = 60
+    
+    # Кэш отправленных видео (Telegram file_id)
+    MEDIA_CACHE_TTL: int = 30 * 24 * 3600
+    MEDIA_CACHE_MAX_ENTRIES: int = 100_000
+    MEDIA_CACHE_EVICT_INTERVAL: int = 3600
+    
+    # Кэш информации о видео по канонической ссылке. Ссылки на медиа подписаны
+    # и истекают, поэтому TTL задается для каждой платформы (по имени экстрактора)
+    INFO_CACHE_ENABLED: bool = True
+    INFO_CACHE_TTL: int = 600
+    INFO_CACHE_PLATFORM_TTL: Dict[str, int] = {"youtube": 3 * 3600, "instagram": 1800, "tiktok": 300}
+    INFO_CACHE_MAX_ENTRIES: int = 2000
+    # Постоянный уровень кэша в базе данных: общий для бота и воркеров
+    INFO_CACHE_PERSISTENT: bool = False
+    INFO_CACHE_EVICT_INTERVAL: int = 600
+    
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
@@ -27,4 +177,3 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
-
@@ -1,5 +1,5 @@
-from .database import get_db, init_db, close_db
-from .models import User, Base
+from .database import get_db, init_db, close_db, observe_queries
+from .models import User, MediaCache, InfoCache, DownloadJob, Broadcast, Base
 
-__all__ = ["get_db", "init_db", "close_db", "User", "Base"]
+__all__ = ["get_db", "init_db", "close_db", "observe_queries", "User", "MediaCache", "InfoCache", "DownloadJob", "Broadcast", "Base"]
 
@@ -1,7 +1,10 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from pathlib import Path
+from typing import Callable
 import os
+import time
 from src.config import settings
 
 # Формируем URL базы данных
@@ -15,6 +18,31 @@ engine = create_async_engine(
     future=True
 )
 
+# Подписчики на длительность SQL-запросов: callback(операция, секунды)
+_query_observers: list[Callable[[str, float], None]] = []
+
+
+def observe_queries(callback: Callable[[str, float], None]):
+    """Подписаться на длительность выполнения SQL-запросов (например, для метрик)"""
+    _query_observers.append(callback)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _query_observers:
+        return
+    elapsed = time.perf_counter() - context._query_started
+    # Операция - первое слово запроса: SELECT, INSERT, UPDATE, DELETE
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+    for callback in _query_observers:
+        callback(operation, elapsed)
+
+
 # Создаем фабрику сессий
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -31,3 +31,99 @@ class User(Base):
     def __repr__(self):
         return f"<User(telegram_id={self.telegram_id}, username={self.username})>"
 
+
+
+class MediaCache(Base):
+    """Кэш отправленных видео: Telegram file_id по идентификатору видео на платформе"""
+    __tablename__ = "media_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(255), nullable=False, unique=True, index=True)
+    file_id = Column(String(255), nullable=False)
+    title = Column(String(255), nullable=True)
+    duration = Column(Integer, nullable=True)
+    
+    # Статистика использования
+    hits = Column(Integer, default=0, nullable=False)
+    
+    # Метаданные
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_hit_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<MediaCache(cache_key={self.cache_key}, hits={self.hits})>"
+
+
+class InfoCache(Base):
+    """Кэш информации о видео (сокращенный info dict yt-dlp) по канонической ссылке"""
+    __tablename__ = "info_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(2048), nullable=False, unique=True, index=True)
+    
+    # info dict в виде JSON-текста
+    info = Column(Text, nullable=False)
+    
+    # Метаданные
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<InfoCache(url={self.url}, expires_at={self.expires_at})>"
+
+
+class DownloadJob(Base):
+    """Задача на скачивание видео в очереди для отдельных воркеров"""
+    __tablename__ = "download_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(Text, nullable=False)
+    chat_id = Column(BigInteger, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    status_message_id = Column(BigInteger, nullable=False)
+    
+    # Состояние: queued, running, done, failed
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(255), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    
+    # Результат
+    file_id = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    
+    # Метаданные
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<DownloadJob(id={self.id}, status={self.status})>"
+
+
+class Broadcast(Base):
+    """Массовая рассылка с сохранением прогресса для продолжения после перезапуска"""
+    __tablename__ = "broadcasts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    text = Column(Text, nullable=False)
+    admin_chat_id = Column(BigInteger, nullable=False)
+    status_message_id = Column(BigInteger, nullable=False)
+    
+    # Состояние: running, done
+    status = Column(String(20), nullable=False, default="running", index=True)
+    
+    # Прогресс: пользователи обходятся по возрастанию telegram_id
+    last_telegram_id = Column(BigInteger, nullable=False, default=0)
+    total_users = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    
+    # Аренда: рассылку выполняет один процесс, пока продлевает lease_until
+    owner = Column(String(255), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    
+    # Метаданные
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<Broadcast(id={self.id}, status={self.status}, sent={self.sent})>"
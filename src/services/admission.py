@@ -0,0 +1,269 @@
+"""Допуск запросов к обработке: лимиты на пользователя, общая очередь с приоритетами"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from services.metrics import Counter, Gauge, Histogram
+from services.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше - раньше
+PRIORITY_ADMIN = 0
+PRIORITY_WARM = 1     # информация о видео уже в кэше, ответ будет быстрым
+PRIORITY_DEFAULT = 2
+
+PRIORITY_NAMES = {PRIORITY_ADMIN: "admin", PRIORITY_WARM: "warm", PRIORITY_DEFAULT: "default"}
+
+# Причины отказа
+REJECT_USER_RATE = "user_rate"
+REJECT_USER_CONCURRENCY = "user_concurrency"
+REJECT_OVERLOADED = "overloaded"
+
+admission_wait = Histogram(
+    "admission_wait_seconds",
+    "Время ожидания запроса в очереди допуска",
+    labels=("priority",)
+)
+admission_queue_position = Histogram(
+    "admission_queue_position",
+    "Позиция запроса в очереди допуска при постановке",
+    labels=("priority",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+admission_rejected = Counter(
+    "admission_rejected_total",
+    "Запросы, отклоненные контролем допуска",
+    labels=("reason",)
+)
+
+
+class AdmissionRejectedError(Exception):
+    """Запрос не допущен к обработке"""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Ticket:
+    """
+    Допуск одного запроса
+    
+    position - место в очереди при постановке (0, если слот выдан сразу).
+    links - сколько ссылок запроса допущено (может быть меньше запрошенного,
+    если у пользователя не хватило токенов частоты).
+    После обработки запроса ticket нужно освободить через release().
+    """
+    
+    def __init__(self, controller: "AdmissionController", user_id: int, priority: int, position: int, links: int = 1):
+        self.controller = controller
+        self.user_id = user_id
+        self.priority = priority
+        self.position = position
+        self.links = links
+        self.enqueued_at = time.monotonic()
+        self.future: Optional[asyncio.Future] = None
+        # active - слот выдан, queued - ждет в очереди, shed - вытеснен, done - освобожден
+        self.state = "active" if position == 0 else "queued"
+    
+    async def wait(self):
+        """Дождаться слота. Если запрос вытеснили из очереди, выбрасывает AdmissionRejectedError"""
+        if self.future is not None:
+            try:
+                await self.future
+            finally:
+                admission_wait.observe(
+                    time.monotonic() - self.enqueued_at,
+                    priority=PRIORITY_NAMES.get(self.priority, str(self.priority))
+                )
+    
+    def release(self):
+        """Освободить слот (или место в очереди, если слот так и не был выдан)"""
+        if self.state != "done":
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Контроль допуска запросов к скачиванию
+    
+    Одновременно обрабатывается не больше concurrency запросов, остальные ждут
+    в очереди по приоритету (внутри класса - по порядку поступления). Если
+    очередь заполнена, новый запрос отклоняется, а запрос с более высоким
+    приоритетом вытесняет последний запрос с низшим. Для каждого пользователя
+    дополнительно ограничены число одновременных запросов и их частота.
+    """
+    
+    def __init__(
+        self,
+        concurrency: int,
+        queue_size: int,
+        user_concurrency: int,
+        user_rate: float,
+        user_burst: float,
+        max_tracked_users: int = 50_000
+    ):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.user_concurrency = user_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_tracked_users = max_tracked_users
+        self.active = 0
+        self._waiting: List[tuple] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._user_active: Dict[int, int] = {}
+        self._user_buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+    
+    @property
+    def queued(self) -> int:
+        """Количество запросов, ожидающих слота"""
+        return self._queued
+    
+    def _user_bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._user_buckets[user_id] = bucket
+            if len(self._user_buckets) > self.max_tracked_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_id)
+        return bucket
+    
+    def _reject(self, reason: str):
+        admission_rejected.inc(reason=reason)
+        raise AdmissionRejectedError(reason)
+    
+    def check_user(self, user_id: int, links: int = 1) -> int:
+        """
+        Проверить лимиты пользователя, ничего не списывая
+        
+        Returns:
+            Сколько из links ссылок укладывается в лимит частоты (не меньше 1)
+        
+        Raises:
+            AdmissionRejectedError: превышен лимит одновременных запросов или частоты
+        """
+        if self._user_active.get(user_id, 0) >= self.user_concurrency:
+            self._reject(REJECT_USER_CONCURRENCY)
+        available = min(links, self._user_bucket(user_id).available())
+        if available < 1:
+            self._reject(REJECT_USER_RATE)
+        return available
+    
+    def enter(self, user_id: int, priority: int = PRIORITY_DEFAULT, links: int = 1) -> Ticket:
+        """
+        Зарегистрировать запрос с links ссылками
+        
+        Каждая ссылка расходует токен частоты пользователя. Если токенов меньше,
+        чем ссылок, допускается столько ссылок, на сколько хватает токенов
+        (ticket.links).
+        
+        Returns:
+            Ticket со слотом или с местом в очереди (дождаться слота - ticket.wait())
+        
+        Raises:
+            AdmissionRejectedError: превышен лимит пользователя или очередь заполнена
+        """
+        limited = priority != PRIORITY_ADMIN
+        if limited:
+            links = self.check_user(user_id, links)
+        
+        immediate = self.active < self.concurrency and not self._queued
+        if not immediate and self._queued >= self.queue_size and not self._shed(priority):
+            self._reject(REJECT_OVERLOADED)
+        
+        # Токены частоты списываются только с допущенного запроса: отказ из-за
+        # перегрузки не должен уменьшать лимит пользователя
+        if limited:
+            self._user_bucket(user_id).try_acquire(links)
+        
+        if immediate:
+            ticket = Ticket(self, user_id, priority, position=0, links=links)
+            self.active += 1
+            self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+            return ticket
+        
+        # Место в очереди: все ожидающие с тем же или более высоким приоритетом
+        position = 1 + sum(
+            1 for entry_priority, _, entry in self._waiting
+            if entry_priority <= priority and entry.state == "queued"
+        )
+        ticket = Ticket(self, user_id, priority, position=position, links=links)
+        ticket.future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), ticket))
+        self._queued += 1
+        self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+        admission_queue_position.observe(position, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        return ticket
+    
+    def _shed(self, priority: int) -> bool:
+        """Вытеснить из очереди последний запрос с приоритетом ниже priority"""
+        candidates = [
+            (entry_priority, sequence, entry) for entry_priority, sequence, entry in self._waiting
+            if entry_priority > priority and entry.state == "queued"
+        ]
+        if not candidates:
+            return False
+        _, _, victim = max(candidates, key=lambda candidate: (candidate[0], candidate[1]))
+        victim.state = "shed"
+        victim.future.set_exception(AdmissionRejectedError(REJECT_OVERLOADED))
+        admission_rejected.inc(reason=REJECT_OVERLOADED)
+        self._queued -= 1
+        return True
+    
+    def _release(self, ticket: Ticket):
+        count = self._user_active.get(ticket.user_id, 0) - 1
+        if count > 0:
+            self._user_active[ticket.user_id] = count
+        else:
+            self._user_active.pop(ticket.user_id, None)
+        
+        state, ticket.state = ticket.state, "done"
+        if state == "queued":
+            # Запрос ушел из очереди, не дождавшись слота (например, отменен)
+            ticket.future.cancel()
+            self._queued -= 1
+        elif state == "active":
+            self.active -= 1
+            self._wake_next()
+    
+    def _wake_next(self):
+        """Выдать освободившийся слот следующему запросу в очереди"""
+        while self._waiting and self.active < self.concurrency:
+            _, _, ticket = heapq.heappop(self._waiting)
+            if ticket.state != "queued":
+                # Вытесненный или отмененный запрос
+                continue
+            ticket.state = "active"
+            self._queued -= 1
+            self.active += 1
+            ticket.future.set_result(None)
+
+
+admission = AdmissionController(
+    concurrency=settings.ADMISSION_CONCURRENCY,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    user_concurrency=settings.USER_CONCURRENCY,
+    user_rate=settings.USER_RATE,
+    user_burst=settings.USER_BURST
+)
+
+admission_active = Gauge(
+    "admission_active",
+    "Запросы, допущенные к обработке",
+    callback=lambda: admission.active
+)
+admission_queued = Gauge(
+    "admission_queued",
+    "Запросы в очереди допуска",
+    callback=lambda: admission.queued
+)
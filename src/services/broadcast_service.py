@@ -0,0 +1,156 @@
+"""Хранение состояния массовых рассылок"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database.models import Broadcast
+
+BROADCAST_RUNNING = "running"
+BROADCAST_DONE = "done"
+
+
+class BroadcastService:
+    """
+    Сервис для работы с рассылками
+    
+    Рассылку выполняет процесс, который взял ее в аренду (claim). Аренда
+    продлевается, пока рассылка идет; если процесс упал, по истечении аренды
+    рассылку заберет другая реплика, поэтому каждая рассылка отправляется
+    одним процессом.
+    """
+    
+    @staticmethod
+    async def create(
+        session: AsyncSession,
+        text: str,
+        admin_chat_id: int,
+        status_message_id: int,
+        total_users: int
+    ) -> Broadcast:
+        """Создать рассылку"""
+        broadcast = Broadcast(
+            text=text,
+            admin_chat_id=admin_chat_id,
+            status_message_id=status_message_id,
+            status=BROADCAST_RUNNING,
+            last_telegram_id=0,
+            total_users=total_users,
+            sent=0,
+            failed=0,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
+        session.add(broadcast)
+        await session.commit()
+        return broadcast
+    
+    @staticmethod
+    async def get(session: AsyncSession, broadcast_id: int) -> Optional[Broadcast]:
+        """Получить рассылку по id"""
+        result = await session.execute(select(Broadcast).where(Broadcast.id == broadcast_id))
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def get_unfinished(session: AsyncSession) -> list[Broadcast]:
+        """Незавершенные рассылки (в том числе выполняемые другими процессами)"""
+        result = await session.execute(
+            select(Broadcast).where(Broadcast.status == BROADCAST_RUNNING).order_by(Broadcast.id)
+        )
+        return list(result.scalars().all())
+    
+    @staticmethod
+    async def claim(session: AsyncSession, broadcast_id: int, owner: str) -> Optional[Broadcast]:
+        """
+        Взять незавершенную рассылку в аренду
+        
+        Returns:
+            Рассылка или None, если она завершена или ее выполняет другой процесс
+        """
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast_id,
+                Broadcast.status == BROADCAST_RUNNING,
+                or_(Broadcast.owner.is_(None), Broadcast.lease_until < now)
+            )
+            .values(
+                owner=owner,
+                lease_until=now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS),
+                updated_at=now
+            )
+            .returning(Broadcast)
+        )
+        broadcast = result.scalar_one_or_none()
+        await session.commit()
+        return broadcast
+    
+    @staticmethod
+    async def renew(session: AsyncSession, broadcast_id: int, owner: str) -> bool:
+        """
+        Продлить аренду рассылки
+        
+        Returns:
+            False, если рассылка уже не принадлежит процессу
+        """
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(lease_until=now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS), updated_at=now)
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def release(session: AsyncSession, broadcast_id: int, owner: str):
+        """Вернуть аренду, чтобы рассылку сразу могла продолжить другая реплика"""
+        await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(owner=None, lease_until=None, updated_at=datetime.utcnow())
+        )
+        await session.commit()
+    
+    @staticmethod
+    async def save_progress(
+        session: AsyncSession,
+        broadcast_id: int,
+        owner: str,
+        last_telegram_id: int,
+        sent: int,
+        failed: int
+    ) -> bool:
+        """
+        Сохранить прогресс и продлить аренду
+        
+        Returns:
+            False, если рассылка уже не принадлежит процессу (прогресс не сохранен)
+        """
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.owner == owner)
+            .values(
+                last_telegram_id=last_telegram_id,
+                sent=sent,
+                failed=failed,
+                lease_until=now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS),
+                updated_at=now
+            )
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def finish(session: AsyncSession, broadcast_id: int):
+        """Отметить рассылку завершенной"""
+        await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id)
+            .values(status=BROADCAST_DONE, owner=None, lease_until=None, updated_at=datetime.utcnow())
+        )
+        await session.commit()
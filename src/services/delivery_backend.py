@@ -0,0 +1,158 @@
+"""Способы отправки файлов в Telegram и их ограничения"""
+from aiogram import Bot
+from aiogram.types import FSInputFile, Message, URLInputFile
+from config.settings import settings
+from services.download_pool import download_pool
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncGenerator, Dict, Optional
+
+MB = 1024 * 1024
+
+
+class StreamTooLargeError(Exception):
+    """Поток из источника оказался больше лимита способа отправки"""
+    pass
+
+
+class StreamedInputFile(URLInputFile):
+    """
+    Файл, который читается из источника по частям прямо в multipart-запрос
+    
+    В памяти одновременно находится не больше нескольких частей по chunk_size:
+    следующая часть читается, только когда предыдущая ушла в Telegram. Если
+    источник отдает больше max_size байт, передача прерывается.
+    """
+    
+    def __init__(self, url: str, max_size: int, **kwargs):
+        super().__init__(url, **kwargs)
+        self.max_size = max_size
+        self.bytes_read = 0
+        self.exceeded = False
+    
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes, None]:
+        async for chunk in super().read(bot):
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self.max_size:
+                self.exceeded = True
+                raise StreamTooLargeError(f"Источник отдал больше {self.max_size} байт")
+            yield chunk
+
+
+class DeliveryBackend(ABC):
+    """Базовый способ отправки видео"""
+    
+    name = "base"
+    max_file_size = 50 * MB
+    # Можно ли передать видео потоком из источника, минуя диск
+    supports_streaming = False
+    # Читает ли получатель файл сам по пути (тогда файл должен лежать в общей директории)
+    shares_files = False
+    
+    def fits(self, file_size: int) -> bool:
+        """Укладывается ли файл в лимит этого способа отправки"""
+        return file_size <= self.max_file_size
+    
+    @abstractmethod
+    def make_input(self, file_path: str):
+        """Значение для параметра video в send_video"""
+    
+    async def send_video(self, bot: Bot, chat_id: int, file_path: str, **kwargs) -> Message:
+        """Отправить видео из локального файла"""
+        return await bot.send_video(chat_id=chat_id, video=self.make_input(file_path), **kwargs)
+    
+    async def read_stream_prefix(self, bot: Bot, source: Dict, size: int) -> bytes:
+        """Первые size байт источника (заголовки контейнера перед потоковой отправкой)"""
+        headers = {**(source.get("headers") or {}), "Range": f"bytes=0-{size - 1}"}
+        prefix = bytearray()
+        async with download_pool.reserve_connections():
+            # Источник может не поддерживать Range и отдавать файл целиком: читаем только начало
+            chunks = bot.session.stream_content(
+                source["url"], headers=headers, timeout=settings.STREAM_TIMEOUT, chunk_size=size
+            )
+            try:
+                async for chunk in chunks:
+                    prefix += chunk
+                    if len(prefix) >= size:
+                        break
+            finally:
+                await chunks.aclose()
+        return bytes(prefix[:size])
+    
+    async def send_video_stream(self, bot: Bot, chat_id: int, source: Dict, **kwargs) -> Message:
+        """
+        Отправить видео потоком из источника (результат get_stream_source)
+        
+        Raises:
+            StreamTooLargeError: источник отдал больше max_file_size байт
+        """
+        video = StreamedInputFile(
+            source["url"],
+            max_size=self.max_file_size,
+            headers=source.get("headers"),
+            filename=source.get("filename"),
+            chunk_size=settings.STREAM_CHUNK_SIZE,
+            timeout=settings.STREAM_TIMEOUT
+        )
+        try:
+            # Поток держит соединение с источником, как и загрузка в пуле
+            async with download_pool.reserve_connections():
+                return await bot.send_video(chat_id=chat_id, video=video, **kwargs)
+        except Exception:
+            # aiohttp оборачивает исключения из тела запроса в сетевую ошибку
+            if video.exceeded:
+                raise StreamTooLargeError(f"Источник отдал больше {self.max_file_size} байт")
+            raise
+
+
+class CloudBackend(DeliveryBackend):
+    """api.telegram.org: файл передается multipart-запросом, лимит 50 МБ"""
+    
+    name = "cloud"
+    max_file_size = 50 * MB
+    supports_streaming = True
+    
+    def make_input(self, file_path: str):
+        return FSInputFile(file_path)
+
+
+class LocalServerBackend(DeliveryBackend):
+    """
+    Локальный telegram-bot-api: файл передается путем file://, лимит 2000 МБ
+    
+    Сервер читает файл сам, поэтому директория загрузок должна быть
+    доступна ему по тому же пути (общий volume). Сервер читает файл с диска
+    без multipart-запроса, поэтому потоковая отправка здесь не нужна.
+    """
+    
+    name = "local"
+    max_file_size = 2000 * MB
+    shares_files = True
+    
+    def make_input(self, file_path: str):
+        return Path(file_path).resolve().as_uri()
+
+
+_backend: Optional[DeliveryBackend] = None
+
+
+def get_delivery_backend() -> DeliveryBackend:
+    """Способ отправки, выбранный по настройкам"""
+    global _backend
+    if _backend is None:
+        _backend = LocalServerBackend() if settings.TELEGRAM_API_URL else CloudBackend()
+    return _backend
+
+
+def set_delivery_backend(backend: DeliveryBackend):
+    """Подменить способ отправки (например, заглушкой в тестовом стенде)"""
+    global _backend
+    _backend = backend
+
+
+def get_max_upload_size() -> int:
+    """Максимальный размер видео в байтах: из настроек или лимит способа отправки"""
+    backend_limit = get_delivery_backend().max_file_size
+    if settings.MAX_FILE_SIZE_MB:
+        return min(settings.MAX_FILE_SIZE_MB * MB, backend_limit)
+    return backend_limit
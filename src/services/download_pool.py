@@ -0,0 +1,143 @@
+"""Пул воркеров для выполнения блокирующих загрузок вне event loop"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadPoolBusyError(Exception):
+    """Пул загрузок переполнен или останавливается"""
+
+
+class DownloadPool:
+    """
+    Ограниченный пул потоков для yt-dlp.
+    
+    Одновременно выполняется не больше `concurrency` задач, еще `queue_size`
+    задач могут ждать свободного воркера. Остальные получают DownloadPoolBusyError.
+    Задача может занимать несколько соединений с источником (параллельные
+    фрагменты), всего одновременно занято не больше `max_connections`.
+    """
+    
+    def __init__(self, concurrency: int, queue_size: int, max_connections: int):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.max_connections = max(1, max_connections)
+        self._connections = 0
+        self._connections_changed = asyncio.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        self._running = 0
+        self._closing = False
+    
+    @property
+    def in_flight(self) -> int:
+        """Количество выполняющихся задач"""
+        return self._running
+    
+    @property
+    def queued(self) -> int:
+        """Количество задач, ожидающих свободного воркера"""
+        return self._pending - self._running
+    
+    @property
+    def connections(self) -> int:
+        """Количество соединений, занятых выполняющимися задачами"""
+        return self._connections
+    
+    @property
+    def is_full(self) -> bool:
+        """Достигнут ли лимит очереди"""
+        return self._pending >= self.concurrency + self.queue_size
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix="download-worker"
+            )
+        return self._executor
+    
+    @asynccontextmanager
+    async def reserve_connections(self, connections: int = 1) -> AsyncIterator[None]:
+        """
+        Занять соединения с источником на время блока
+        
+        Используется задачами пула и потоковой отправкой, которая читает
+        источник без воркера.
+        """
+        # Задача с большим числом фрагментов не должна ждать вечно
+        connections = min(max(1, connections), self.max_connections)
+        async with self._connections_changed:
+            await self._connections_changed.wait_for(
+                lambda: self._connections + connections <= self.max_connections
+            )
+            self._connections += connections
+        try:
+            yield
+        finally:
+            async with self._connections_changed:
+                self._connections -= connections
+                self._connections_changed.notify_all()
+    
+    async def run(self, func: Callable[..., Any], *args, connections: int = 1, **kwargs) -> Any:
+        """
+        Выполнить блокирующую функцию в пуле и дождаться результата
+        
+        connections - сколько соединений с источником откроет задача
+        """
+        if self._closing:
+            raise DownloadPoolBusyError("Пул загрузок останавливается")
+        if self.is_full:
+            raise DownloadPoolBusyError(
+                f"Очередь загрузок переполнена ({self._pending} задач)"
+            )
+        
+        self._pending += 1
+        self._idle.clear()
+        try:
+            async with self._semaphore:
+                async with self.reserve_connections(connections):
+                    self._running += 1
+                    try:
+                        loop = asyncio.get_running_loop()
+                        return await loop.run_in_executor(
+                            self._get_executor(),
+                            functools.partial(func, *args, **kwargs)
+                        )
+                    finally:
+                        self._running -= 1
+        finally:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+    
+    async def shutdown(self, timeout: Optional[float] = None):
+        """Перестать принимать задачи и дождаться завершения текущих"""
+        self._closing = True
+        if self._pending:
+            logger.info(f"Ожидаю завершения {self._pending} загрузок")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Не дождались завершения {self._pending} загрузок")
+        
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+download_pool = DownloadPool(
+    concurrency=settings.WORKER_CONCURRENCY,
+    queue_size=settings.DOWNLOAD_QUEUE_SIZE,
+    max_connections=settings.DOWNLOAD_MAX_CONNECTIONS
+)
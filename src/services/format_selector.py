@@ -0,0 +1,123 @@
+"""Выбор формата видео под лимит размера файла Telegram"""
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Кодеки, которые Telegram воспроизводит без перекодирования
+STREAMABLE_VIDEO_CODECS = ("avc1", "h264")
+STREAMABLE_AUDIO_CODECS = ("mp4a", "aac")
+
+
+def estimate_format_size(fmt: Dict, duration: Optional[float]) -> Optional[int]:
+    """Оценивает размер формата: filesize, filesize_approx или битрейт × длительность"""
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    tbr = fmt.get("tbr")
+    if tbr and duration:
+        # tbr указывается в килобитах в секунду
+        return int(tbr * 1000 / 8 * duration)
+    return None
+
+
+def estimate_selection_size(info: Dict, format_spec: str) -> Optional[int]:
+    """Оценивает размер результата select_format ("id" или "video_id+audio_id")"""
+    formats = {fmt.get("format_id"): fmt for fmt in info.get("formats") or []}
+    total = 0
+    for format_id in format_spec.split("+"):
+        fmt = formats.get(format_id)
+        size = estimate_format_size(fmt, info.get("duration")) if fmt else None
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def _has_video(fmt: Dict) -> bool:
+    return fmt.get("vcodec") not in (None, "none") or (
+        fmt.get("vcodec") is None and fmt.get("acodec") is None and fmt.get("ext") == "mp4"
+    )
+
+
+def _has_audio(fmt: Dict) -> bool:
+    return fmt.get("acodec") not in (None, "none") or (
+        fmt.get("vcodec") is None and fmt.get("acodec") is None
+    )
+
+
+def _is_streamable(video: Dict, audio: Optional[Dict] = None) -> bool:
+    """mp4 с h264 и aac: Telegram показывает такое видео без перекодирования"""
+    audio = audio or video
+    vcodec = (video.get("vcodec") or "").lower()
+    acodec = (audio.get("acodec") or "").lower()
+    return (
+        video.get("ext") == "mp4"
+        and vcodec.startswith(STREAMABLE_VIDEO_CODECS)
+        and (acodec in ("", "none") or acodec.startswith(STREAMABLE_AUDIO_CODECS))
+    )
+
+
+def _rank(size: Optional[int], streamable: bool, progressive: bool, video: Dict) -> tuple:
+    """Ключ сортировки: известный размер, совместимость с Telegram, качество"""
+    return (
+        size is not None,
+        streamable,
+        progressive,
+        video.get("height") or 0,
+        video.get("tbr") or 0,
+    )
+
+
+def select_format(info: Dict, budget: int) -> Optional[str]:
+    """
+    Выбирает формат, который укладывается в лимит размера
+    
+    Предпочитаются однофайловые mp4/h264 форматы. Пары видео+аудио
+    рассматриваются, только если подходящего однофайлового формата нет.
+    
+    Args:
+        info: Информация о видео от yt-dlp
+        budget: Максимальный размер файла в байтах
+        
+    Returns:
+        Строка формата для yt-dlp или None, если все форматы заведомо больше лимита
+    """
+    formats = info.get("formats")
+    if not formats:
+        # Прямая ссылка без списка форматов: выбор остается за yt-dlp
+        return "best"
+    
+    duration = info.get("duration")
+    
+    candidates = []
+    for fmt in formats:
+        if not fmt.get("format_id") or not (_has_video(fmt) and _has_audio(fmt)):
+            continue
+        size = estimate_format_size(fmt, duration)
+        if size is not None and size > budget:
+            continue
+        candidates.append((_rank(size, _is_streamable(fmt), True, fmt), fmt["format_id"], size))
+    
+    if not candidates:
+        video_only = [f for f in formats if f.get("format_id") and _has_video(f) and not _has_audio(f)]
+        audio_only = [f for f in formats if f.get("format_id") and _has_audio(f) and not _has_video(f)]
+        for video in video_only:
+            video_size = estimate_format_size(video, duration)
+            for audio in audio_only:
+                audio_size = estimate_format_size(audio, duration)
+                size = video_size + audio_size if video_size and audio_size else None
+                if size is not None and size > budget:
+                    continue
+                candidates.append((
+                    _rank(size, _is_streamable(video, audio), False, video),
+                    f"{video['format_id']}+{audio['format_id']}",
+                    size
+                ))
+    
+    if not candidates:
+        return None
+    
+    _, format_id, size = max(candidates, key=lambda candidate: candidate[0])
+    logger.info(f"Выбран формат {format_id} (оценка размера: {size or 'неизвестна'} байт)")
+    return format_id
@@ -0,0 +1,226 @@
+"""Кэш информации о видео (info dict yt-dlp) по канонической ссылке"""
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from config.settings import settings
+from database import get_db
+from database.models import InfoCache
+
+logger = logging.getLogger(__name__)
+
+# Поля info, нужные для проверки ограничений, выбора формата и скачивания
+INFO_KEYS = (
+    "_type", "id", "title", "duration", "extractor", "extractor_key",
+    "webpage_url", "original_url", "webpage_url_basename", "webpage_url_domain",
+    "display_id", "thumbnail", "width", "height", "http_headers",
+    # Прямая ссылка без списка форматов
+    "format_id", "url", "ext", "protocol", "vcodec", "acodec",
+    "filesize", "filesize_approx", "tbr",
+)
+FORMAT_KEYS = (
+    "format_id", "url", "ext", "protocol", "vcodec", "acodec", "width", "height",
+    "fps", "tbr", "vbr", "abr", "filesize", "filesize_approx", "http_headers", "cookies",
+    # Сегментные форматы (HLS, DASH)
+    "manifest_url", "fragment_base_url", "fragments",
+)
+
+# Счетчики попаданий в кэш с момента запуска процесса
+_stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0}
+
+
+def prune_info(info: Dict) -> Dict:
+    """Оставляет в info только поля, нужные для повторного скачивания"""
+    pruned = {key: info[key] for key in INFO_KEYS if info.get(key) is not None}
+    formats = info.get("formats")
+    if formats:
+        pruned["formats"] = [
+            {key: fmt[key] for key in FORMAT_KEYS if fmt.get(key) is not None}
+            for fmt in formats
+        ]
+    return pruned
+
+
+def get_ttl(info: Dict) -> int:
+    """
+    Время жизни записи в секундах
+    
+    Ссылки на медиа в info подписаны и истекают, у каждой платформы по-своему,
+    поэтому TTL выбирается по экстрактору.
+    """
+    platform = (info.get("extractor_key") or info.get("extractor") or "").lower()
+    return settings.INFO_CACHE_PLATFORM_TTL.get(platform, settings.INFO_CACHE_TTL)
+
+
+class MemoryInfoCache:
+    """
+    LRU-кэш в памяти процесса
+    
+    Хранит и выдает копии info: yt-dlp изменяет переданный ему info на месте
+    (в том числе из потоков пула загрузок), и запись в кэше не должна это видеть.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, Dict]] = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(info)
+    
+    def contains(self, key: str) -> bool:
+        """Есть ли в кэше свежая запись (без копирования info)"""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+    
+    def set(self, key: str, info: Dict, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(info))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+
+class DatabaseInfoCache:
+    """Постоянный кэш в базе данных: общий для бота и воркеров, переживает перезапуск"""
+    
+    async def get(self, key: str) -> Optional[tuple[int, Dict]]:
+        """Возвращает оставшееся время жизни в секундах и info"""
+        async for session in get_db():
+            result = await session.execute(
+                select(InfoCache.info, InfoCache.expires_at)
+                .where(InfoCache.url == key, InfoCache.expires_at > datetime.utcnow())
+            )
+            row = result.first()
+        if row is None:
+            return None
+        ttl = int((row.expires_at - datetime.utcnow()).total_seconds())
+        return ttl, json.loads(row.info)
+    
+    async def set(self, key: str, info: Dict, ttl: int):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        stmt = insert(InfoCache).values(url=key, info=json.dumps(info), expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InfoCache.url],
+            set_={"info": stmt.excluded.info, "expires_at": stmt.excluded.expires_at}
+        )
+        async for session in get_db():
+            await session.execute(stmt)
+            await session.commit()
+    
+    async def invalidate(self, key: str):
+        async for session in get_db():
+            await session.execute(delete(InfoCache).where(InfoCache.url == key))
+            await session.commit()
+    
+    async def evict(self) -> int:
+        """Удалить истекшие записи"""
+        async for session in get_db():
+            result = await session.execute(
+                delete(InfoCache).where(InfoCache.expires_at <= datetime.utcnow())
+            )
+            await session.commit()
+        return result.rowcount or 0
+
+
+class VideoInfoCache:
+    """
+    Двухуровневый кэш info: LRU в памяти и необязательный постоянный уровень
+    
+    Ошибки постоянного уровня не мешают обработке запроса: кэш в этом случае
+    ведет себя как промах.
+    """
+    
+    def __init__(self, memory: MemoryInfoCache, persistent: Optional[DatabaseInfoCache] = None):
+        self.memory = memory
+        self.persistent = persistent
+    
+    async def get(self, url: str) -> Optional[Dict]:
+        info = self.memory.get(url)
+        if info is not None:
+            _stats["memory_hits"] += 1
+            return info
+        
+        if self.persistent is not None:
+            try:
+                entry = await self.persistent.get(url)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать info из базы: {e}")
+                entry = None
+            if entry is not None:
+                ttl, info = entry
+                self.memory.set(url, info, ttl)
+                _stats["persistent_hits"] += 1
+                return info
+        
+        _stats["misses"] += 1
+        return None
+    
+    async def set(self, url: str, info: Dict):
+        ttl = get_ttl(info)
+        if ttl <= 0:
+            return
+        info = prune_info(info)
+        self.memory.set(url, info, ttl)
+        if self.persistent is not None:
+            try:
+                await self.persistent.set(url, info, ttl)
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить info в базу: {e}")
+    
+    async def invalidate(self, url: str):
+        self.memory.invalidate(url)
+        if self.persistent is not None:
+            try:
+                await self.persistent.invalidate(url)
+            except Exception as e:
+                logger.warning(f"Не удалось удалить info из базы: {e}")
+    
+    @staticmethod
+    def get_hit_stats() -> Dict:
+        """Статистика попаданий в кэш с момента запуска"""
+        hits = _stats["memory_hits"] + _stats["persistent_hits"]
+        total = hits + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+
+
+info_cache = VideoInfoCache(
+    MemoryInfoCache(settings.INFO_CACHE_MAX_ENTRIES),
+    DatabaseInfoCache() if settings.INFO_CACHE_PERSISTENT else None
+)
+
+
+async def run_info_cache_eviction():
+    """Фоновая задача: периодически удаляет истекшие записи постоянного уровня"""
+    while True:
+        await asyncio.sleep(settings.INFO_CACHE_EVICT_INTERVAL)
+        try:
+            removed = await info_cache.persistent.evict()
+            stats = info_cache.get_hit_stats()
+            logger.info(
+                f"Кэш info: удалено {removed} записей, "
+                f"попаданий {stats['memory_hits']} в памяти и {stats['persistent_hits']} в базе, "
+                f"промахов {stats['misses']} (hit rate {stats['hit_rate']:.1%})"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при очистке кэша info: {e}", exc_info=True)
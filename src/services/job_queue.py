@@ -0,0 +1,196 @@
+"""Очередь задач на скачивание в PostgreSQL"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database.models import DownloadJob
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueueService:
+    """
+    Сервис очереди задач на скачивание
+    
+    Воркеры забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    несколько реплик могут разбирать одну очередь без блокировок друг друга.
+    Задача выдается в аренду, которую воркер продлевает, пока выполняет
+    задачу; если воркер упал, по истечении аренды задачу заберет другой воркер.
+    """
+    
+    @staticmethod
+    async def enqueue(
+        session: AsyncSession,
+        url: str,
+        chat_id: int,
+        user_id: int,
+        status_message_id: int
+    ) -> DownloadJob:
+        """Поставить задачу в очередь"""
+        job = DownloadJob(
+            url=url,
+            chat_id=chat_id,
+            user_id=user_id,
+            status_message_id=status_message_id,
+            status=JOB_QUEUED,
+            attempts=0,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
+        session.add(job)
+        await session.commit()
+        return job
+    
+    @staticmethod
+    async def get_position(session: AsyncSession, job_id: int) -> int:
+        """Позиция задачи в очереди (1 - следующая на выполнение)"""
+        result = await session.execute(
+            select(func.count(DownloadJob.id))
+            .where(DownloadJob.status == JOB_QUEUED, DownloadJob.id <= job_id)
+        )
+        return result.scalar() or 0
+    
+    @staticmethod
+    async def lease(session: AsyncSession, worker_id: str) -> Optional[DownloadJob]:
+        """Забрать следующую задачу из очереди или задачу с истекшей арендой"""
+        now = datetime.utcnow()
+        next_job_id = (
+            select(DownloadJob.id)
+            .where(
+                DownloadJob.attempts < settings.JOB_MAX_ATTEMPTS,
+                or_(
+                    DownloadJob.status == JOB_QUEUED,
+                    and_(DownloadJob.status == JOB_RUNNING, DownloadJob.lease_until < now)
+                )
+            )
+            .order_by(DownloadJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            update(DownloadJob)
+            .where(DownloadJob.id == next_job_id)
+            .values(
+                status=JOB_RUNNING,
+                worker_id=worker_id,
+                attempts=DownloadJob.attempts + 1,
+                lease_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                updated_at=now
+            )
+            .returning(DownloadJob)
+        )
+        job = result.scalar_one_or_none()
+        await session.commit()
+        return job
+    
+    @staticmethod
+    async def renew(session: AsyncSession, job_id: int, worker_id: str) -> bool:
+        """
+        Продлить аренду задачи
+        
+        Returns:
+            False, если задача уже не принадлежит воркеру
+        """
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(DownloadJob)
+            .where(
+                DownloadJob.id == job_id,
+                DownloadJob.status == JOB_RUNNING,
+                DownloadJob.worker_id == worker_id
+            )
+            .values(lease_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS), updated_at=now)
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def fail_exhausted(session: AsyncSession, error: str) -> List[DownloadJob]:
+        """
+        Отметить завершенными с ошибкой задачи, аренда которых истекла
+        после последней попытки
+        
+        Такие задачи lease больше не выдает. Возвращает их, чтобы сообщить
+        пользователям; каждую задачу возвращает только одному воркеру.
+        """
+        now = datetime.utcnow()
+        exhausted = (
+            select(DownloadJob.id)
+            .where(
+                DownloadJob.status == JOB_RUNNING,
+                DownloadJob.lease_until < now,
+                DownloadJob.attempts >= settings.JOB_MAX_ATTEMPTS
+            )
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(DownloadJob)
+            .where(DownloadJob.id.in_(exhausted))
+            .values(status=JOB_FAILED, error=error, lease_until=None, updated_at=now)
+            .returning(DownloadJob)
+        )
+        jobs = list(result.scalars().all())
+        await session.commit()
+        return jobs
+    
+    @staticmethod
+    async def complete(session: AsyncSession, job_id: int, worker_id: str, file_id: Optional[str]) -> bool:
+        """
+        Отметить задачу выполненной
+        
+        Returns:
+            False, если задача уже не принадлежит воркеру (ничего не изменено)
+        """
+        return await JobQueueService._finish(
+            session, job_id, worker_id, status=JOB_DONE, file_id=file_id, lease_until=None
+        )
+    
+    @staticmethod
+    async def fail(session: AsyncSession, job_id: int, worker_id: str, error: str) -> bool:
+        """
+        Отметить задачу завершенной с ошибкой
+        
+        Returns:
+            False, если задача уже не принадлежит воркеру (ничего не изменено)
+        """
+        return await JobQueueService._finish(
+            session, job_id, worker_id, status=JOB_FAILED, error=error, lease_until=None
+        )
+    
+    @staticmethod
+    async def release(session: AsyncSession, job_id: int, worker_id: str) -> bool:
+        """Вернуть задачу в очередь (например, при остановке воркера)"""
+        return await JobQueueService._finish(
+            session, job_id, worker_id,
+            status=JOB_QUEUED, worker_id=None, lease_until=None, attempts=DownloadJob.attempts - 1
+        )
+    
+    @staticmethod
+    async def _finish(session: AsyncSession, job_id: int, owner: str, **values) -> bool:
+        """Изменить задачу, только если она выполняется воркером owner"""
+        result = await session.execute(
+            update(DownloadJob)
+            .where(
+                DownloadJob.id == job_id,
+                DownloadJob.status == JOB_RUNNING,
+                DownloadJob.worker_id == owner
+            )
+            .values(**values, updated_at=datetime.utcnow())
+        )
+        await session.commit()
+        return result.rowcount > 0
+    
+    @staticmethod
+    async def get_queue_depth(session: AsyncSession) -> int:
+        """Количество задач, ожидающих воркера"""
+        result = await session.execute(
+            select(func.count(DownloadJob.id)).where(DownloadJob.status == JOB_QUEUED)
+        )
+        return result.scalar() or 0
@@ -0,0 +1,176 @@
+"""Распознавание ссылок на видео: одна регулярка на все платформы и таблица платформ"""
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from aiogram.types import Message
+
+from services.url_normalizer import canonicalize_url
+
+
+class Link(NamedTuple):
+    """Распознанная ссылка на видео"""
+    platform: str
+    video_id: Optional[str]      # None, если id станет известен только после редиректа
+    canonical_url: str
+    url: str                     # ссылка в том виде, в каком ее прислали
+
+
+@dataclass(frozen=True)
+class PlatformSpec:
+    """Особенности платформы для скачивания"""
+    name: str
+    # Дополнительные настройки yt-dlp для этой платформы
+    ydl_opts: Dict = field(default_factory=dict)
+    # Экстракторы yt-dlp, которые создаются заранее в экземплярах пула (см. ydl_pool)
+    extractors: Tuple[str, ...] = ()
+    # Текст ошибки для слишком длинного видео ({duration} - длительность, {max_duration} - лимит)
+    too_long_error: str = (
+        "Видео слишком длинное ({duration} секунд). "
+        "Поддерживаются только короткие видео до {max_duration} секунд."
+    )
+
+
+PLATFORMS: Dict[str, PlatformSpec] = {
+    "youtube": PlatformSpec(
+        name="youtube",
+        # Ссылка на Shorts никогда не бывает плейлистом, не даем yt-dlp его раскрыть
+        ydl_opts={"noplaylist": True},
+        extractors=("Youtube",),
+        too_long_error=(
+            "Видео слишком длинное ({duration} секунд). "
+            "Поддерживаются только YouTube Shorts или короткие видео до {max_duration} секунд."
+        )
+    ),
+    "instagram": PlatformSpec(name="instagram", extractors=("Instagram",)),
+    "tiktok": PlatformSpec(name="tiktok", extractors=("TikTok", "TikTokVM")),
+}
+DEFAULT_PLATFORM = PlatformSpec(name="other")
+
+# Конец ссылки: до пробела, кавычки или скобки
+_TAIL = r'[^\s<>"\'()\[\]]*'
+
+# Одна регулярка на все форматы ссылок. Имя группы с id определяет платформу
+# через _GROUP_PLATFORMS; более конкретные варианты идут раньше общих
+LINK_RE = re.compile(
+    r'https?://(?:'
+    r'(?:(?:www|m)\.)?youtube\.com/shorts/(?P<youtube_shorts>[\w-]+)'
+    r'|youtu\.be/(?P<youtu_be>[\w-]+)'
+    r'|(?:www\.)?instagram\.com/(?:[\w.]+/)?(?:p|reels?|tv)/(?P<instagram>[\w-]+)'
+    r'|(?:www\.)?instagram\.com/(?P<instagram_other>[^\s/]+)'
+    r'|(?:(?:www|m)\.)?tiktok\.com/@[\w.-]+/video/(?P<tiktok>\d+)'
+    r'|(?:vm|vt)\.tiktok\.com/(?P<tiktok_short>[\w-]+)'
+    r'|(?:(?:www|m)\.)?tiktok\.com/(?P<tiktok_other>[^\s/]+)'
+    r')' + _TAIL,
+    re.IGNORECASE
+)
+
+# Группа -> (платформа, известен ли id видео без сетевых запросов)
+_GROUP_PLATFORMS: Dict[str, Tuple[str, bool]] = {
+    "youtube_shorts": ("youtube", True),
+    "youtu_be": ("youtube", True),
+    "instagram": ("instagram", True),
+    "instagram_other": ("instagram", False),
+    "tiktok": ("tiktok", True),
+    "tiktok_short": ("tiktok", False),
+    "tiktok_other": ("tiktok", False),
+}
+
+
+class LinkRouter:
+    """
+    Находит ссылки на видео в сообщениях за один проход регулярки
+    
+    Результат разбора сообщения кэшируется: фильтр, middleware и обработчик
+    получают одни и те же Link без повторного разбора.
+    """
+    
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._message_cache: OrderedDict[tuple, Tuple[Link, ...]] = OrderedDict()
+        self._url_cache: OrderedDict[str, Optional[Link]] = OrderedDict()
+    
+    @staticmethod
+    def _to_link(match: re.Match) -> Link:
+        group = match.lastgroup
+        platform, has_id = _GROUP_PLATFORMS[group]
+        url = match.group(0).rstrip(".,;:!?")
+        return Link(
+            platform=platform,
+            video_id=match.group(group) if has_id else None,
+            canonical_url=canonicalize_url(url),
+            url=url
+        )
+    
+    def match(self, url: str) -> Optional[Link]:
+        """Распознать одну ссылку (вся строка должна быть ссылкой)"""
+        if url in self._url_cache:
+            self._url_cache.move_to_end(url)
+            return self._url_cache[url]
+        match = LINK_RE.match(url.strip())
+        link = self._to_link(match) if match else None
+        self._url_cache[url] = link
+        if len(self._url_cache) > self.cache_size:
+            self._url_cache.popitem(last=False)
+        return link
+    
+    def find_all(self, text: str) -> Tuple[Link, ...]:
+        """Все ссылки на видео в тексте без повторов (по канонической ссылке)"""
+        if "://" not in text:
+            return ()
+        links = []
+        seen = set()
+        for match in LINK_RE.finditer(text):
+            link = self._to_link(match)
+            if link.canonical_url not in seen:
+                seen.add(link.canonical_url)
+                links.append(link)
+        return tuple(links)
+    
+    def route_message(self, message: Message) -> Tuple[Link, ...]:
+        """
+        Все ссылки на видео из сообщения: из текста (или подписи) и из сущностей text_link
+        
+        Ссылки из text_link идут первыми, затем ссылки из текста.
+        """
+        key = (message.chat.id, message.message_id, message.edit_date)
+        cached = self._message_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        text = message.text or message.caption or ""
+        entities = message.entities or message.caption_entities or ()
+        
+        links = []
+        seen = set()
+        for entity in entities:
+            if entity.type == "text_link" and entity.url:
+                link = self.match(entity.url)
+                if link and link.canonical_url not in seen:
+                    seen.add(link.canonical_url)
+                    links.append(link)
+        for link in self.find_all(text):
+            if link.canonical_url not in seen:
+                seen.add(link.canonical_url)
+                links.append(link)
+        
+        result = tuple(links)
+        self._message_cache[key] = result
+        if len(self._message_cache) > self.cache_size:
+            self._message_cache.popitem(last=False)
+        return result
+
+
+link_router = LinkRouter()
+
+
+def get_platform(url: str) -> str:
+    """Платформа по ссылке: youtube, instagram, tiktok или other (для меток метрик)"""
+    link = link_router.match(url)
+    return link.platform if link else DEFAULT_PLATFORM.name
+
+
+def get_platform_spec(url: str) -> PlatformSpec:
+    """Особенности платформы, к которой относится ссылка"""
+    return PLATFORMS.get(get_platform(url), DEFAULT_PLATFORM)
@@ -0,0 +1,155 @@
+"""Кэш Telegram file_id для повторной отправки видео без скачивания"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database import get_db
+from database.models import MediaCache
+from services.link_router import PLATFORMS, link_router
+
+logger = logging.getLogger(__name__)
+
+# Счетчики попаданий в кэш с момента запуска процесса
+_stats = {"hits": 0, "misses": 0}
+
+
+class MediaCacheService:
+    """Сервис для работы с кэшем отправленных видео"""
+    
+    @staticmethod
+    def make_cache_key(info: Dict) -> Optional[str]:
+        """Канонический ключ видео: экстрактор + id на платформе"""
+        extractor = info.get("extractor_key") or info.get("extractor")
+        video_id = info.get("id")
+        if not extractor or not video_id:
+            return None
+        return f"{extractor.lower()}:{video_id}"
+    
+    @staticmethod
+    def make_url_cache_key(url: str) -> Optional[str]:
+        """
+        Ключ кэша по ссылке, без запроса к платформе
+        
+        Совпадает с make_cache_key, если id видео виден в ссылке (Shorts,
+        посты Instagram, полные ссылки TikTok), иначе None.
+        """
+        link = link_router.match(url)
+        spec = PLATFORMS.get(link.platform) if link else None
+        if not spec or not spec.extractors or not link.video_id:
+            return None
+        return f"{spec.extractors[0].lower()}:{link.video_id}"
+    
+    @staticmethod
+    async def get_file_id(session: AsyncSession, cache_key: str) -> Optional[str]:
+        """
+        Получить file_id из кэша и отметить попадание
+        
+        Промах здесь не считается: запрос проверяет кэш по двум ключам (по
+        ссылке и по id видео), поэтому промах отмечает вызывающий через
+        record_miss, когда не подошел ни один ключ.
+        """
+        now = datetime.utcnow()
+        result = await session.execute(
+            update(MediaCache)
+            .where(
+                MediaCache.cache_key == cache_key,
+                MediaCache.created_at >= now - timedelta(seconds=settings.MEDIA_CACHE_TTL)
+            )
+            .values(hits=MediaCache.hits + 1, last_hit_at=now)
+            .returning(MediaCache.file_id)
+        )
+        file_id = result.scalar_one_or_none()
+        await session.commit()
+        
+        if file_id:
+            _stats["hits"] += 1
+        return file_id
+    
+    @staticmethod
+    def record_miss():
+        """Отметить промах: видео не нашлось в кэше ни по одному ключу"""
+        _stats["misses"] += 1
+    
+    @staticmethod
+    async def save_file_id(
+        session: AsyncSession,
+        cache_key: str,
+        file_id: str,
+        title: Optional[str] = None,
+        duration: Optional[int] = None
+    ):
+        """Сохранить file_id отправленного видео"""
+        now = datetime.utcnow()
+        stmt = insert(MediaCache).values(
+            cache_key=cache_key,
+            file_id=file_id,
+            title=title[:255] if title else None,
+            duration=int(duration) if duration else None,
+            hits=0,
+            created_at=now,
+            last_hit_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaCache.cache_key],
+            set_={"file_id": stmt.excluded.file_id, "created_at": now, "last_hit_at": now}
+        )
+        await session.execute(stmt)
+        await session.commit()
+    
+    @staticmethod
+    async def invalidate(session: AsyncSession, cache_key: str):
+        """Удалить запись из кэша (например, если file_id перестал работать)"""
+        await session.execute(delete(MediaCache).where(MediaCache.cache_key == cache_key))
+        await session.commit()
+    
+    @staticmethod
+    async def evict(session: AsyncSession) -> int:
+        """Удалить устаревшие записи и записи сверх лимита (по давности последнего использования)"""
+        expired = await session.execute(
+            delete(MediaCache).where(
+                MediaCache.created_at < datetime.utcnow() - timedelta(seconds=settings.MEDIA_CACHE_TTL)
+            )
+        )
+        
+        overflow_ids = (
+            select(MediaCache.id)
+            .order_by(MediaCache.last_hit_at.desc())
+            .offset(settings.MEDIA_CACHE_MAX_ENTRIES)
+            .scalar_subquery()
+        )
+        overflow = await session.execute(delete(MediaCache).where(MediaCache.id.in_(overflow_ids)))
+        await session.commit()
+        return (expired.rowcount or 0) + (overflow.rowcount or 0)
+    
+    @staticmethod
+    def get_hit_stats() -> Dict:
+        """Статистика попаданий в кэш с момента запуска"""
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "hit_rate": round(_stats["hits"] / total, 3) if total else 0.0,
+        }
+
+
+async def run_media_cache_eviction():
+    """Фоновая задача: периодически очищает кэш"""
+    while True:
+        await asyncio.sleep(settings.MEDIA_CACHE_EVICT_INTERVAL)
+        try:
+            async for session in get_db():
+                removed = await MediaCacheService.evict(session)
+            stats = MediaCacheService.get_hit_stats()
+            logger.info(
+                f"Кэш медиа: удалено {removed} записей, "
+                f"попаданий {stats['hits']}, промахов {stats['misses']} "
+                f"(hit rate {stats['hit_rate']:.1%})"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при очистке кэша медиа: {e}", exc_info=True)
@@ -0,0 +1,125 @@
+"""Параметры видео для send_video: длительность, размеры и превью"""
+import asyncio
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from aiogram.types import FSInputFile
+
+from config.settings import settings
+from services.postprocess import FFMPEG
+
+logger = logging.getLogger(__name__)
+
+FFPROBE = shutil.which("ffprobe")
+
+# Telegram принимает превью в JPEG до 200 КБ
+THUMBNAIL_MAX_BYTES = 200 * 1024
+
+
+async def _run(*command: str, timeout: float = 30) -> Optional[bytes]:
+    """Запускает команду и возвращает stdout или None при ошибке"""
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        logger.warning(f"{Path(command[0]).name} не завершился за {timeout} секунд")
+        return None
+    if process.returncode != 0:
+        logger.warning(f"{Path(command[0]).name} завершился с ошибкой: {stderr.decode(errors='replace').strip()}")
+        return None
+    return stdout
+
+
+async def probe_file(file_path: str) -> Dict:
+    """Длительность и размеры видео по данным ffprobe"""
+    if not FFPROBE:
+        return {}
+    output = await _run(
+        FFPROBE, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height:format=duration",
+        "-of", "json", file_path
+    )
+    if not output:
+        return {}
+    try:
+        data = json.loads(output)
+    except ValueError:
+        return {}
+    stream = (data.get("streams") or [{}])[0]
+    duration = (data.get("format") or {}).get("duration")
+    return {
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "duration": float(duration) if duration else None,
+    }
+
+
+async def make_thumbnail(file_path: str, duration: Optional[float]) -> Optional[str]:
+    """
+    Сохраняет кадр из видео в JPEG рядом с файлом
+    
+    Кадр берется из первой секунды (или из середины совсем коротких видео),
+    чтобы не попасть на черный первый кадр.
+    
+    Returns:
+        Путь к превью или None
+    """
+    if not (FFMPEG and settings.THUMBNAIL_ENABLED):
+        return None
+    position = min(1.0, duration / 2) if duration else 0
+    size = settings.THUMBNAIL_SIZE
+    thumbnail = str(Path(file_path).with_name(f"{Path(file_path).stem}.thumb.jpg"))
+    output = await _run(
+        FFMPEG, "-y", "-v", "error", "-ss", f"{position:.2f}", "-i", file_path,
+        "-frames:v", "1", "-vf", f"scale={size}:{size}:force_original_aspect_ratio=decrease",
+        "-q:v", "5", thumbnail
+    )
+    if output is None or not Path(thumbnail).exists():
+        return None
+    if Path(thumbnail).stat().st_size > THUMBNAIL_MAX_BYTES:
+        Path(thumbnail).unlink(missing_ok=True)
+        return None
+    return thumbnail
+
+
+async def collect_metadata(file_path: str, result: Dict) -> Dict:
+    """
+    Параметры видео для отправки
+    
+    Длительность и размеры берутся из результата download_video (info
+    yt-dlp), а если их там нет - из ffprobe. Превью вырезается из файла
+    и удаляется вместе с рабочей директорией загрузки.
+    """
+    metadata = {
+        "duration": result.get("duration"),
+        "width": result.get("width"),
+        "height": result.get("height"),
+    }
+    if not all(metadata.values()):
+        probed = await probe_file(file_path)
+        for key, value in probed.items():
+            metadata[key] = metadata[key] or value
+    metadata["thumbnail"] = await make_thumbnail(file_path, metadata["duration"])
+    return metadata
+
+
+def video_kwargs(metadata: Optional[Dict]) -> Dict:
+    """Аргументы send_video (и InputMediaVideo) из collect_metadata или get_stream_source"""
+    kwargs = {"supports_streaming": True}
+    if not metadata:
+        return kwargs
+    for key in ("duration", "width", "height"):
+        if metadata.get(key):
+            kwargs[key] = int(metadata[key])
+    if metadata.get("thumbnail"):
+        kwargs["thumbnail"] = FSInputFile(metadata["thumbnail"])
+    return kwargs
@@ -0,0 +1,167 @@
+"""Метрики процесса: счетчики, текущие значения и гистограммы в формате Prometheus"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Границы корзин по умолчанию, секунды
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Все созданные метрики в порядке создания, из них строится ответ /metrics
+_registry: List["Metric"] = []
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    """Метки в формате {name="value",...}"""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовая метрика с метками, регистрируется при создании"""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+    
+    def render(self) -> List[str]:
+        """Строки метрики в текстовом формате Prometheus"""
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик с метками"""
+    
+    type = "counter"
+    
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[tuple, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str):
+        """Увеличить счетчик"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def snapshot(self) -> Dict[tuple, float]:
+        """Копия значений по наборам меток"""
+        with self._lock:
+            return dict(self._values)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in self.snapshot().items():
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """
+    Текущее значение с метками
+    
+    Значение задается через set или вычисляется функцией callback в момент
+    чтения метрик (для значений, которые дешево посчитать по запросу).
+    """
+    
+    type = "gauge"
+    
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, description, labels)
+        self.callback = callback
+        self._values: Dict[tuple, float] = {}
+    
+    def set(self, value: float, **labels: str):
+        """Задать значение"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def snapshot(self) -> Dict[tuple, float]:
+        """Копия значений по наборам меток"""
+        if self.callback is not None:
+            return {(): self.callback()}
+        with self._lock:
+            return dict(self._values)
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in self.snapshot().items():
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """
+    Гистограмма значений с метками
+    
+    Для каждого набора меток хранит количество наблюдений по корзинам,
+    сумму и общее количество. Безопасна для вызова из потоков пула загрузок.
+    """
+    
+    type = "histogram"
+    
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, dict] = {}
+    
+    def observe(self, value: float, **labels: str):
+        """Добавить наблюдение"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def snapshot(self) -> Dict[tuple, dict]:
+        """Копия накопленных значений по наборам меток"""
+        with self._lock:
+            return {
+                key: {"buckets": list(series["buckets"]), "sum": series["sum"], "count": series["count"]}
+                for key, series in self._series.items()
+            }
+    
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, series in self.snapshot().items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["buckets"]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,295 @@
+"""Постобработка скачанных видео через ffmpeg: faststart и сжатие под лимит размера"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from config.settings import settings
+from services.format_selector import select_format
+from services.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+FFMPEG = shutil.which("ffmpeg")
+
+# Контейнеры, для которых имеет смысл -movflags +faststart
+FASTSTART_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+# Запас на служебные данные контейнера и погрешность битрейта при сжатии
+SIZE_SAFETY_MARGIN = 0.95
+
+postprocess_duration = Histogram(
+    "video_postprocess_duration_seconds",
+    "Время постобработки видео ffmpeg",
+    labels=("stage",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+postprocess_results = Counter(
+    "video_postprocess_total",
+    "Результаты постобработки видео",
+    labels=("stage", "result")
+)
+
+_transcode_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _cpu_count() -> int:
+    """Количество ядер, доступных процессу"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def transcode_concurrency() -> int:
+    """Сколько перекодирований выполняется одновременно"""
+    return settings.TRANSCODE_CONCURRENCY or max(1, _cpu_count() // 2)
+
+
+def _init_transcode_worker(nice: int):
+    """Понижает приоритет процесса пула; запущенные из него ffmpeg наследуют приоритет"""
+    try:
+        os.nice(nice)
+    except OSError as e:
+        logger.warning(f"Не удалось понизить приоритет процесса перекодирования: {e}")
+
+
+def _get_transcode_executor() -> ProcessPoolExecutor:
+    global _transcode_executor
+    if _transcode_executor is None:
+        # Процесс бота многопоточный (event loop, пул загрузок, aiohttp): fork мог бы
+        # скопировать в дочерний процесс блокировки, захваченные другими потоками
+        _transcode_executor = ProcessPoolExecutor(
+            max_workers=transcode_concurrency(),
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_transcode_worker,
+            initargs=(settings.TRANSCODE_NICE,)
+        )
+    return _transcode_executor
+
+
+def shutdown_transcoder():
+    """Остановить процессы пула перекодирования"""
+    global _transcode_executor
+    if _transcode_executor is not None:
+        _transcode_executor.shutdown(wait=False, cancel_futures=True)
+        _transcode_executor = None
+
+
+def _target_video_bitrate(target_size: int, duration: float) -> int:
+    """Битрейт видео, при котором файл уложится в target_size байт"""
+    total_bitrate = target_size * 8 * SIZE_SAFETY_MARGIN / duration
+    return int(total_bitrate - settings.TRANSCODE_AUDIO_BITRATE)
+
+
+def can_transcode(info: Dict, max_filesize: int) -> bool:
+    """
+    Можно ли сжать видео под лимит, если ни один формат в него не укладывается
+    
+    Нужны ffmpeg, известная длительность, приемлемый битрейт после сжатия
+    и формат не больше TRANSCODE_SOURCE_MAX_MB.
+    """
+    duration = info.get("duration")
+    if not (settings.TRANSCODE_ENABLED and FFMPEG and duration):
+        return False
+    if _target_video_bitrate(max_filesize, duration) < settings.TRANSCODE_MIN_VIDEO_BITRATE:
+        return False
+    return select_format(info, settings.TRANSCODE_SOURCE_MAX_MB * MB) is not None
+
+
+def _moov_before_mdat(read_at: Callable[[int, int], bytes]) -> bool:
+    """
+    Стоит ли атом moov перед mdat (по заголовкам атомов верхнего уровня)
+    
+    read_at(position, size) возвращает байты с позиции position (меньше size
+    в конце данных). На битых размерах атомов и на конце данных возвращает
+    False: файл просто перепакуется.
+    """
+    position = 0
+    while True:
+        header = read_at(position, 16)
+        if len(header) < 8:
+            return False
+        size = int.from_bytes(header[:4], "big")
+        kind = header[4:8]
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            return False
+        if size == 1:
+            # 64-битный размер атома, включая 16 байт заголовка
+            if len(header) < 16:
+                return False
+            size = int.from_bytes(header[8:16], "big")
+            if size < 16:
+                return False
+        elif size < 8:
+            # 0 - атом до конца файла, меньше 8 - битый заголовок
+            return False
+        position += size
+
+
+def _has_faststart(path: str) -> bool:
+    """Стоит ли moov перед mdat в файле"""
+    with open(path, "rb") as f:
+        def read_at(position: int, size: int) -> bytes:
+            f.seek(position)
+            return f.read(size)
+        
+        return _moov_before_mdat(read_at)
+
+
+def prefix_has_faststart(prefix: bytes) -> bool:
+    """
+    Стоит ли moov перед mdat, по первым байтам файла
+    
+    False, если ни moov, ни mdat не встретились в prefix: тогда проверить
+    файл можно только после скачивания.
+    """
+    return _moov_before_mdat(lambda position, size: prefix[position:position + size])
+
+
+async def faststart(path: str) -> bool:
+    """
+    Переносит moov в начало файла без перекодирования (-c copy -movflags +faststart)
+    
+    Returns:
+        True, если файл перепакован
+    """
+    if Path(path).suffix.lower() not in FASTSTART_EXTENSIONS:
+        return False
+    if await asyncio.to_thread(_has_faststart, path):
+        postprocess_results.inc(stage="faststart", result="skipped")
+        return False
+    
+    output = f"{path}.faststart{Path(path).suffix}"
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG, "-y", "-v", "error", "-i", path,
+        "-map", "0", "-c", "copy", "-movflags", "+faststart", output,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        logger.warning(f"ffmpeg не смог перепаковать {path}: {stderr.decode(errors='replace').strip()}")
+        postprocess_results.inc(stage="faststart", result="failed")
+        Path(output).unlink(missing_ok=True)
+        return False
+    
+    os.replace(output, path)
+    postprocess_duration.observe(time.perf_counter() - started, stage="faststart")
+    postprocess_results.inc(stage="faststart", result="done")
+    return True
+
+
+def _transcode_sync(source: str, output: str, video_bitrate: int, threads: int) -> Optional[str]:
+    """
+    Двухпроходное сжатие в H.264/AAC, выполняется в процессе пула
+    
+    Returns:
+        Текст ошибки или None
+    """
+    passlog = f"{output}.passlog"
+    common = [
+        "-c:v", "libx264", "-preset", settings.TRANSCODE_PRESET,
+        "-b:v", str(video_bitrate), "-pix_fmt", "yuv420p",
+        "-threads", str(threads), "-passlogfile", passlog,
+    ]
+    commands = [
+        [FFMPEG, "-y", "-v", "error", "-i", source, *common, "-pass", "1", "-an", "-f", "null", os.devnull],
+        [
+            FFMPEG, "-y", "-v", "error", "-i", source, *common, "-pass", "2",
+            "-c:a", "aac", "-b:a", str(settings.TRANSCODE_AUDIO_BITRATE),
+            "-movflags", "+faststart", output,
+        ],
+    ]
+    try:
+        for command in commands:
+            completed = subprocess.run(
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=settings.TRANSCODE_TIMEOUT
+            )
+            if completed.returncode != 0:
+                return completed.stderr.decode(errors="replace").strip()
+    except subprocess.TimeoutExpired:
+        return f"превышено время перекодирования ({settings.TRANSCODE_TIMEOUT} секунд)"
+    finally:
+        for log_file in Path(output).parent.glob(f"{Path(passlog).name}*"):
+            log_file.unlink(missing_ok=True)
+    return None
+
+
+async def transcode_to_size(path: str, target_size: int, duration: float) -> Optional[str]:
+    """
+    Сжимает видео, чтобы оно уложилось в target_size байт
+    
+    Перекодирование выполняется в отдельном пуле процессов с пониженным
+    приоритетом, каждому процессу достается своя доля ядер.
+    
+    Returns:
+        Путь к сжатому файлу (в той же директории) или None, если не получилось
+    """
+    video_bitrate = _target_video_bitrate(target_size, duration)
+    output = str(Path(path).with_name(f"{Path(path).stem}.small.mp4"))
+    threads = max(1, _cpu_count() // transcode_concurrency())
+    
+    logger.info(f"Сжимаю {path} до {target_size} байт, битрейт видео {video_bitrate}")
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    error = await loop.run_in_executor(
+        _get_transcode_executor(), _transcode_sync, path, output, video_bitrate, threads
+    )
+    if error or not os.path.exists(output) or os.path.getsize(output) > target_size:
+        logger.warning(f"Не удалось сжать {path} до {target_size} байт: {error or 'файл получился больше'}")
+        postprocess_results.inc(stage="transcode", result="failed")
+        Path(output).unlink(missing_ok=True)
+        return None
+    
+    postprocess_duration.observe(time.perf_counter() - started, stage="transcode")
+    postprocess_results.inc(stage="transcode", result="done")
+    return output
+
+
+async def postprocess_video(result: Dict, max_filesize: int) -> Dict:
+    """
+    Постобработка результата download_video
+    
+    Всегда переносит moov в начало файла, а файл больше max_filesize
+    пытается сжать. Если ffmpeg недоступен или обработка не удалась,
+    возвращается исходный файл: лимит размера проверит отправка.
+    """
+    if not FFMPEG:
+        return result
+    file_path = result["file_path"]
+    
+    if settings.FFMPEG_FASTSTART:
+        try:
+            await faststart(file_path)
+        except Exception as e:
+            logger.warning(f"Ошибка при перепаковке {file_path}: {e}")
+    
+    duration = result.get("duration")
+    if (
+        settings.TRANSCODE_ENABLED
+        and duration
+        and os.path.getsize(file_path) > max_filesize
+        and _target_video_bitrate(max_filesize, duration) >= settings.TRANSCODE_MIN_VIDEO_BITRATE
+    ):
+        try:
+            compressed = await transcode_to_size(file_path, max_filesize, duration)
+        except Exception as e:
+            logger.error(f"Ошибка при сжатии {file_path}: {e}", exc_info=True)
+            compressed = None
+        if compressed:
+            os.remove(file_path)
+            return {**result, "file_path": compressed}
+    return result
@@ -0,0 +1,111 @@
+"""Прогресс скачивания: передача данных из progress_hooks yt-dlp в event loop"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_snapshot(data: Dict) -> Dict:
+    """Нужные поля из данных progress_hooks yt-dlp"""
+    total = data.get("total_bytes") or data.get("total_bytes_estimate")
+    downloaded = data.get("downloaded_bytes") or 0
+    percent = None
+    if total:
+        percent = min(100.0, downloaded * 100 / total)
+    elif data.get("fragment_count"):
+        # Для DASH/HLS без размера считаем по фрагментам
+        percent = min(100.0, (data.get("fragment_index") or 0) * 100 / data["fragment_count"])
+    return {
+        "percent": percent,
+        "downloaded_bytes": downloaded,
+        "total_bytes": total,
+        "speed": data.get("speed"),
+        "eta": data.get("eta"),
+    }
+
+
+class ProgressPublisher:
+    """
+    Публикует прогресс скачивания, объединяя частые обновления
+    
+    hook() передается в progress_hooks и вызывается в потоке yt-dlp. В event
+    loop попадает только последнее состояние, а callback вызывается не чаще
+    раза в interval секунд и только если процент вырос хотя бы на min_step.
+    Одновременно выполняется не больше одного вызова callback.
+    """
+    
+    def __init__(
+        self,
+        callback: Callable[[Dict], Awaitable[None]],
+        interval: float = settings.PROGRESS_INTERVAL,
+        min_step: float = settings.PROGRESS_MIN_STEP
+    ):
+        self.callback = callback
+        self.interval = interval
+        self.min_step = min_step
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict] = None
+        self._scheduled = False
+        self._next_publish = time.monotonic() + interval
+        self._last_percent: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+    
+    def hook(self, data: Dict):
+        """progress_hook для yt-dlp, вызывается в потоке загрузки"""
+        if data.get("status") != "downloading" or self._closed:
+            return
+        # yt-dlp вызывает хук на каждый блок данных, большинство вызовов отсекаем здесь
+        if time.monotonic() < self._next_publish:
+            return
+        
+        snapshot = make_snapshot(data)
+        with self._lock:
+            self._latest = snapshot
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self._loop.call_soon_threadsafe(self._publish)
+        except RuntimeError:
+            # Event loop уже закрыт
+            pass
+    
+    def _publish(self):
+        """Выполняется в event loop: решает, показывать ли последнее состояние"""
+        with self._lock:
+            snapshot, self._latest = self._latest, None
+            self._scheduled = False
+        # Следующее состояние рассматриваем не раньше чем через interval, даже если
+        # это не показываем: иначе без размера файла или при медленной отправке
+        # hook планировал бы вызов в event loop на каждый блок данных
+        self._next_publish = time.monotonic() + self.interval
+        if snapshot is None or self._closed or snapshot["percent"] is None:
+            return
+        if self._task is not None and not self._task.done():
+            # Предыдущее обновление еще не отправлено
+            return
+        # abs: при повторном скачивании процент начинается с нуля
+        if self._last_percent is not None and abs(snapshot["percent"] - self._last_percent) < self.min_step:
+            return
+        
+        self._last_percent = snapshot["percent"]
+        self._task = self._loop.create_task(self._run_callback(snapshot))
+    
+    async def _run_callback(self, snapshot: Dict):
+        try:
+            await self.callback(snapshot)
+        except Exception as e:
+            logger.warning(f"Не удалось показать прогресс скачивания: {e}")
+    
+    async def close(self):
+        """Перестать публиковать прогресс и дождаться последнего обновления"""
+        self._closed = True
+        if self._task is not None:
+            await self._task
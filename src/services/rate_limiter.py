@@ -0,0 +1,62 @@
+"""Ограничение частоты запросов"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронный token bucket
+    
+    Токены пополняются со скоростью `rate` в секунду, но не больше `capacity`.
+    Каждый acquire забирает один токен и ждет, если токенов нет.
+    """
+    
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def available(self) -> int:
+        """Сколько целых токенов можно забрать прямо сейчас (токены не забираются)"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return 0
+        self._refill(now)
+        return int(self._tokens)
+    
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Забрать tokens токенов без ожидания. Возвращает False, если токенов не хватает"""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+    
+    async def acquire(self):
+        """Дождаться и забрать токен"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        """Приостановить выдачу токенов (например, после RetryAfter от Telegram)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
@@ -0,0 +1,51 @@
+"""Объединение одинаковых одновременных запросов в одну задачу"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Реестр выполняющихся задач по ключу.
+    
+    Если задача с таким ключом уже выполняется, новый вызов не запускает
+    ее повторно, а дожидается общего результата. Отмена одного из ожидающих
+    не отменяет общую задачу.
+    """
+    
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._in_flight
+    
+    def __len__(self) -> int:
+        return len(self._in_flight)
+    
+    def join(
+        self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Tuple[asyncio.Future, bool]:
+        """
+        Запустить func(*args, **kwargs) или присоединиться к задаче с тем же ключом, не дожидаясь ее
+        
+        Returns:
+            Общая задача и True, если она запущена этим вызовом
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            return future, False
+        future = asyncio.ensure_future(func(*args, **kwargs))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future, True
+    
+    async def run(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Выполнить func(*args, **kwargs) или дождаться уже запущенной задачи с тем же ключом"""
+        future, _ = self.join(key, func, *args, **kwargs)
+        return await asyncio.shield(future)
+    
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие были отменены
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,344 @@
+"""Место под загрузки: резервирование, бюджет на диске и фоновая очистка"""
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from services.download_pool import DownloadPoolBusyError
+from services.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Файлы и директории, которые менялись за последние столько секунд, не вытесняются
+# даже при нехватке места: директорию могли только что создать, но еще не заблокировать
+EVICT_MIN_IDLE = 120
+
+# Файл в рабочей директории, на котором процесс держит flock, пока директория в работе.
+# Блокировку снимает ядро, если процесс завершился, поэтому фоновая очистка любого
+# процесса отличает чужие загрузки в работе от забытых
+LOCK_FILE = ".lock"
+
+storage_evicted = Counter(
+    "storage_evicted_total",
+    "Рабочие директории загрузок, удаленные фоновой очисткой",
+    labels=("reason",)
+)
+storage_rejected = Counter(
+    "storage_rejected_total",
+    "Загрузки, отклоненные из-за нехватки места"
+)
+
+
+class StorageFullError(DownloadPoolBusyError):
+    """Не хватило места под загрузку"""
+
+
+class StorageManager:
+    """
+    Рабочие директории загрузок
+    
+    Перед скачиванием под видео резервируется место по оценке размера.
+    Пока сумма резервов превышает бюджет или на диске осталось меньше
+    min_free байт, новые загрузки ждут освобождения места. Небольшие видео
+    можно скачивать в директорию в памяти (scratch_root, например tmpfs).
+    Рабочая директория заблокирована (LOCK_FILE), пока ее не освободят.
+    """
+    
+    def __init__(
+        self,
+        root: Path,
+        budget: int,
+        min_free: int,
+        scratch_root: Optional[Path] = None,
+        scratch_budget: int = 0,
+        scratch_max_file: int = 0
+    ):
+        self.root = root
+        self.budget = budget
+        self.min_free = min_free
+        self.scratch_root = scratch_root
+        self.scratch_budget = scratch_budget
+        self.scratch_max_file = scratch_max_file
+        # Абсолютный путь рабочей директории -> (зарезервировано байт, в scratch ли она)
+        self._reserved: Dict[str, Tuple[int, bool]] = {}
+        # Абсолютный путь рабочей директории -> дескриптор заблокированного LOCK_FILE
+        self._locks: Dict[str, int] = {}
+        self._in_flight = 0
+        self._scratch_in_flight = 0
+        self._freed: Optional[asyncio.Event] = None
+    
+    @property
+    def bytes_in_flight(self) -> int:
+        """Зарезервировано под загрузки в работе (без scratch), байты"""
+        return self._in_flight
+    
+    @property
+    def scratch_bytes_in_flight(self) -> int:
+        """Зарезервировано в scratch, байты"""
+        return self._scratch_in_flight
+    
+    def _free_space(self) -> int:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return shutil.disk_usage(self.root).free
+    
+    def _fits(self, size: int) -> bool:
+        if self.budget and self._in_flight + size > self.budget:
+            return False
+        return self._free_space() - size >= self.min_free
+    
+    def _fits_scratch(self, size: int) -> bool:
+        return (
+            self.scratch_root is not None
+            and size <= self.scratch_max_file
+            and self._scratch_in_flight + size <= self.scratch_budget
+        )
+    
+    async def allocate(
+        self,
+        bot_id: str,
+        size: int,
+        allow_scratch: bool = True,
+        timeout: float = settings.STORAGE_WAIT_TIMEOUT
+    ) -> Path:
+        """
+        Резервирует место и создает рабочую директорию загрузки
+        
+        Директорию нужно освободить через release(), когда файл больше не нужен.
+        
+        Raises:
+            StorageFullError: место не освободилось за timeout секунд
+        """
+        if allow_scratch and self._fits_scratch(size):
+            return self._register(self.scratch_root, bot_id, size, scratch=True)
+        
+        if self.budget and size > self.budget:
+            storage_rejected.inc()
+            raise StorageFullError(f"Загрузка {size} байт больше бюджета {self.budget} байт")
+        
+        if self._freed is None:
+            self._freed = asyncio.Event()
+        deadline = time.monotonic() + timeout
+        while not self._fits(size):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                storage_rejected.inc()
+                raise StorageFullError(
+                    f"Нет места под загрузку: в работе {self._in_flight} байт, нужно еще {size}"
+                )
+            self._freed.clear()
+            try:
+                # Свободное место могут освободить и другие процессы, поэтому проверяем периодически
+                await asyncio.wait_for(self._freed.wait(), timeout=min(remaining, 5))
+            except asyncio.TimeoutError:
+                pass
+        return self._register(self.root, bot_id, size, scratch=False)
+    
+    def _register(self, root: Path, bot_id: str, size: int, scratch: bool) -> Path:
+        job_dir = root / bot_id / uuid.uuid4().hex
+        job_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(job_dir / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        self._locks[_key(job_dir)] = fd
+        self._reserved[_key(job_dir)] = (size, scratch)
+        if scratch:
+            self._scratch_in_flight += size
+        else:
+            self._in_flight += size
+        return job_dir
+    
+    def resize(self, job_dir: Path, size: int):
+        """Заменить оценку размера фактическим размером скачанного файла"""
+        key = _key(job_dir)
+        if key not in self._reserved:
+            return
+        old_size, scratch = self._reserved[key]
+        self._reserved[key] = (size, scratch)
+        if scratch:
+            self._scratch_in_flight += size - old_size
+        else:
+            self._in_flight += size - old_size
+        if size < old_size and self._freed is not None:
+            self._freed.set()
+    
+    def release(self, job_dir: Path):
+        """Удалить рабочую директорию и освободить резерв"""
+        shutil.rmtree(job_dir, ignore_errors=True)
+        fd = self._locks.pop(_key(job_dir), None)
+        if fd is not None:
+            os.close(fd)
+        reserved = self._reserved.pop(_key(job_dir), None)
+        if reserved is None:
+            return
+        size, scratch = reserved
+        if scratch:
+            self._scratch_in_flight -= size
+        else:
+            self._in_flight -= size
+        if self._freed is not None:
+            self._freed.set()
+    
+    def sweep(self) -> int:
+        """
+        Удаляет забытые рабочие директории и посторонние файлы (блокирующая, вызывается в потоке)
+        
+        Записи старше STORAGE_MAX_AGE удаляются всегда. Если загрузки
+        занимают больше бюджета, дополнительно удаляются давно не менявшиеся
+        записи, начиная с самых старых. Директории, заблокированные
+        загрузкой любого процесса, не трогаются.
+        
+        Returns:
+            Количество удаленных записей
+        """
+        now = time.time()
+        removed = 0
+        for root in (self.root, self.scratch_root):
+            if root is None:
+                continue
+            candidates: List[Tuple[float, int, Path]] = []
+            total = 0
+            for path in _entries(root):
+                last_used, size = _usage(path)
+                total += size
+                if path.is_dir() and _is_locked(path):
+                    continue
+                if now - last_used > settings.STORAGE_MAX_AGE:
+                    _remove(path)
+                    storage_evicted.inc(reason="age")
+                    total -= size
+                    removed += 1
+                elif now - last_used > EVICT_MIN_IDLE:
+                    candidates.append((last_used, size, path))
+            
+            budget = self.scratch_budget if root == self.scratch_root else self.budget
+            for _, size, path in sorted(candidates):
+                if not budget or total <= budget:
+                    break
+                _remove(path)
+                storage_evicted.inc(reason="budget")
+                total -= size
+                removed += 1
+        return removed
+
+
+def _key(job_dir: Path) -> str:
+    """Ключ резерва: yt-dlp возвращает абсолютные пути, поэтому сравниваем абсолютные"""
+    return os.path.abspath(job_dir)
+
+
+def _entries(root: Path) -> List[Path]:
+    """
+    Записи, которые может удалить очистка
+    
+    Рабочие директории вида root/<bot_id>/<uuid>, а также файлы в root
+    и root/<bot_id>, которые туда попасть не должны.
+    """
+    entries = []
+    try:
+        bot_dirs = []
+        for entry in os.scandir(root):
+            if entry.is_dir(follow_symlinks=False):
+                bot_dirs.append(entry)
+            else:
+                entries.append(Path(entry.path))
+    except OSError:
+        return []
+    for bot_dir in bot_dirs:
+        try:
+            entries.extend(Path(entry.path) for entry in os.scandir(bot_dir.path))
+        except OSError:
+            continue
+    return entries
+
+
+def _is_locked(job_dir: Path) -> bool:
+    """Заблокирована ли рабочая директория загрузкой (в этом или другом процессе)"""
+    try:
+        fd = os.open(job_dir / LOCK_FILE, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+
+def _remove(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _usage(path: Path) -> Tuple[float, int]:
+    """Время последнего изменения и размер файла или директории"""
+    if path.is_dir() and not path.is_symlink():
+        return _dir_usage(path)
+    try:
+        stat = path.lstat()
+    except OSError:
+        return time.time(), 0
+    return stat.st_mtime, stat.st_size
+
+
+def _dir_usage(job_dir: Path) -> Tuple[float, int]:
+    """Время последнего изменения (по самому свежему файлу) и размер директории"""
+    last_used = 0.0
+    size = 0
+    for dirpath, _, filenames in os.walk(job_dir):
+        try:
+            last_used = max(last_used, os.stat(dirpath).st_mtime)
+        except OSError:
+            continue
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                # Файл удалили, пока мы обходили директорию
+                continue
+            last_used = max(last_used, stat.st_mtime)
+            size += stat.st_size
+    return last_used, size
+
+
+storage = StorageManager(
+    root=Path("downloads"),
+    budget=settings.STORAGE_BUDGET_MB * MB,
+    min_free=settings.STORAGE_MIN_FREE_MB * MB,
+    scratch_root=Path(settings.STORAGE_SCRATCH_DIR) if settings.STORAGE_SCRATCH_DIR else None,
+    scratch_budget=settings.STORAGE_SCRATCH_BUDGET_MB * MB,
+    scratch_max_file=settings.STORAGE_SCRATCH_MAX_FILE_MB * MB
+)
+
+storage_bytes_in_flight = Gauge(
+    "storage_bytes_in_flight",
+    "Место, зарезервированное под загрузки в работе",
+    callback=lambda: storage.bytes_in_flight
+)
+storage_scratch_bytes_in_flight = Gauge(
+    "storage_scratch_bytes_in_flight",
+    "Место, зарезервированное под загрузки в директории в памяти",
+    callback=lambda: storage.scratch_bytes_in_flight
+)
+
+
+async def run_storage_janitor():
+    """Фоновая задача: периодически удаляет забытые рабочие директории"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(storage.sweep)
+            if removed:
+                logger.info(f"Удалено забытых директорий загрузок: {removed}")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке директории загрузок: {e}", exc_info=True)
+        await asyncio.sleep(settings.STORAGE_JANITOR_INTERVAL)
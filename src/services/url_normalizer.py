@@ -0,0 +1,155 @@
+"""Приведение ссылок на видео к каноническому виду"""
+import logging
+import re
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Короткие ссылки, которые нужно раскрыть редиректом
+SHORT_LINK_HOSTS = {"vm.tiktok.com", "vt.tiktok.com"}
+
+# Параметры отслеживания, которые не влияют на содержимое страницы
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "igshid", "igsh", "si", "feature", "is_from_webapp",
+    "sender_device", "sender_web_id", "share_app_id", "share_link_id", "_r", "_t",
+}
+
+_YOUTUBE_ID_RE = re.compile(r'^[\w-]{11}$')
+_INSTAGRAM_PATH_RE = re.compile(r'^/(?:[^/]+/)?(?:p|tv|reels?)/([\w-]+)')
+_TIKTOK_PATH_RE = re.compile(r'^/(@[\w.-]+/video/\d+)')
+
+_SHORT_LINK_CACHE_SIZE = 10_000
+_short_link_cache: OrderedDict[str, str] = OrderedDict()
+
+# Общая HTTP-сессия для раскрытия коротких ссылок: создается при первом запросе,
+# чтобы переиспользовать соединения и DNS-кэш, и закрывается при остановке
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _strip_host(host: str) -> str:
+    """Убирает префиксы www. и m. из имени хоста"""
+    host = host.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+def _youtube_id(host: str, path: str, query: str) -> Optional[str]:
+    """Извлекает id видео из ссылок youtube.com/shorts, youtube.com/watch и youtu.be"""
+    video_id = None
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+    elif host == "youtube.com":
+        parts = path.strip("/").split("/")
+        if len(parts) >= 2 and parts[0] == "shorts":
+            video_id = parts[1]
+        elif parts[0] == "watch":
+            video_id = dict(parse_qsl(query)).get("v")
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        return video_id
+    return None
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Приводит ссылку к каноническому виду без сетевых запросов
+    
+    Одинаковые видео получают одинаковую ссылку: youtu.be, m.youtube.com и
+    youtube.com/shorts сводятся к одному адресу, параметры отслеживания удаляются.
+    """
+    parts = urlsplit(url.strip())
+    host = _strip_host(parts.hostname or "")
+    path = parts.path or "/"
+    
+    youtube_id = _youtube_id(host, path, parts.query)
+    if youtube_id:
+        return f"https://www.youtube.com/shorts/{youtube_id}"
+    
+    if host == "instagram.com":
+        match = _INSTAGRAM_PATH_RE.match(path)
+        if match:
+            return f"https://www.instagram.com/p/{match.group(1)}/"
+    
+    if host == "tiktok.com":
+        match = _TIKTOK_PATH_RE.match(path)
+        if match:
+            return f"https://www.tiktok.com/{match.group(1)}"
+    
+    # Для остальных ссылок удаляем только параметры отслеживания и якорь
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    ])
+    netloc = (parts.hostname or "").lower()
+    if parts.port:
+        netloc += f":{parts.port}"
+    return urlunsplit(((parts.scheme or "https").lower(), netloc, path, query, ""))
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Общая HTTP-сессия, создается при первом обращении"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+
+async def close_session():
+    """Закрыть общую HTTP-сессию (при остановке бота)"""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def resolve_short_url(url: str, timeout: float = 5.0) -> str:
+    """Раскрывает короткую ссылку (vm.tiktok.com) по редиректу, результат кэшируется"""
+    cached = _short_link_cache.get(url)
+    if cached:
+        _short_link_cache.move_to_end(url)
+        return cached
+    
+    try:
+        async with _get_session().get(
+            url, allow_redirects=False, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            location = response.headers.get("Location")
+    except Exception as e:
+        logger.warning(f"Не удалось раскрыть короткую ссылку {url}: {e}")
+        return url
+    
+    if not location:
+        return url
+    
+    _short_link_cache[url] = location
+    if len(_short_link_cache) > _SHORT_LINK_CACHE_SIZE:
+        _short_link_cache.popitem(last=False)
+    return location
+
+
+def normalize_url_cached(url: str) -> str:
+    """
+    То же, что normalize_url, но без сетевых запросов
+    
+    Короткая ссылка раскрывается, только если она уже есть в кэше редиректов,
+    иначе возвращается каноническая форма самой короткой ссылки.
+    """
+    url = url.strip()
+    host = (urlsplit(url).hostname or "").lower()
+    if host in SHORT_LINK_HOSTS:
+        url = _short_link_cache.get(url, url)
+    return canonicalize_url(url)
+
+
+async def normalize_url(url: str) -> str:
+    """Раскрывает короткие ссылки и приводит ссылку к каноническому виду"""
+    url = url.strip()
+    host = (urlsplit(url).hostname or "").lower()
+    if host in SHORT_LINK_HOSTS:
+        url = await resolve_short_url(url)
+    return canonicalize_url(url)
@@ -1,8 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
+from sqlalchemy import select, update, func, values, column, BigInteger, Integer, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from collections import OrderedDict
 from datetime import datetime
+import time
 from typing import Optional
+from database import get_db
 from database.models import User
+from config.settings import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class UserService:
@@ -15,39 +24,61 @@ class UserService:
         username: Optional[str] = None,
         first_name: Optional[str] = None,
         last_name: Optional[str] = None,
-        language_code: Optional[str] = None
-    ) -> User:
-        """Получить пользователя или создать нового"""
-        # Ищем существующего пользователя
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
+        language_code: Optional[str] = None,
+        return_user: bool = False
+    ) -> Optional[User]:
+        """
+        Зарегистрировать пользователя или обновить его профиль
+        
+        Выполняется одним запросом INSERT ... ON CONFLICT DO UPDATE. Если
+        пользователь недавно регистрировался с теми же данными профиля, запрос
+        к базе не выполняется вовсе.
+        
+        Returns:
+            Пользователь, если передан return_user=True, иначе None
+        """
+        profile = (username, first_name, last_name, language_code)
+        if not return_user and recent_users.is_fresh(telegram_id, profile):
+            # Отметку активности запишет буфер счетчиков
+            user_counters.touch(telegram_id)
+            return None
+        
+        now = datetime.utcnow()
+        stmt = insert(User).values(
+            telegram_id=telegram_id,
+            username=username,
+            first_name=first_name,
+            last_name=last_name,
+            language_code=language_code,
+            created_at=now,
+            updated_at=now,
+            last_activity=now
+        )
+        # Пустые поля не затирают уже сохраненные данные профиля
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": func.coalesce(stmt.excluded.username, User.username),
+                "first_name": func.coalesce(stmt.excluded.first_name, User.first_name),
+                "last_name": func.coalesce(stmt.excluded.last_name, User.last_name),
+                "language_code": func.coalesce(stmt.excluded.language_code, User.language_code),
+                "last_activity": now,
+                "updated_at": now,
+            }
         )
-        user = result.scalar_one_or_none()
         
-        if user:
-            # Обновляем данные пользователя
-            user.username = username or user.username
-            user.first_name = first_name or user.first_name
-            user.last_name = last_name or user.last_name
-            user.language_code = language_code or user.language_code
-            user.last_activity = datetime.utcnow()
-            user.updated_at = datetime.utcnow()
-        else:
-            # Создаем нового пользователя
-            user = User(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                language_code=language_code,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-                last_activity=datetime.utcnow()
+        user = None
+        if return_user:
+            result = await session.execute(
+                stmt.returning(User),
+                execution_options={"populate_existing": True}
             )
-            session.add(user)
-        
+            user = result.scalar_one()
+        else:
+            await session.execute(stmt)
         await session.commit()
-        await session.refresh(user)
+        
+        recent_users.remember(telegram_id, profile)
         return user
     
     @staticmethod
@@ -58,35 +89,6 @@ class UserService:
         )
         return result.scalar_one_or_none()
     
-    @staticmethod
-    async def increment_requests(session: AsyncSession, telegram_id: int):
-        """Увеличить счетчик запросов"""
-        await session.execute(
-            update(User)
-            .where(User.telegram_id == telegram_id)
-            .values(
-                total_requests=User.total_requests + 1,
-                last_activity=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-        )
-        await session.commit()
-
-    
-    @staticmethod
-    async def increment_videos_downloaded(session: AsyncSession, telegram_id: int):
-        """Увеличить счетчик скачанных видео"""
-        await session.execute(
-            update(User)
-            .where(User.telegram_id == telegram_id)
-            .values(
-                total_videos_downloaded=User.total_videos_downloaded + 1,
-                last_activity=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-        )
-        await session.commit()
-    
     @staticmethod
     async def get_user_stats(session: AsyncSession, telegram_id: int) -> Optional[dict]:
         """Получить статистику пользователя"""
@@ -94,6 +96,13 @@ class UserService:
         if not user:
             return None
         
+        # Учитываем счетчики, которые еще не записаны в базу
+        pending = user_counters.get_pending(telegram_id)
+        last_activity = max(
+            filter(None, [user.last_activity, pending["last_activity"]]),
+            default=None
+        )
+        
         # Вычисляем количество дней использования
         days_used = 0
         if user.created_at:
@@ -105,19 +114,22 @@ class UserService:
             "first_name": user.first_name,
             "last_name": user.last_name,
             "language_code": user.language_code,
-            "total_requests": user.total_requests,
-            "total_videos_downloaded": user.total_videos_downloaded,
+            "total_requests": (user.total_requests or 0) + pending["requests"],
+            "total_videos_downloaded": (user.total_videos_downloaded or 0) + pending["videos"],
             "created_at": user.created_at.isoformat() if user.created_at else None,
-            "last_activity": user.last_activity.isoformat() if user.last_activity else None,
+            "last_activity": last_activity.isoformat() if last_activity else None,
             "days_used": days_used,
         }
     
     @staticmethod
-    async def get_all_users(session: AsyncSession, limit: int = 100, offset: int = 0) -> list[User]:
-        """Получить список всех пользователей"""
-        query = select(User).order_by(User.created_at.desc()).limit(limit).offset(offset)
-        
-        result = await session.execute(query)
+    async def get_user_ids_after(session: AsyncSession, after_telegram_id: int, limit: int) -> list[int]:
+        """Получить следующую страницу telegram_id (keyset-пагинация по возрастанию)"""
+        result = await session.execute(
+            select(User.telegram_id)
+            .where(User.telegram_id > after_telegram_id)
+            .order_by(User.telegram_id)
+            .limit(limit)
+        )
         return list(result.scalars().all())
     
     @staticmethod
@@ -126,3 +138,146 @@ class UserService:
         query = select(func.count(User.id))
         result = await session.execute(query)
         return result.scalar() or 0
+
+
+class UserCounterBuffer:
+    """
+    Буфер счетчиков пользователей с отложенной записью
+    
+    Инкременты и отметки активности копятся в памяти и записываются в базу
+    одним запросом UPDATE ... FROM (VALUES ...) для всех пользователей сразу.
+    """
+    
+    def __init__(self):
+        self._pending: dict[int, dict] = {}
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def touch(self, telegram_id: int):
+        """Отметить активность пользователя"""
+        self._touch(telegram_id)
+    
+    def _touch(self, telegram_id: int) -> dict:
+        counters = self._pending.get(telegram_id)
+        if counters is None:
+            counters = {"requests": 0, "videos": 0, "last_activity": None}
+            self._pending[telegram_id] = counters
+        counters["last_activity"] = datetime.utcnow()
+        return counters
+    
+    def add_request(self, telegram_id: int):
+        """Учесть запрос пользователя"""
+        self._touch(telegram_id)["requests"] += 1
+    
+    def add_video_downloaded(self, telegram_id: int):
+        """Учесть скачанное видео"""
+        self._touch(telegram_id)["videos"] += 1
+    
+    def get_pending(self, telegram_id: int) -> dict:
+        """Еще не записанные в базу счетчики пользователя"""
+        return self._pending.get(telegram_id) or {"requests": 0, "videos": 0, "last_activity": None}
+    
+    async def flush(self, session: AsyncSession) -> int:
+        """Записать накопленные счетчики в базу одним запросом"""
+        if not self._pending:
+            return 0
+        
+        # Забираем накопленное целиком: новые инкременты попадут в следующий сброс
+        pending, self._pending = self._pending, {}
+        
+        rows = values(
+            column("telegram_id", BigInteger),
+            column("requests", Integer),
+            column("videos", Integer),
+            column("last_activity", DateTime),
+            name="pending_counters"
+        ).data([
+            (telegram_id, c["requests"], c["videos"], c["last_activity"])
+            for telegram_id, c in pending.items()
+        ])
+        
+        try:
+            await session.execute(
+                update(User)
+                .where(User.telegram_id == rows.c.telegram_id)
+                .values(
+                    total_requests=func.coalesce(User.total_requests, 0) + rows.c.requests,
+                    total_videos_downloaded=func.coalesce(User.total_videos_downloaded, 0) + rows.c.videos,
+                    last_activity=rows.c.last_activity,
+                    updated_at=datetime.utcnow()
+                )
+            )
+            await session.commit()
+        except Exception:
+            # Возвращаем счетчики в буфер, чтобы не потерять их
+            self._merge(pending)
+            raise
+        return len(pending)
+    
+    def _merge(self, pending: dict[int, dict]):
+        for telegram_id, counters in pending.items():
+            current = self._pending.get(telegram_id)
+            if current is None:
+                self._pending[telegram_id] = counters
+                continue
+            current["requests"] += counters["requests"]
+            current["videos"] += counters["videos"]
+            current["last_activity"] = max(current["last_activity"], counters["last_activity"])
+
+
+class RecentUsersCache:
+    """
+    Ограниченный по размеру кэш недавно зарегистрированных пользователей
+    
+    Хранит данные профиля, с которыми пользователь был записан в базу, и
+    время истечения записи. Самые давние записи вытесняются при переполнении.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[tuple, float]] = OrderedDict()
+    
+    def is_fresh(self, telegram_id: int, profile: tuple) -> bool:
+        """Пользователь записан в базу недавно и с теми же данными профиля"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return False
+        cached_profile, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[telegram_id]
+            return False
+        return cached_profile == profile
+    
+    def remember(self, telegram_id: int, profile: tuple):
+        """Запомнить, что пользователь записан в базу"""
+        self._entries[telegram_id] = (profile, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+user_counters = UserCounterBuffer()
+recent_users = RecentUsersCache(
+    max_size=settings.RECENT_USERS_CACHE_SIZE,
+    ttl=settings.RECENT_USERS_CACHE_TTL
+)
+
+
+async def flush_user_counters():
+    """Записать накопленные счетчики пользователей в базу"""
+    async for session in get_db():
+        flushed = await user_counters.flush(session)
+        if flushed:
+            logger.debug(f"Записаны счетчики {flushed} пользователей")
+
+
+async def run_user_counters_flush():
+    """Фоновая задача: периодически сбрасывает буфер счетчиков в базу"""
+    while True:
+        await asyncio.sleep(settings.USER_COUNTERS_FLUSH_INTERVAL)
+        try:
+            await flush_user_counters()
+        except Exception as e:
+            logger.error(f"Ошибка при записи счетчиков пользователей: {e}", exc_info=True)
@@ -2,94 +2,426 @@
 import yt_dlp
 import os
 import logging
+import shutil
+import time
+import uuid
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
+from services.download_pool import download_pool
+from services.delivery_backend import get_delivery_backend, get_max_upload_size
+from services.format_selector import estimate_format_size, estimate_selection_size, select_format
+from services.postprocess import FFMPEG, can_transcode, postprocess_video
+from services.storage import MB, storage
+from services.ydl_pool import ydl_pool
+from services.info_cache import info_cache
+from services.metrics import Counter, Histogram
+from services.link_router import get_platform, get_platform_spec
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+probe_duration = Histogram(
+    "video_probe_duration_seconds",
+    "Время получения информации о видео экстрактором",
+    labels=("platform",)
+)
+download_duration = Histogram(
+    "video_download_duration_seconds",
+    "Время скачивания видео",
+    labels=("platform",)
+)
+download_bytes = Counter(
+    "video_download_bytes_total",
+    "Объем скачанных видео",
+    labels=("platform",)
+)
+download_throughput = Histogram(
+    "video_download_throughput_bytes_per_second",
+    "Средняя скорость скачивания файла",
+    labels=("platform",),
+    buckets=(64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6)
+)
+video_errors = Counter(
+    "video_errors_total",
+    "Ошибки обработки видео по платформам и классам",
+    labels=("platform", "error_class")
+)
 
-async def download_video(url: str, bot_id: str = "video_downloader", max_duration: int = 300) -> Dict:
+
+async def probe_video(
+    url: str,
+    max_duration: int = 300,
+    max_filesize: Optional[int] = None,
+    use_cache: bool = True
+) -> Dict:
+    """
+    Получает информацию о видео без скачивания и проверяет ограничения
+    
+    Полученный info можно передать в download_video, чтобы не разбирать
+    страницу видео повторно. Info кэшируется по ссылке, поэтому url
+    должен быть каноническим (см. url_normalizer).
+    
+    Returns:
+        dict со статусом "probed" и info или ошибкой. Для info из кэша
+        в результате есть "cached": True
+    """
+    if max_filesize is None:
+        max_filesize = get_max_upload_size()
+    
+    use_cache = use_cache and settings.INFO_CACHE_ENABLED
+    if use_cache:
+        info = await info_cache.get(url)
+        if info is not None:
+            # Лимиты могли измениться с момента сохранения, проверяем заново
+            return check_limits(info, url, max_duration, max_filesize) or {
+                "status": "probed", "info": info, "cached": True
+            }
+    
+    result = await download_pool.run(_probe_video_sync, url, max_duration, max_filesize)
+    if use_cache and result.get("status") == "probed":
+        await info_cache.set(url, result["info"])
+    return result
+
+
+async def download_video(
+    url: str,
+    bot_id: str = "video_downloader",
+    max_duration: int = 300,
+    max_filesize: Optional[int] = None,
+    info: Optional[Dict] = None,
+    progress_hook: Optional[Callable[[Dict], None]] = None
+) -> Dict:
     """
     Скачивает короткие видео из Instagram, TikTok, YouTube Shorts
     
+    Загрузка выполняется в пуле воркеров, чтобы не блокировать event loop.
+    Если очередь пула переполнена, выбрасывается DownloadPoolBusyError,
+    если под видео не нашлось места на диске - StorageFullError.
+    Файл нужно удалить через cleanup_download.
+    
     Args:
         url: URL видео
         bot_id: ID бота для создания директории
         max_duration: Максимальная длительность видео в секундах (по умолчанию 300 = 5 минут)
+        max_filesize: Максимальный размер файла в байтах (по умолчанию лимит способа отправки)
+        info: Результат probe_video, если страница уже была разобрана
+        progress_hook: progress_hook для yt-dlp (вызывается в потоке пула, см. ProgressPublisher)
         
     Returns:
         dict с путем к файлу и метаданными или ошибкой
     """
+    if max_filesize is None:
+        max_filesize = get_max_upload_size()
+    
+    if info is None:
+        # Размер видео нужен до скачивания, чтобы зарезервировать под него место
+        probe = await probe_video(url, max_duration, max_filesize, use_cache=False)
+        if probe.get("status") != "probed":
+            return probe
+        info = probe["info"]
+    
+    format_spec = select_format(info, max_filesize)
+    download_limit = max_filesize
+    if format_spec is None and can_transcode(info, max_filesize):
+        # Ни один формат не укладывается в лимит: скачиваем больший и сжимаем после скачивания
+        download_limit = settings.TRANSCODE_SOURCE_MAX_MB * MB
+        format_spec = select_format(info, download_limit)
+    format_spec = format_spec or 'best'
+    file_size = estimate_selection_size(info, format_spec) or min(
+        download_limit, settings.STORAGE_DEFAULT_RESERVATION_MB * MB
+    )
+    # Сжатая копия какое-то время лежит рядом с исходным файлом
+    extra_size = max_filesize if download_limit > max_filesize else 0
+    expected_size = _postprocess_reservation(file_size, extra_size)
+    # Локальный сервер Bot API читает файл сам, директория в памяти ему недоступна
+    job_dir = await storage.allocate(bot_id, expected_size, allow_scratch=not get_delivery_backend().shares_files)
+    try:
+        # DASH/HLS скачивается фрагментами в несколько соединений, пул учитывает их все
+        result = await download_pool.run(
+            _download_video_sync, url, bot_id, max_duration, download_limit, info, progress_hook, job_dir, format_spec,
+            connections=_connections_needed(url, info, format_spec)
+        )
+        if result.get("status") == "completed":
+            storage.resize(job_dir, _postprocess_reservation(os.path.getsize(result["file_path"]), extra_size))
+            result = await postprocess_video(result, max_filesize)
+    except BaseException:
+        storage.release(job_dir)
+        raise
+    
+    if result.get("status") == "completed":
+        storage.resize(job_dir, os.path.getsize(result["file_path"]))
+    else:
+        storage.release(job_dir)
+    return result
+
+
+def _postprocess_reservation(file_size: int, extra_size: int = 0) -> int:
+    """Место под файл на время постобработки: faststart пишет перепакованную копию рядом с ним"""
+    if FFMPEG and settings.FFMPEG_FASTSTART:
+        file_size *= 2
+    return file_size + extra_size
+
+
+def check_limits(info: Dict, url: str, max_duration: int, max_filesize: int) -> Optional[Dict]:
+    """
+    Проверяет ограничения по длительности и размеру
+    
+    Returns:
+        dict с ошибкой или None, если видео можно скачивать
+    """
+    duration = info.get("duration") or 0
+    
+    # Проверяем длительность видео
+    if duration > max_duration:
+        logger.warning(f"Видео слишком длинное: {duration} секунд (максимум {max_duration})")
+        spec = get_platform_spec(url)
+        video_errors.inc(platform=spec.name, error_class="too_long")
+        return {
+            "status": "failed",
+            "error": spec.too_long_error.format(duration=duration, max_duration=max_duration)
+        }
+    
+    # Проверяем размер до начала скачивания: если ни один формат не укладывается
+    # в лимит и видео нельзя сжать, отказываем сразу, не тратя трафик
+    if select_format(info, max_filesize) is None and not can_transcode(info, max_filesize):
+        logger.warning(f"Нет форматов меньше {max_filesize} байт: {url}")
+        video_errors.inc(platform=get_platform(url), error_class="too_large")
+        return {
+            "status": "failed",
+            "error": (
+                "Видео слишком большое для отправки в Telegram.\n\n"
+                f"Максимальный размер файла: {max_filesize // (1024 * 1024)} МБ."
+            )
+        }
+    
+    return None
+
+
+def get_stream_source(info: Dict, max_filesize: Optional[int] = None) -> Optional[Dict]:
+    """
+    Источник для отправки видео потоком, без записи на диск
+    
+    Потоком можно передать только однофайловый mp4, доступный по http(s):
+    форматы из нескольких файлов (видео+аудио) требуют склейки, а сегментные
+    (HLS, DASH) - сборки, поэтому для них возвращается None и видео скачивается.
+    
+    Returns:
+        dict с url, заголовками, именем файла и оценкой размера или None
+    """
+    if max_filesize is None:
+        max_filesize = get_max_upload_size()
+    
+    format_id = select_format(info, max_filesize)
+    if format_id is None or "+" in format_id:
+        return None
+    
+    if format_id == "best" and not info.get("formats"):
+        fmt = info
+    else:
+        fmt = next((f for f in info.get("formats") or [] if f.get("format_id") == format_id), None)
+    if not fmt or not fmt.get("url"):
+        return None
+    
+    # Куки источника передаются отдельно от заголовков, такие форматы не стримим
+    if fmt.get("protocol") not in ("http", "https") or fmt.get("ext") != "mp4" or fmt.get("cookies"):
+        return None
+    
+    return {
+        "url": fmt["url"],
+        "headers": fmt.get("http_headers") or info.get("http_headers") or {},
+        "filename": f"{str(info.get('id') or 'video')[:64]}.mp4",
+        "filesize": estimate_format_size(fmt, info.get("duration")),
+        "title": info.get("title", "Video"),
+        "duration": info.get("duration", 0),
+        "width": fmt.get("width"),
+        "height": fmt.get("height"),
+    }
+
+
+def cleanup_download(file_path: str):
+    """Удаляет скачанный файл вместе с рабочей директорией задачи и освобождает место"""
+    storage.release(Path(file_path).parent)
+
+
+def _get_downloaded_path(info: Dict, hook_paths: list[str]) -> Optional[str]:
+    """Итоговый путь к файлу из requested_downloads или хуков постобработки"""
+    for download in reversed(info.get("requested_downloads") or []):
+        file_path = download.get("filepath")
+        if file_path and os.path.exists(file_path):
+            return file_path
+    for file_path in reversed(hook_paths):
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+
+def _download_opts(url: str) -> Dict:
+    """Настройки скачивания платформы из DOWNLOAD_PLATFORM_OPTS (фрагменты, чанки, буфер)"""
+    return settings.DOWNLOAD_PLATFORM_OPTS.get(get_platform(url), {})
+
+
+def _connections_needed(url: str, info: Dict, format_spec: str) -> int:
+    """
+    Сколько соединений откроет загрузка выбранного формата
+    
+    Параллельно качаются только фрагменты DASH/HLS; видео и аудио пары
+    yt-dlp скачивает друг за другом, поэтому берется максимум.
+    """
+    fragment_concurrency = _download_opts(url).get("concurrent_fragment_downloads", 1)
+    formats = {fmt.get("format_id"): fmt for fmt in info.get("formats") or []}
+    needed = 1
+    for format_id in format_spec.split("+"):
+        fmt = formats.get(format_id, info)
+        if fmt.get("fragments") or str(fmt.get("protocol", "")).startswith(("m3u8", "http_dash_segments")):
+            needed = max(needed, fragment_concurrency)
+    return needed
+
+
+def _build_ydl_opts(url: str, downloads_dir: Path, max_filesize: int, format_spec: str = 'best') -> Dict:
+    """Настройки yt-dlp с учетом особенностей платформы"""
+    return {
+        'format': format_spec,
+        # Имя файла по id видео: заголовки бывают длинными и совпадают у разных видео
+        'outtmpl': str(downloads_dir / '%(id).64s.%(ext)s'),
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'max_filesize': max_filesize,
+        **get_platform_spec(url).ydl_opts,
+        **_download_opts(url),
+    }
+
+
+def _make_throughput_hook(platform: str) -> Callable[[Dict], None]:
+    """progress_hook, записывающий объем и скорость скачивания в метрики"""
+    def on_progress(data: Dict):
+        if data.get("status") != "finished":
+            return
+        size = data.get("total_bytes") or data.get("downloaded_bytes") or 0
+        download_bytes.inc(size, platform=platform)
+        elapsed = data.get("elapsed")
+        if size and elapsed:
+            download_throughput.observe(size / elapsed, platform=platform)
+    return on_progress
+
+
+def _probe_video_sync(url: str, max_duration: int, max_filesize: int) -> Dict:
+    """Блокирующее получение информации о видео, выполняется в потоке пула"""
+    logger.info(f"Получаю информацию о видео: {url}")
+    try:
+        # Формат на этапе probe не важен: итоговый выбирает select_format,
+        # главное, чтобы probe не падал на платформах без однофайловых форматов
+        ydl_opts = _build_ydl_opts(url, storage.root, max_filesize, 'best/bestvideo+bestaudio')
+        started = time.perf_counter()
+        with ydl_pool.checkout(get_platform(url), ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            # Приводим info к виду, пригодному для передачи между потоками и процессами
+            info = ydl.sanitize_info(info)
+        probe_duration.observe(time.perf_counter() - started, platform=get_platform(url))
+        
+        error = check_limits(info, url, max_duration, max_filesize)
+        if error:
+            return error
+        
+        return {"status": "probed", "info": info}
+    except Exception as e:
+        return _failed_result(url, e)
+
+
+def _download_video_sync(
+    url: str,
+    bot_id: str,
+    max_duration: int,
+    max_filesize: int,
+    info: Optional[Dict] = None,
+    progress_hook: Optional[Callable[[Dict], None]] = None,
+    job_dir: Optional[Path] = None,
+    format_spec: Optional[str] = None
+) -> Dict:
+    """
+    Блокирующая загрузка через yt-dlp, выполняется в потоке пула
+    
+    Страница видео разбирается экстрактором один раз: после проверки
+    ограничений файл скачивается из уже полученного info через process_ie_result.
+    Формат выбирается заранее по оценке размера, чтобы не скачивать лишнего.
+    """
     logger.info(f"Начинаю скачивание видео: {url}")
     try:
-        # Создаем директорию для загрузок
-        downloads_dir = Path("downloads") / bot_id
-        downloads_dir.mkdir(parents=True, exist_ok=True)
+        if info is None:
+            # Получаем информацию о видео без скачивания
+            probe = _probe_video_sync(url, max_duration, max_filesize)
+            if probe.get("status") != "probed":
+                return probe
+            info = probe["info"]
+        
+        duration = info.get("duration") or 0
+        
+        # Каждая задача получает собственную рабочую директорию,
+        # поэтому параллельные загрузки не пересекаются по именам файлов
+        if job_dir is None:
+            job_dir = storage.root / bot_id / uuid.uuid4().hex
+            job_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Хук постобработки сообщает итоговый путь после перекодирования/слияния
+        hook_paths: list[str] = []
         
-        # Настройки yt-dlp
-        ydl_opts = {
-            'format': 'best',
-            'outtmpl': str(downloads_dir / '%(title)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
+        def on_postprocess(data: Dict):
+            if data.get("status") == "finished":
+                file_path = data.get("info_dict", {}).get("filepath")
+                if file_path:
+                    hook_paths.append(file_path)
+        
+        # Выбираем формат под лимит размера (ограничения уже проверены при получении info)
+        format_spec = format_spec or select_format(info, max_filesize) or 'best'
+        ydl_opts = _build_ydl_opts(url, job_dir, max_filesize, format_spec)
+        ydl_opts['postprocessor_hooks'] = [on_postprocess]
+        ydl_opts['progress_hooks'] = [_make_throughput_hook(get_platform(url))]
+        if progress_hook is not None:
+            ydl_opts['progress_hooks'].append(progress_hook)
+        
+        try:
+            started = time.perf_counter()
+            with ydl_pool.checkout(get_platform(url), ydl_opts) as ydl:
+                # Скачиваем видео из уже разобранной информации, без повторного запроса страницы
+                logger.info(f"Скачиваю видео длительностью {duration} секунд, формат {format_spec}")
+                info = ydl.process_ie_result(info, download=True)
+            download_duration.observe(time.perf_counter() - started, platform=get_platform(url))
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        
+        filename = _get_downloaded_path(info, hook_paths)
+        if filename is None:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise FileNotFoundError(f"yt-dlp не сообщил путь к скачанному файлу: {url}")
+        
+        result = {
+            "status": "completed",
+            "file_path": filename,
+            "title": info.get("title", "video"),
+            "caption": info.get("title", "Видео"),
+            "duration": duration,
+            # Размеры выбранного формата, для пар видео+аудио - размеры видео
+            "width": info.get("width"),
+            "height": info.get("height"),
         }
         
-        # Сначала получаем информацию о видео без скачивания
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Получаем информацию о видео без скачивания
-            info = ydl.extract_info(url, download=False)
-            duration = info.get("duration", 0)
-            
-            # Проверяем длительность видео
-            if duration > max_duration:
-                logger.warning(f"Видео слишком длинное: {duration} секунд (максимум {max_duration})")
-                return {
-                    "status": "failed",
-                    "error": f"Видео слишком длинное ({duration} секунд). Поддерживаются только короткие видео до {max_duration} секунд."
-                }
-            
-            # Если это YouTube, проверяем, что это Shorts
-            if "youtube.com" in url or "youtu.be" in url:
-                # Проверяем, что это Shorts или короткое видео
-                if "shorts" not in url.lower() and duration > max_duration:
-                    return {
-                        "status": "failed",
-                        "error": f"Поддерживаются только YouTube Shorts или короткие видео до {max_duration} секунд."
-                    }
-            
-            # Скачиваем видео
-            logger.info(f"Скачиваю видео длительностью {duration} секунд")
-            ydl_opts_download = ydl_opts.copy()
-            ydl_opts_download['quiet'] = False  # Включаем вывод для отслеживания прогресса
-            with yt_dlp.YoutubeDL(ydl_opts_download) as ydl_download:
-                info = ydl_download.extract_info(url, download=True)
-                filename = ydl_download.prepare_filename(info)
-                
-                # Если файл был переименован, находим его
-                if not os.path.exists(filename):
-                    # Ищем файл в директории
-                    files = list(downloads_dir.glob("*"))
-                    if files:
-                        # Берем самый новый файл
-                        files.sort(key=os.path.getmtime, reverse=True)
-                        filename = str(files[0])
-            
-            result = {
-                "status": "completed",
-                "file_path": filename,
-                "title": info.get("title", "video"),
-                "caption": info.get("title", "Видео"),
-                "duration": duration,
-            }
-            
-            logger.info(f"Видео успешно скачано: {filename}")
-            return result
-    except yt_dlp.utils.DownloadError as e:
+        logger.info(f"Видео успешно скачано: {filename}")
+        return result
+    except Exception as e:
+        return _failed_result(url, e)
+
+
+def _failed_result(url: str, e: Exception) -> Dict:
+    """Преобразует исключение yt-dlp в понятное пользователю сообщение об ошибке"""
+    platform = get_platform(url)
+    if isinstance(e, yt_dlp.utils.DownloadError):
         error_msg = str(e).lower()
         logger.error(f"Ошибка при скачивании видео {url}: {e}", exc_info=True)
         
         # Обрабатываем различные типы ошибок
         if "private" in error_msg or "unavailable" in error_msg:
+            video_errors.inc(platform=platform, error_class="unavailable")
             return {
                 "status": "failed",
                 "error": (
@@ -102,6 +434,7 @@ async def download_video(url: str, bot_id: str = "video_downloader", max_duratio
                 )
             }
         elif "unable to download" in error_msg or "network" in error_msg:
+            video_errors.inc(platform=platform, error_class="network")
             return {
                 "status": "failed",
                 "error": (
@@ -113,6 +446,7 @@ async def download_video(url: str, bot_id: str = "video_downloader", max_duratio
                 )
             }
         elif "sign in" in error_msg or "login" in error_msg:
+            video_errors.inc(platform=platform, error_class="login_required")
             return {
                 "status": "failed",
                 "error": (
@@ -121,6 +455,7 @@ async def download_video(url: str, bot_id: str = "video_downloader", max_duratio
                 )
             }
         elif "age-restricted" in error_msg or "age" in error_msg:
+            video_errors.inc(platform=platform, error_class="age_restricted")
             return {
                 "status": "failed",
                 "error": (
@@ -129,6 +464,7 @@ async def download_video(url: str, bot_id: str = "video_downloader", max_duratio
                 )
             }
         else:
+            video_errors.inc(platform=platform, error_class="download_error")
             return {
                 "status": "failed",
                 "error": (
@@ -140,16 +476,17 @@ async def download_video(url: str, bot_id: str = "video_downloader", max_duratio
                     "Проверьте ссылку и попробуйте снова."
                 )
             }
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка при скачивании видео {url}: {e}", exc_info=True)
-        return {
-            "status": "failed",
-            "error": (
-                "Произошла ошибка при обработке запроса.\n\n"
-                "Попробуйте:\n"
-                "• Проверить правильность ссылки\n"
-                "• Повторить попытку позже\n"
-                "• Использовать /help для получения справки"
-            )
-        }
+    
+    logger.error(f"Неожиданная ошибка при скачивании видео {url}: {e}", exc_info=True)
+    video_errors.inc(platform=platform, error_class="unexpected")
+    return {
+        "status": "failed",
+        "error": (
+            "Произошла ошибка при обработке запроса.\n\n"
+            "Попробуйте:\n"
+            "• Проверить правильность ссылки\n"
+            "• Повторить попытку позже\n"
+            "• Использовать /help для получения справки"
+        )
+    }
 
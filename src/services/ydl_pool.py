@@ -0,0 +1,189 @@
+"""Пул долгоживущих экземпляров YoutubeDL по платформам"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import yt_dlp
+
+from config.settings import settings
+from services.link_router import PLATFORMS
+from services.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Настройки, которые меняются от запроса к запросу. Остальные настройки
+# одинаковы для всех запросов платформы и задаются при создании экземпляра
+REQUEST_OPTS = ("format", "outtmpl", "max_filesize", "progress_hooks", "postprocessor_hooks")
+
+# Закрытые методы и атрибуты YoutubeDL, через которые экземпляр перенастраивается
+# под новый запрос (см. YdlPool._prepare). Версия yt-dlp не закреплена: если в
+# установленной версии их нет или они ведут себя иначе, пул перестает переиспользовать
+# экземпляры и создает новый YoutubeDL на каждый запрос
+REUSE_METHODS = ("_parse_outtmpl", "build_format_selector")
+REUSE_ATTRS = ("_progress_hooks", "_postprocessor_hooks", "_download_retcode")
+
+ydl_instances_created = Counter(
+    "ydl_instances_created_total",
+    "Созданные экземпляры YoutubeDL",
+    labels=("platform",)
+)
+ydl_checkouts = Counter(
+    "ydl_checkouts_total",
+    "Выдачи экземпляров YoutubeDL из пула",
+    labels=("platform", "reused")
+)
+
+
+class _Entry:
+    """Экземпляр YoutubeDL в пуле и число его использований"""
+    
+    def __init__(self, ydl: yt_dlp.YoutubeDL):
+        self.ydl = ydl
+        self.uses = 0
+
+
+class YdlPool:
+    """
+    Пул экземпляров YoutubeDL
+    
+    Создание YoutubeDL - это регистрация всех экстракторов, cookie jar и HTTP-клиент,
+    поэтому экземпляры переиспользуются между запросами одной платформы: сохраняются
+    созданные экстракторы и keep-alive соединения с CDN. Экземпляр одновременно
+    выдается только одному потоку и пересоздается после max_uses использований
+    или после ошибки.
+    """
+    
+    def __init__(self, max_uses: int, max_idle: int):
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self.reuse = max_uses > 0
+        if self.reuse and not all(hasattr(yt_dlp.YoutubeDL, name) for name in REUSE_METHODS):
+            self._disable_reuse("нет нужных методов YoutubeDL")
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str], List[_Entry]] = {}
+        self._closed = False
+    
+    def _create(self, platform: str, base_opts: Dict) -> _Entry:
+        ydl = yt_dlp.YoutubeDL(dict(base_opts))
+        if not all(hasattr(ydl, name) for name in REUSE_ATTRS):
+            self._disable_reuse("нет нужных атрибутов YoutubeDL")
+        # Создаем экстракторы платформы заранее, а не при первом запросе
+        spec = PLATFORMS.get(platform)
+        for ie_key in spec.extractors if spec else ():
+            ydl.get_info_extractor(ie_key)
+        ydl_instances_created.inc(platform=platform)
+        return _Entry(ydl)
+    
+    def _disable_reuse(self, reason: str):
+        """Перейти на новый экземпляр YoutubeDL для каждого запроса"""
+        if self.reuse:
+            logger.warning(
+                f"yt-dlp {yt_dlp.version.__version__} не поддерживает переиспользование "
+                f"экземпляров ({reason}), YoutubeDL создается на каждый запрос"
+            )
+        self.reuse = False
+    
+    @staticmethod
+    def _prepare(ydl: yt_dlp.YoutubeDL, request_opts: Dict):
+        """Применяет настройки запроса к уже созданному экземпляру"""
+        for key, value in request_opts.items():
+            if key not in ("progress_hooks", "postprocessor_hooks"):
+                ydl.params[key] = value
+        # YoutubeDL разбирает шаблон имени и формат при создании, повторяем это вручную
+        ydl.params["outtmpl"] = {"default": request_opts.get("outtmpl", "%(id)s.%(ext)s")}
+        ydl._parse_outtmpl()
+        ydl.format_selector = ydl.build_format_selector(request_opts.get("format", "best"))
+        ydl._progress_hooks = list(request_opts.get("progress_hooks", []))
+        ydl._postprocessor_hooks = list(request_opts.get("postprocessor_hooks", []))
+        ydl._download_retcode = 0
+    
+    @contextmanager
+    def checkout(self, platform: str, ydl_opts: Dict) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Выдает экземпляр YoutubeDL с настройками ydl_opts на время блока with
+        
+        Экземпляры различаются по платформе и настройкам, не входящим в REQUEST_OPTS.
+        """
+        if not self.reuse:
+            yield from self._checkout_fresh(platform, ydl_opts)
+            return
+        
+        base_opts = {key: value for key, value in ydl_opts.items() if key not in REQUEST_OPTS}
+        request_opts = {key: value for key, value in ydl_opts.items() if key in REQUEST_OPTS}
+        key = (platform, repr(sorted(base_opts.items())))
+        
+        with self._lock:
+            idle = self._idle.get(key)
+            entry = idle.pop() if idle else None
+        reused = entry is not None
+        if entry is None:
+            entry = self._create(platform, base_opts)
+        if self.reuse:
+            try:
+                self._prepare(entry.ydl, request_opts)
+            except (AttributeError, TypeError) as e:
+                # Внутреннее устройство YoutubeDL изменилось в новой версии yt-dlp
+                self._disable_reuse(str(e))
+        if not self.reuse:
+            self._checkin(key, entry, recycle=True)
+            yield from self._checkout_fresh(platform, ydl_opts)
+            return
+        ydl_checkouts.inc(platform=platform, reused=str(reused).lower())
+        
+        broken = False
+        try:
+            yield entry.ydl
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            entry.uses += 1
+            # Хуки запроса держат ссылки на его объекты, не храним их в пуле
+            entry.ydl._progress_hooks = []
+            entry.ydl._postprocessor_hooks = []
+            self._checkin(key, entry, recycle=broken or entry.uses >= self.max_uses)
+    
+    def _checkout_fresh(self, platform: str, ydl_opts: Dict) -> Iterator[yt_dlp.YoutubeDL]:
+        """Новый экземпляр со всеми настройками запроса, закрывается после блока with"""
+        ydl_checkouts.inc(platform=platform, reused="false")
+        ydl_instances_created.inc(platform=platform)
+        ydl = yt_dlp.YoutubeDL(dict(ydl_opts))
+        try:
+            yield ydl
+        finally:
+            try:
+                ydl.close()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии экземпляра YoutubeDL: {e}")
+    
+    def _checkin(self, key: Tuple[str, str], entry: _Entry, recycle: bool):
+        if not recycle:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if not self._closed and len(idle) < self.max_idle:
+                    idle.append(entry)
+                    return
+        try:
+            entry.ydl.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии экземпляра YoutubeDL: {e}")
+    
+    def close(self):
+        """Закрыть все свободные экземпляры и больше не принимать их обратно"""
+        with self._lock:
+            self._closed = True
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for entry in entries:
+            try:
+                entry.ydl.close()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии экземпляра YoutubeDL: {e}")
+
+
+ydl_pool = YdlPool(
+    max_uses=settings.YDL_POOL_MAX_USES,
+    # Одновременно экземпляры нужны не больше чем потокам пула загрузок
+    max_idle=settings.WORKER_CONCURRENCY
+)
@@ -0,0 +1,15 @@
+"""Общие настройки тестов: переменные окружения, без которых не загружаются настройки"""
+import os
+
+for name, value in {
+    "PYTHONPATH": "src",
+    "TELEGRAM_BOT_TOKEN": "123456:test",
+    "TELEGRAM_BOT_NAME": "test_bot",
+    "TELEGRAM_ADMINS_ID": "1",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_DB": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,140 @@
+"""Тесты контроля допуска: приоритеты, вытеснение из очереди, лимиты пользователя"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import url_normalizer
+from services.admission import (
+    PRIORITY_ADMIN,
+    PRIORITY_DEFAULT,
+    PRIORITY_WARM,
+    REJECT_OVERLOADED,
+    REJECT_USER_RATE,
+    AdmissionController,
+    AdmissionRejectedError,
+)
+from services.info_cache import info_cache
+from services.link_router import link_router
+
+
+def make_controller(**overrides) -> AdmissionController:
+    options = dict(concurrency=1, queue_size=1, user_concurrency=10, user_rate=0.001, user_burst=10)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_higher_priority_sheds_last_lower_priority_request():
+    async def scenario():
+        controller = make_controller()
+        active = controller.enter(1, PRIORITY_DEFAULT)
+        queued = controller.enter(2, PRIORITY_DEFAULT)
+        warm = controller.enter(3, PRIORITY_WARM)
+        
+        with pytest.raises(AdmissionRejectedError):
+            await queued.wait()
+        queued.release()
+        
+        active.release()
+        await warm.wait()
+        assert warm.state == "active"
+        warm.release()
+        return controller
+    
+    controller = asyncio.run(scenario())
+    assert controller.active == 0
+    assert controller.queued == 0
+
+
+def test_full_queue_rejects_equal_priority():
+    async def scenario():
+        controller = make_controller()
+        controller.enter(1, PRIORITY_DEFAULT)
+        controller.enter(2, PRIORITY_DEFAULT)
+        with pytest.raises(AdmissionRejectedError) as error:
+            controller.enter(3, PRIORITY_DEFAULT)
+        return error.value.reason
+    
+    assert asyncio.run(scenario()) == REJECT_OVERLOADED
+
+
+def test_overloaded_rejection_keeps_rate_token():
+    async def scenario():
+        controller = make_controller(queue_size=0, user_burst=1)
+        active = controller.enter(1, PRIORITY_ADMIN)
+        with pytest.raises(AdmissionRejectedError) as overloaded:
+            controller.enter(2, PRIORITY_DEFAULT)
+        active.release()
+        
+        # Токен пользователя 2 не был списан, поэтому запрос допускается
+        ticket = controller.enter(2, PRIORITY_DEFAULT)
+        ticket.release()
+        with pytest.raises(AdmissionRejectedError) as limited:
+            controller.enter(2, PRIORITY_DEFAULT)
+        return overloaded.value.reason, limited.value.reason
+    
+    assert asyncio.run(scenario()) == (REJECT_OVERLOADED, REJECT_USER_RATE)
+
+
+def test_batch_spends_one_token_per_link():
+    async def scenario():
+        controller = make_controller(concurrency=5, user_burst=3)
+        first = controller.enter(2, PRIORITY_DEFAULT, links=20)
+        first.release()
+        with pytest.raises(AdmissionRejectedError) as limited:
+            controller.enter(2, PRIORITY_DEFAULT, links=1)
+        return first.links, limited.value.reason
+    
+    assert asyncio.run(scenario()) == (3, REJECT_USER_RATE)
+
+
+def test_warm_priority_uses_normalized_cache_key(monkeypatch):
+    from bot.admission import get_priority
+    
+    short_url = "https://vm.tiktok.com/ZMabcdef/"
+    resolved_url = "https://www.tiktok.com/@user/video/1234567890?is_from_webapp=1"
+    key = url_normalizer.canonicalize_url(resolved_url)
+    link = link_router.match(short_url)
+    message = SimpleNamespace(from_user=SimpleNamespace(id=2))
+    
+    info_cache.memory.set(key, {"id": "1234567890"}, ttl=60)
+    try:
+        # Короткую ссылку еще не раскрывали: приоритет считается без сетевого запроса
+        assert get_priority(message, [link]) == PRIORITY_DEFAULT
+        
+        monkeypatch.setitem(url_normalizer._short_link_cache, short_url, resolved_url)
+        assert get_priority(message, [link]) == PRIORITY_WARM
+    finally:
+        info_cache.memory.invalidate(key)
+
+
+def test_rate_limited_user_triggers_no_lookups(monkeypatch):
+    from bot import admission as middleware_module
+    
+    async def scenario():
+        controller = make_controller(user_burst=1)
+        middleware = middleware_module.AdmissionMiddleware(controller)
+        answers = []
+        handled = []
+        
+        async def answer(text):
+            answers.append(text)
+        
+        async def handler(event, data):
+            handled.append(list(data["links"]))
+        
+        def lookup(*args):
+            raise AssertionError("приоритет не должен считаться для пользователя сверх лимита")
+        
+        links = [link_router.match("https://www.youtube.com/shorts/abcdefghijk")] * 2
+        message = SimpleNamespace(from_user=SimpleNamespace(id=2), answer=answer)
+        await middleware(handler, message, {"links": links})
+        
+        monkeypatch.setattr(middleware_module, "get_priority", lookup)
+        await middleware(handler, message, {"links": links})
+        return handled, answers
+    
+    handled, answers = asyncio.run(scenario())
+    # Из двух ссылок хватило токена на одну, второе сообщение отклонено до расчета приоритета
+    assert [len(links) for links in handled] == [1]
+    assert len(answers) == 2
@@ -0,0 +1,110 @@
+"""Тесты пачек ссылок: общие загрузки с одиночными запросами и другими пачками"""
+import asyncio
+import itertools
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from bot import batch, delivery
+
+
+class StubBot:
+    """Заглушка Bot: отправленные видео получают file_id, равный переданному"""
+    
+    def __init__(self):
+        self.videos = []
+        self._ids = itertools.count(1)
+    
+    def _message(self, chat_id, video):
+        self.videos.append((chat_id, video))
+        return SimpleNamespace(message_id=next(self._ids), video=SimpleNamespace(file_id=video))
+    
+    async def send_video(self, chat_id, video, **kwargs):
+        return self._message(chat_id, video)
+    
+    async def send_media_group(self, chat_id, media):
+        return [self._message(chat_id, item.media) for item in media]
+    
+    def __getattr__(self, name):
+        async def method(**kwargs):
+            return SimpleNamespace(message_id=next(self._ids), video=None)
+        return method
+
+
+@pytest.fixture
+def prepared(monkeypatch):
+    """Подменяет получение видео: считает вызовы, видео приходит из "кэша" с file_id по ссылке"""
+    calls = Counter()
+    
+    async def prepare_video(url):
+        calls[url] += 1
+        await asyncio.sleep(0.05)
+        return {"status": "cached", "file_id": f"file:{url}"}
+    
+    monkeypatch.setattr(batch, "prepare_video", prepare_video)
+    return calls
+
+
+def _batch(bot, chat_id, urls):
+    return batch.deliver_batch(bot, chat_id=chat_id, user_id=chat_id, urls=urls, status_message_id=0)
+
+
+def test_overlapping_batches_share_downloads_without_deadlock(prepared):
+    bot = StubBot()
+    
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(_batch(bot, 1, ["a", "b", "c"]), _batch(bot, 2, ["c", "b", "d"])),
+            timeout=5
+        )
+    
+    first, second = asyncio.run(scenario())
+    assert first["sent"] == 3 and second["sent"] == 3
+    assert prepared == Counter({"a": 1, "b": 1, "c": 1, "d": 1})
+    assert sorted(video for chat, video in bot.videos if chat == 2) == ["file:b", "file:c", "file:d"]
+
+
+def test_duplicate_link_in_batch_is_prepared_once(prepared):
+    bot = StubBot()
+    result = asyncio.run(asyncio.wait_for(_batch(bot, 1, ["a", "a"]), timeout=5))
+    
+    assert prepared == Counter({"a": 1})
+    assert result["statuses"] == ["completed", "completed"]
+    assert bot.videos == [(1, "file:a")]
+
+
+def test_single_request_waits_for_batch(prepared):
+    bot = StubBot()
+    
+    async def scenario():
+        batch_task = asyncio.ensure_future(_batch(bot, 1, ["a", "b"]))
+        await asyncio.sleep(0)
+        single = await delivery.deliver_video(bot, chat_id=2, user_id=2, url="a", status_message_id=0)
+        await batch_task
+        return single
+    
+    single = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert single["status"] == "completed"
+    assert prepared == Counter({"a": 1, "b": 1})
+    assert (2, "file:a") in bot.videos
+
+
+def test_batch_failure_is_reported_to_waiting_requests(prepared, monkeypatch):
+    bot = StubBot()
+    
+    async def send_media_group(chat_id, media):
+        raise RuntimeError("album failed")
+    
+    async def send_video(chat_id, video, **kwargs):
+        raise RuntimeError("video failed")
+    
+    bot.send_media_group = send_media_group
+    bot.send_video = send_video
+    
+    async def scenario():
+        return await asyncio.gather(_batch(bot, 1, ["a", "b"]), _batch(StubBot(), 2, ["a"]))
+    
+    first, second = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert first["statuses"] == ["failed", "failed"]
+    assert second["statuses"] == ["failed"]
@@ -0,0 +1,118 @@
+"""Тесты аренды рассылок: одну рассылку выполняет один процесс (на SQLite в памяти)"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models import Broadcast, User
+from services.broadcast_service import BROADCAST_DONE, BroadcastService
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутину-сценарий с фабрикой сессий свежей базы"""
+    async def scenario(test):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Broadcast.__table__.create)
+            await conn.run_sync(User.__table__.create)
+        await test(async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        await engine.dispose()
+    
+    return lambda test: asyncio.run(scenario(test))
+
+
+async def _create(session: AsyncSession) -> Broadcast:
+    return await BroadcastService.create(session, text="Привет", admin_chat_id=1, status_message_id=10, total_users=25)
+
+
+async def _expire_lease(session: AsyncSession, broadcast_id: int):
+    await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id)
+        .values(lease_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await session.commit()
+
+
+def test_broadcast_is_claimed_by_one_owner(run):
+    async def test(sessions):
+        async with sessions() as session:
+            broadcast = await _create(session)
+            
+            assert (await BroadcastService.claim(session, broadcast.id, "r1")).owner == "r1"
+            assert await BroadcastService.claim(session, broadcast.id, "r2") is None
+            
+            await _expire_lease(session, broadcast.id)
+            assert (await BroadcastService.claim(session, broadcast.id, "r2")).owner == "r2"
+            
+            # Прежний владелец больше не сохраняет прогресс и не продлевает аренду
+            assert not await BroadcastService.save_progress(session, broadcast.id, "r1", 5, 5, 0)
+            assert not await BroadcastService.renew(session, broadcast.id, "r1")
+            assert await BroadcastService.save_progress(session, broadcast.id, "r2", 5, 5, 0)
+    
+    run(test)
+
+
+def test_released_broadcast_can_be_claimed_at_once(run):
+    async def test(sessions):
+        async with sessions() as session:
+            broadcast = await _create(session)
+            await BroadcastService.claim(session, broadcast.id, "r1")
+            await BroadcastService.release(session, broadcast.id, "r1")
+            assert (await BroadcastService.claim(session, broadcast.id, "r2")).owner == "r2"
+            
+            await BroadcastService.finish(session, broadcast.id)
+            await _expire_lease(session, broadcast.id)
+            assert await BroadcastService.claim(session, broadcast.id, "r3") is None
+    
+    run(test)
+
+
+def test_replicas_send_a_broadcast_once(run, monkeypatch):
+    from bot import broadcast as broadcast_module
+    
+    class StubBot:
+        def __init__(self):
+            self.sent = []
+        
+        async def send_message(self, chat_id, text):
+            self.sent.append(chat_id)
+            await asyncio.sleep(0)
+        
+        async def edit_message_text(self, **kwargs):
+            pass
+    
+    async def test(sessions):
+        async def get_db():
+            async with sessions() as session:
+                yield session
+        
+        monkeypatch.setattr(broadcast_module, "get_db", get_db)
+        monkeypatch.setattr(broadcast_module.settings, "BROADCAST_RATE", 10_000.0)
+        monkeypatch.setattr(broadcast_module.settings, "BROADCAST_CONCURRENCY", 4)
+        async with sessions() as session:
+            session.add_all(
+                User(telegram_id=telegram_id, created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+                for telegram_id in range(1, 26)
+            )
+            await session.commit()
+            broadcast = await _create(session)
+        
+        bot = StubBot()
+        # Две реплики подхватывают одну рассылку одновременно
+        await asyncio.gather(
+            broadcast_module.run_broadcast(bot, broadcast.id),
+            broadcast_module.run_broadcast(bot, broadcast.id)
+        )
+        
+        async with sessions() as session:
+            finished = await BroadcastService.get(session, broadcast.id)
+        assert sorted(bot.sent) == list(range(1, 26))
+        assert finished.status == BROADCAST_DONE
+        assert finished.sent == 25
+        assert finished.owner is None
+    
+    run(test)
@@ -0,0 +1,113 @@
+"""Тесты отправки видео: кэш file_id по ссылке и отправка ожидавшим запросам"""
+import asyncio
+
+import pytest
+
+from bot import delivery
+from services.media_cache_service import MediaCacheService
+
+
+@pytest.mark.parametrize("url, info", [
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", {"extractor_key": "Youtube", "id": "dQw4w9WgXcQ"}),
+    ("https://www.instagram.com/p/C8xYz12AbCd/", {"extractor_key": "Instagram", "id": "C8xYz12AbCd"}),
+    (
+        "https://www.tiktok.com/@someone/video/7312345678901234567",
+        {"extractor_key": "TikTok", "id": "7312345678901234567"},
+    ),
+])
+def test_url_cache_key_matches_info_cache_key(url, info):
+    assert MediaCacheService.make_url_cache_key(url) == MediaCacheService.make_cache_key(info)
+
+
+@pytest.mark.parametrize("url", [
+    "https://vm.tiktok.com/ZMrAbCdEf/",
+    "https://www.instagram.com/someone",
+    "https://example.com/video.mp4",
+])
+def test_url_cache_key_unknown_without_video_id(url):
+    assert MediaCacheService.make_url_cache_key(url) is None
+
+
+class RecordingBot:
+    """Заглушка Bot, записывающая вызовы"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __getattr__(self, name):
+        async def method(**kwargs):
+            self.calls.append((name, kwargs))
+        return method
+
+
+def _follow(monkeypatch, leader_result):
+    async def run(key, func, *args):
+        return leader_result
+    
+    monkeypatch.setattr(delivery.video_requests, "run", run)
+    bot = RecordingBot()
+    asyncio.run(delivery.deliver_video(bot, chat_id=2, user_id=2, url="https://youtu.be/x", status_message_id=5))
+    return [name for name, _ in bot.calls], dict(bot.calls)
+
+
+def test_follower_gets_video_by_file_id(monkeypatch):
+    names, calls = _follow(
+        monkeypatch, {"status": "completed", "file_id": "FILE", "chat_id": 1, "message_id": 7}
+    )
+    assert names[0] == "send_video"
+    assert calls["send_video"] == {"chat_id": 2, "video": "FILE"}
+
+
+def test_follower_gets_copy_when_leader_has_no_file_id(monkeypatch):
+    names, calls = _follow(
+        monkeypatch, {"status": "completed", "file_id": None, "chat_id": 1, "message_id": 7}
+    )
+    assert "send_video" not in names
+    assert calls["copy_message"] == {"chat_id": 2, "from_chat_id": 1, "message_id": 7}
+
+
+class PrefixBackend:
+    def __init__(self, prefix: bytes):
+        self.prefix = prefix
+    
+    async def read_stream_prefix(self, bot, source, size):
+        return self.prefix[:size]
+
+
+@pytest.mark.parametrize("first, streamed", [(b"moov", True), (b"mdat", False)])
+def test_only_moov_first_sources_are_streamed(monkeypatch, first, streamed):
+    monkeypatch.setattr(delivery, "FFMPEG", "ffmpeg")
+    monkeypatch.setattr(delivery.settings, "FFMPEG_FASTSTART", True)
+    prefix = (12).to_bytes(4, "big") + b"ftypisom" + (8).to_bytes(4, "big") + first
+    backend = PrefixBackend(prefix)
+    assert asyncio.run(delivery._stream_has_faststart(None, backend, {"url": "https://cdn/video.mp4"})) == streamed
+
+
+def test_cold_request_counts_one_cache_miss(monkeypatch):
+    lookups = []
+    
+    async def get_db():
+        yield None
+    
+    async def get_file_id(session, cache_key):
+        lookups.append(cache_key)
+        return None
+    
+    async def probe_video(url):
+        # id из ссылки не совпадает с id видео: кэш проверяется по двум ключам
+        return {"status": "probed", "info": {"extractor_key": "Youtube", "id": "otherVideoId"}}
+    
+    async def download_and_send(*args, **kwargs):
+        return {"status": "failed", "error": "test"}
+    
+    monkeypatch.setattr(delivery, "get_db", get_db)
+    monkeypatch.setattr(MediaCacheService, "get_file_id", get_file_id)
+    monkeypatch.setattr(delivery, "probe_video", probe_video)
+    monkeypatch.setattr(delivery, "_download_and_send", download_and_send)
+    monkeypatch.setattr(delivery.settings, "STREAM_UPLOADS", False)
+    misses = MediaCacheService.get_hit_stats()["misses"]
+    
+    url = "https://www.youtube.com/shorts/dQw4w9WgXcQ"
+    asyncio.run(delivery.fetch_and_send_video(RecordingBot(), chat_id=2, url=url, status_message_id=5))
+    assert lookups == ["youtube:dQw4w9WgXcQ", "youtube:otherVideoId"]
+    assert MediaCacheService.get_hit_stats()["misses"] == misses + 1
@@ -0,0 +1,42 @@
+"""Тесты бюджета соединений пула загрузок"""
+import asyncio
+import time
+
+from services.download_pool import DownloadPool
+
+
+def test_streams_and_tasks_share_connection_budget():
+    async def scenario():
+        pool = DownloadPool(concurrency=4, queue_size=10, max_connections=3)
+        peak = 0
+        
+        async def stream():
+            nonlocal peak
+            async with pool.reserve_connections():
+                peak = max(peak, pool.connections)
+                await asyncio.sleep(0.01)
+        
+        def download():
+            time.sleep(0.01)
+            return pool.connections
+        
+        results = await asyncio.gather(
+            *(stream() for _ in range(5)),
+            *(pool.run(download, connections=2) for _ in range(3))
+        )
+        await pool.shutdown()
+        return max(peak, *(value for value in results if value is not None)), pool.connections
+    
+    peak, left = asyncio.run(scenario())
+    assert peak <= 3
+    assert left == 0
+
+
+def test_oversized_request_is_capped_to_budget():
+    async def scenario():
+        pool = DownloadPool(concurrency=1, queue_size=0, max_connections=2)
+        async with pool.reserve_connections(10):
+            assert pool.connections == 2
+        return pool.connections
+    
+    assert asyncio.run(scenario()) == 0
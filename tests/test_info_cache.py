@@ -0,0 +1,59 @@
+"""Тесты кэша info"""
+import asyncio
+
+from services.info_cache import MemoryInfoCache, VideoInfoCache
+
+INFO = {
+    "id": "abc",
+    "extractor_key": "Youtube",
+    "duration": 30,
+    "formats": [{"format_id": "18", "url": "https://cdn/18.mp4", "http_headers": {"User-Agent": "x"}}],
+}
+
+
+def test_memory_get_returns_copy():
+    cache = MemoryInfoCache(max_size=10)
+    cache.set("key", INFO, ttl=60)
+    
+    info = cache.get("key")
+    # Так info меняет yt-dlp в process_ie_result
+    info["requested_downloads"] = [{"filepath": "/tmp/x.mp4"}]
+    info["formats"][0]["http_headers"]["Cookie"] = "secret"
+    
+    assert cache.get("key") == INFO
+    assert cache.get("key") is not cache.get("key")
+
+
+def test_memory_set_copies_caller_dict():
+    cache = MemoryInfoCache(max_size=10)
+    info = {"id": "abc", "formats": [{"format_id": "18"}]}
+    cache.set("key", info, ttl=60)
+    
+    info["formats"].append({"format_id": "22"})
+    
+    assert cache.get("key") == {"id": "abc", "formats": [{"format_id": "18"}]}
+
+
+def test_memory_expired_and_lru():
+    cache = MemoryInfoCache(max_size=2)
+    cache.set("expired", INFO, ttl=0)
+    assert cache.get("expired") is None
+    
+    cache.set("a", INFO, ttl=60)
+    cache.set("b", INFO, ttl=60)
+    cache.get("a")
+    cache.set("c", INFO, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_two_tier_get_returns_independent_copies():
+    cache = VideoInfoCache(MemoryInfoCache(max_size=10))
+    
+    async def scenario():
+        await cache.set("key", INFO)
+        first = await cache.get("key")
+        first["fulltitle"] = "changed"
+        return await cache.get("key")
+    
+    assert "fulltitle" not in asyncio.run(scenario())
@@ -0,0 +1,168 @@
+"""Тесты аренды задач в очереди скачивания (на SQLite в памяти)"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config.settings import settings
+from database.models import DownloadJob
+from services.job_queue import JOB_FAILED, JOB_RUNNING, JobQueueService
+
+
+@pytest.fixture
+def run():
+    """Выполняет корутину-сценарий с сессией свежей базы"""
+    async def scenario(test):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(DownloadJob.__table__.create)
+        async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            await test(session)
+        await engine.dispose()
+    
+    return lambda test: asyncio.run(scenario(test))
+
+
+async def _enqueue(session: AsyncSession) -> DownloadJob:
+    return await JobQueueService.enqueue(
+        session, url="https://youtu.be/abc", chat_id=1, user_id=1, status_message_id=10
+    )
+
+
+async def _expire_lease(session: AsyncSession, job_id: int):
+    await session.execute(
+        update(DownloadJob)
+        .where(DownloadJob.id == job_id)
+        .values(lease_until=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await session.commit()
+
+
+def test_leased_job_is_not_leased_twice(run):
+    async def test(session):
+        job = await _enqueue(session)
+        
+        leased = await JobQueueService.lease(session, "w1")
+        assert leased.id == job.id
+        assert leased.status == JOB_RUNNING
+        assert leased.attempts == 1
+        assert await JobQueueService.lease(session, "w2") is None
+    
+    run(test)
+
+
+def test_expired_lease_is_released_to_another_worker(run):
+    async def test(session):
+        job = await _enqueue(session)
+        await JobQueueService.lease(session, "w1")
+        await _expire_lease(session, job.id)
+        
+        leased = await JobQueueService.lease(session, "w2")
+        assert leased.id == job.id
+        assert leased.worker_id == "w2"
+        assert leased.attempts == 2
+        
+        # Прежний воркер больше не может продлить аренду, новый - может
+        assert not await JobQueueService.renew(session, job.id, "w1")
+        assert await JobQueueService.renew(session, job.id, "w2")
+    
+    run(test)
+
+
+def test_renew_keeps_job_from_being_released(run):
+    async def test(session):
+        job = await _enqueue(session)
+        await JobQueueService.lease(session, "w1")
+        await _expire_lease(session, job.id)
+        
+        assert await JobQueueService.renew(session, job.id, "w1")
+        assert await JobQueueService.lease(session, "w2") is None
+    
+    run(test)
+
+
+def test_exhausted_job_is_failed_once(run):
+    async def test(session):
+        job = await _enqueue(session)
+        for attempt in range(settings.JOB_MAX_ATTEMPTS):
+            assert (await JobQueueService.lease(session, f"w{attempt}")).id == job.id
+            await _expire_lease(session, job.id)
+        
+        assert await JobQueueService.lease(session, "w") is None
+        failed = await JobQueueService.fail_exhausted(session, "попытки закончились")
+        assert [failed_job.id for failed_job in failed] == [job.id]
+        assert failed[0].status == JOB_FAILED
+        assert failed[0].error == "попытки закончились"
+        assert await JobQueueService.fail_exhausted(session, "попытки закончились") == []
+    
+    run(test)
+
+
+def test_running_job_with_active_lease_is_not_failed(run):
+    async def test(session):
+        await _enqueue(session)
+        for attempt in range(settings.JOB_MAX_ATTEMPTS):
+            await JobQueueService.lease(session, f"w{attempt}")
+            if attempt < settings.JOB_MAX_ATTEMPTS - 1:
+                await _expire_lease(session, 1)
+        
+        # Последняя попытка еще выполняется
+        assert await JobQueueService.fail_exhausted(session, "попытки закончились") == []
+    
+    run(test)
+
+
+def test_only_owner_completes_job(run):
+    async def test(session):
+        job = await _enqueue(session)
+        await JobQueueService.lease(session, "w1")
+        await _expire_lease(session, job.id)
+        await JobQueueService.lease(session, "w2")
+        
+        assert not await JobQueueService.complete(session, job.id, "w1", "FILE")
+        assert not await JobQueueService.release(session, job.id, "w1")
+        assert await JobQueueService.complete(session, job.id, "w2", "FILE")
+    
+    run(test)
+
+
+def test_worker_stops_job_when_lease_is_lost(run, monkeypatch):
+    from bot import worker
+    
+    cancelled = asyncio.Event()
+    
+    async def deliver_video(bot, **kwargs):
+        assert kwargs["shared"] is False
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {"status": "completed", "file_id": "FILE"}
+    
+    async def test(session):
+        async def get_db():
+            yield session
+        
+        monkeypatch.setattr(worker, "get_db", get_db)
+        monkeypatch.setattr(worker, "deliver_video", deliver_video)
+        monkeypatch.setattr(worker.settings, "JOB_LEASE_SECONDS", 0.3)
+        job = await _enqueue(session)
+        leased = await JobQueueService.lease(session, "w1")
+        
+        task = asyncio.create_task(worker.process_job(None, leased))
+        await asyncio.sleep(0.05)
+        # Аренду забрал другой воркер
+        await _expire_lease(session, job.id)
+        await JobQueueService.lease(session, "w2")
+        
+        await asyncio.wait_for(task, timeout=2)
+        assert cancelled.is_set()
+        assert not task.cancelled()
+        await session.refresh(leased)
+        assert leased.status == JOB_RUNNING
+        assert leased.worker_id == "w2"
+    
+    run(test)
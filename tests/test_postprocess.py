@@ -0,0 +1,58 @@
+"""Тесты разбора атомов MP4 для faststart"""
+import pytest
+
+from services.postprocess import _has_faststart, prefix_has_faststart
+
+
+def atom(kind: bytes, payload: bytes = b"") -> bytes:
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+def write(tmp_path, data: bytes) -> str:
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_moov_before_mdat(tmp_path):
+    path = write(tmp_path, atom(b"ftyp", b"isom") + atom(b"moov", b"\0" * 16) + atom(b"mdat", b"\0" * 64))
+    assert _has_faststart(path)
+
+
+def test_mdat_before_moov(tmp_path):
+    path = write(tmp_path, atom(b"ftyp", b"isom") + atom(b"mdat", b"\0" * 64) + atom(b"moov", b"\0" * 16))
+    assert not _has_faststart(path)
+
+
+def test_64bit_atom_size(tmp_path):
+    large = (1).to_bytes(4, "big") + b"free" + (24).to_bytes(8, "big") + b"\0" * 8
+    path = write(tmp_path, atom(b"ftyp", b"isom") + large + atom(b"moov"))
+    assert _has_faststart(path)
+
+
+@pytest.mark.parametrize("largesize", [0, 1, 8, 15])
+def test_bad_64bit_size_does_not_loop(tmp_path, largesize):
+    bad = (1).to_bytes(4, "big") + b"free" + largesize.to_bytes(8, "big")
+    path = write(tmp_path, atom(b"ftyp", b"isom") + bad + atom(b"moov"))
+    assert not _has_faststart(path)
+
+
+@pytest.mark.parametrize("size", [0, 2, 7])
+def test_bad_32bit_size(tmp_path, size):
+    bad = size.to_bytes(4, "big") + b"free" + b"\0" * 8
+    path = write(tmp_path, atom(b"ftyp", b"isom") + bad + atom(b"moov"))
+    assert not _has_faststart(path)
+
+
+def test_truncated_file(tmp_path):
+    path = write(tmp_path, atom(b"ftyp", b"isom") + b"\0\0\0")
+    assert not _has_faststart(path)
+    assert not _has_faststart(write(tmp_path, b""))
+
+
+def test_prefix_decides_only_within_prefix():
+    head = atom(b"ftyp", b"isom") + atom(b"free", b"\0" * 100)
+    assert prefix_has_faststart(head + atom(b"moov", b"\0" * 16)[:8])
+    assert not prefix_has_faststart(head + atom(b"mdat", b"\0" * 64)[:8])
+    # Ни moov, ни mdat в начале файла: без скачивания не проверить
+    assert not prefix_has_faststart(head)
@@ -0,0 +1,33 @@
+"""Тесты публикации прогресса: частые хуки yt-dlp не перегружают event loop"""
+import asyncio
+
+from services.progress import ProgressPublisher
+
+
+def test_hooks_without_total_size_are_throttled():
+    async def scenario():
+        shown = []
+        
+        async def callback(snapshot):
+            shown.append(snapshot)
+        
+        publisher = ProgressPublisher(callback, interval=60, min_step=1)
+        publisher._next_publish = 0
+        publishes = []
+        original = publisher._publish
+        
+        def publish():
+            publishes.append(1)
+            original()
+        
+        publisher._publish = publish
+        for downloaded in range(1, 1001):
+            # Размер неизвестен: процент не посчитать
+            publisher.hook({"status": "downloading", "downloaded_bytes": downloaded * 1024})
+            await asyncio.sleep(0)
+        await publisher.close()
+        return len(publishes), shown
+    
+    publishes, shown = asyncio.run(scenario())
+    assert publishes == 1
+    assert shown == []
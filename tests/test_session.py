@@ -0,0 +1,20 @@
+"""Тесты сессий Bot API: настройки пулов соединений"""
+import asyncio
+
+from bot.session import create_bot_session
+from config.settings import settings
+
+
+def test_pools_keep_connections_alive():
+    async def scenario():
+        session = create_bot_session()
+        client = await session.control.create_session()
+        assert await session.control.create_session() is client
+        connector = client.connector
+        await session.close()
+        return connector, client.closed
+    
+    connector, closed = asyncio.run(scenario())
+    assert connector._keepalive_timeout == settings.BOT_API_KEEPALIVE
+    assert connector.limit == settings.BOT_API_CONTROL_POOL_SIZE
+    assert closed
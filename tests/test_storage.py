@@ -0,0 +1,103 @@
+"""Тесты рабочих директорий загрузок и фоновой очистки"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from config.settings import settings
+from services.storage import StorageFullError, StorageManager
+
+MB = 1024 * 1024
+
+
+def make_manager(root, budget=100 * MB):
+    return StorageManager(root=root, budget=budget, min_free=0)
+
+
+def age(path, seconds):
+    """Состарить файл или директорию со всем содержимым"""
+    past = time.time() - seconds
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            os.utime(os.path.join(dirpath, filename), (past, past))
+        os.utime(dirpath, (past, past))
+    os.utime(path, (past, past))
+
+
+def write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+
+
+def test_release_frees_reservation(tmp_path):
+    storage = make_manager(tmp_path)
+    job_dir = asyncio.run(storage.allocate("bot", 10 * MB))
+    assert storage.bytes_in_flight == 10 * MB
+    
+    storage.release(job_dir)
+    assert storage.bytes_in_flight == 0
+    assert not job_dir.exists()
+
+
+def test_allocate_over_budget_is_rejected(tmp_path):
+    storage = make_manager(tmp_path, budget=10 * MB)
+    with pytest.raises(StorageFullError):
+        asyncio.run(storage.allocate("bot", 20 * MB))
+
+
+def test_sweep_keeps_dirs_locked_by_another_process(tmp_path):
+    # Второй экземпляр с отдельными дескрипторами ведет себя как другой процесс
+    owner = make_manager(tmp_path)
+    janitor = make_manager(tmp_path)
+    job_dir = asyncio.run(owner.allocate("bot", MB))
+    write(job_dir / "video.mp4", 1024)
+    age(job_dir, settings.STORAGE_MAX_AGE + 60)
+    
+    assert janitor.sweep() == 0
+    assert (job_dir / "video.mp4").exists()
+    
+    owner.release(job_dir)
+    assert not job_dir.exists()
+
+
+def test_sweep_removes_abandoned_dirs(tmp_path):
+    storage = make_manager(tmp_path)
+    abandoned = tmp_path / "bot" / "abandoned"
+    write(abandoned / "video.mp4", 1024)
+    # Файл блокировки упавшего процесса остается, но блокировки на нем уже нет
+    write(abandoned / ".lock", 0)
+    age(abandoned, settings.STORAGE_MAX_AGE + 60)
+    fresh = tmp_path / "bot" / "fresh"
+    write(fresh / "video.mp4", 1024)
+    
+    assert storage.sweep() == 1
+    assert not abandoned.exists()
+    assert fresh.exists()
+
+
+def test_sweep_removes_stray_files(tmp_path):
+    storage = make_manager(tmp_path)
+    stray_root = tmp_path / "stray.part"
+    stray_bot = tmp_path / "bot" / "video.mp4"
+    write(stray_root, 1024)
+    write(stray_bot, 1024)
+    age(stray_root, settings.STORAGE_MAX_AGE + 60)
+    age(stray_bot, settings.STORAGE_MAX_AGE + 60)
+    
+    assert storage.sweep() == 2
+    assert not stray_root.exists()
+    assert not stray_bot.exists()
+    assert (tmp_path / "bot").exists()
+
+
+def test_sweep_evicts_idle_dirs_over_budget(tmp_path):
+    storage = make_manager(tmp_path, budget=3 * 1024)
+    for name, idle in (("oldest", 600), ("older", 400), ("recent", 10)):
+        write(tmp_path / "bot" / name / "video.mp4", 2 * 1024)
+        age(tmp_path / "bot" / name, idle)
+    
+    assert storage.sweep() == 2
+    assert not (tmp_path / "bot" / "oldest").exists()
+    assert not (tmp_path / "bot" / "older").exists()
+    assert (tmp_path / "bot" / "recent").exists()
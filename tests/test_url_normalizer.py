@@ -0,0 +1,36 @@
+"""Тесты раскрытия коротких ссылок: одна HTTP-сессия на процесс"""
+import asyncio
+
+from aiohttp import web
+
+from services import url_normalizer
+
+
+def test_short_links_share_one_session(monkeypatch):
+    async def redirect(request):
+        raise web.HTTPFound(f"https://www.tiktok.com/@user/video/{request.match_info['code']}")
+    
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/{code}", redirect)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            first = await url_normalizer.resolve_short_url(f"http://127.0.0.1:{port}/1")
+            session = url_normalizer._session
+            second = await url_normalizer.resolve_short_url(f"http://127.0.0.1:{port}/2")
+            assert url_normalizer._session is session
+        finally:
+            await url_normalizer.close_session()
+            await runner.cleanup()
+        return first, second, session.closed
+    
+    monkeypatch.setattr(url_normalizer, "_short_link_cache", url_normalizer.OrderedDict())
+    first, second, closed = asyncio.run(scenario())
+    assert first == "https://www.tiktok.com/@user/video/1"
+    assert second == "https://www.tiktok.com/@user/video/2"
+    assert closed
+    assert url_normalizer._session is None
@@ -0,0 +1,30 @@
+"""Тесты пула YoutubeDL: переиспользование и переход на новый экземпляр на запрос"""
+from services.ydl_pool import YdlPool
+
+
+def test_instance_is_reused_with_request_options():
+    pool = YdlPool(max_uses=5, max_idle=1)
+    with pool.checkout("tiktok", {"quiet": True, "outtmpl": "/tmp/a/%(id)s.%(ext)s"}) as first:
+        pass
+    with pool.checkout("tiktok", {"quiet": True, "outtmpl": "/tmp/b/%(id)s.%(ext)s"}) as second:
+        assert second.params["outtmpl"]["default"] == "/tmp/b/%(id)s.%(ext)s"
+    pool.close()
+    assert first is second
+    assert pool.reuse
+
+
+def test_changed_internals_fall_back_to_fresh_instances(monkeypatch):
+    def changed_prepare(ydl, request_opts):
+        # Так выглядит смена сигнатуры закрытого метода в новой версии yt-dlp
+        raise TypeError("_parse_outtmpl() takes 2 positional arguments but 1 was given")
+    
+    monkeypatch.setattr(YdlPool, "_prepare", staticmethod(changed_prepare))
+    pool = YdlPool(max_uses=5, max_idle=1)
+    opts = {"quiet": True, "outtmpl": "/tmp/a/%(id)s.%(ext)s"}
+    with pool.checkout("tiktok", opts) as first:
+        assert first.params["outtmpl"]["default"] == "/tmp/a/%(id)s.%(ext)s"
+    with pool.checkout("tiktok", opts) as second:
+        pass
+    pool.close()
+    assert not pool.reuse
+    assert first is not second